@@ -50,11 +50,14 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'main_crm.instrumentation.RequestTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'main_crm.profiling.ProfilerMiddleware',
+    'main_crm.nplusone.NPlusOneMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -78,17 +81,90 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'crm.wsgi.application'
+ASGI_APPLICATION = 'crm.asgi.application'
 
 # Database
 # https://docs.djangoproject.com/en/4.0/ref/settings/#databases
 
+# Бэкенд main_crm.backends.sqlite3: PRAGMA соединения (WAL и др., OPTIONS['pragmas'] переопределяет
+# DEFAULT_PRAGMAS), BEGIN IMMEDIATE для транзакций и статистика соединений (db/stats/).
+# CONN_MAX_AGE - время жизни соединения потока в секундах (соединение не открывается на каждый запрос)
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'main_crm.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'CONN_MAX_AGE': 600,
+        'OPTIONS': {
+            'transaction_mode': 'IMMEDIATE',
+            'pragmas': {
+                'busy_timeout': 5000,
+                'journal_mode': 'WAL',
+                'synchronous': 'NORMAL',
+            },
+        },
+    }
+}
+
+# Cache
+# https://docs.djangoproject.com/en/4.0/topics/cache/
+
+# Кеш фрагментов страниц (main_crm.caching). Для нескольких процессов сервера нужен общий бэкенд,
+# например django.core.cache.backends.redis.RedisCache
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'crm',
+        'TIMEOUT': 600,
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
     }
 }
 
+# Сессии и пользователь сессии загружаются из базы данных. С общим для всех процессов кешем можно включить
+# кешированные сессии с записью в базу и кеширование пользователя сессии вместе с профилем:
+#     SESSION_ENGINE = 'main_crm.sessions'
+#     AUTHENTICATION_BACKENDS = ['main_crm.auth.CachedModelBackend', 'django.contrib.auth.backends.ModelBackend']
+# С LocMemCache выход, смена пароля или блокировка пользователя в одном процессе не доходят до остальных,
+# поэтому такая конфигурация не проходит проверку main_crm.E001
+
+# Замер времени запросов (заголовок Server-Timing, журнал медленных запросов, статистика по URL)
+REQUEST_TIMING_ENABLED = True
+REQUEST_TIMING_SLOW_MS = 500
+REQUEST_TIMING_SLOWEST_QUERIES = 5
+
+# Профилирование запросов суперпользователей по требованию (?profile=1 или ?profile=sample)
+PROFILE_DIR = os.path.join(BASE_DIR, 'profiles')
+PROFILE_KEEP = 50
+
+# Обнаружение N+1 запросов: включено при DEBUG и в тестах контроллеров (NPlusOneTestRunner)
+NPLUSONE_THRESHOLD = 3
+NPLUSONE_RAISE = False
+NPLUSONE_TEST_MODULES = ('main_crm.tests.test_views',)
+TEST_RUNNER = 'main_crm.nplusone.NPlusOneTestRunner'
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'main_crm.performance': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+        'main_crm.nplusone': {
+            'handlers': ['console'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+    },
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/4.0/ref/settings/#auth-password-validators
 
@@ -133,6 +209,7 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 MEDIA_URL = '/media/'
 
 CKEDITOR_UPLOAD_PATH = 'uploads/'
+CKEDITOR_STORAGE_BACKEND = 'main_crm.uploads.ContentAddressedStorage'
 LOGIN_URL = '/login/'
 LOGIN_REDIRECT_URL = 'main_crm:index'
 
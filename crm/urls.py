@@ -3,6 +3,8 @@ from django.urls import path, include, re_path
 from django.conf import settings
 from django.conf.urls.static import static
 
+from main_crm.conditional import serve
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', include('main_crm.urls')),
@@ -10,5 +12,5 @@ urlpatterns = [
 ]
 
 if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
-    urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
+    urlpatterns += static(settings.MEDIA_URL, view=serve, document_root=settings.MEDIA_ROOT)
+    urlpatterns += static(settings.STATIC_URL, view=serve, document_root=settings.STATIC_ROOT)
@@ -0,0 +1,163 @@
+"""
+Аналитика по взаимодействиям на основе дневных агрегатов InteractionRollup.
+Агрегат - количество взаимодействий в корзине (день создания, менеджер, компания, канал, оценка).
+Обновление инкрементальное: пересчитываются только дни, в которых есть взаимодействия
+с updated_at позже сохраненного watermark, и дни удаленных взаимодействий (RollupDirtyDay).
+Агрегаты каждой пачки дней удаляются и записываются заново в одной транзакции, поэтому отчеты,
+которые читают только таблицу агрегатов, не видят пустых или частичных данных и во время полного пересчета.
+"""
+import datetime
+
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncDate, TruncMonth
+from django.utils import timezone
+
+from .const import CHANNELS, MARKS
+from .models import Interaction, InteractionRollup, RollupState, RollupDirtyDay
+
+ROLLUP_NAME = 'interactions'
+
+# Перекрытие окна обновления: взаимодействия, сохраненные незадолго до watermark, обрабатываются повторно,
+# чтобы не потерять записи из транзакций, которые завершились уже после чтения
+REFRESH_OVERLAP = datetime.timedelta(minutes=5)
+
+# Количество дней, пересчитываемых в одной транзакции
+REFRESH_BATCH_DAYS = 31
+
+
+def mark_day_dirty(day: datetime.date):
+    RollupDirtyDay.objects.bulk_create([RollupDirtyDay(day=day)], ignore_conflicts=True)
+
+
+def get_touched_days(watermark) -> list:
+    """
+    Возвращает дни, агрегаты которых устарели после watermark
+    :param watermark:
+    :return:
+    """
+    interactions = Interaction.objects.all()
+    if watermark:
+        interactions = interactions.filter(updated_at__gt=watermark - REFRESH_OVERLAP)
+    days = set(
+        interactions.order_by().annotate(day=TruncDate('created_at')).values_list('day', flat=True).distinct()
+    )
+    days.update(RollupDirtyDay.objects.values_list('day', flat=True))
+    return sorted(days)
+
+
+def day_range(day: datetime.date, days: int = 1) -> Q:
+    start = timezone.make_aware(datetime.datetime.combine(day, datetime.time.min))
+    return Q(created_at__gte=start, created_at__lt=start + datetime.timedelta(days=days))
+
+
+def days_condition(days: list) -> Q:
+    """
+    Условие на created_at для дней: подряд идущие дни объединяются в один диапазон,
+    чтобы индекс по created_at просматривался несколькими отрезками, а не проверкой OR для каждой строки
+    :param days: Отсортированные дни
+    :return:
+    """
+    condition = Q()
+    start = previous = None
+    for day in days:
+        if previous is not None and day == previous + datetime.timedelta(days=1):
+            previous = day
+            continue
+        if start is not None:
+            condition |= day_range(start, (previous - start).days + 1)
+        start = previous = day
+    if start is not None:
+        condition |= day_range(start, (previous - start).days + 1)
+    return condition
+
+
+def rebuild_days(days: list) -> int:
+    """
+    Пересчитывает агрегаты за указанные дни
+    :param days:
+    :return: Количество записанных корзин
+    """
+    buckets = (
+        Interaction.objects.filter(days_condition(days)).order_by()
+        .annotate(day=TruncDate('created_at'))
+        .values('day', 'manager_id', 'project__user_id', 'channel', 'mark')
+        .annotate(count=Count('pk'))
+    )
+    rollups = [
+        InteractionRollup(day=bucket['day'], manager_id=bucket['manager_id'], company_id=bucket['project__user_id'],
+                          channel=bucket['channel'], mark=bucket['mark'], count=bucket['count'])
+        for bucket in buckets
+    ]
+    InteractionRollup.objects.filter(day__in=days).delete()
+    InteractionRollup.objects.bulk_create(rollups, batch_size=500)
+    RollupDirtyDay.objects.filter(day__in=days).delete()
+    return len(rollups)
+
+
+def refresh_rollups(full: bool = False) -> dict:
+    """
+    Обновляет агрегаты с последнего watermark (или полностью при full=True)
+    :param full:
+    :return: Статистика обновления: количество дней и корзин
+    """
+    state, _ = RollupState.objects.get_or_create(name=ROLLUP_NAME)
+    started_at = timezone.now()
+
+    if full:
+        # Дни агрегатов, взаимодействий которых больше нет, тоже пересчитываются: их корзины удаляются
+        days = sorted(set(get_touched_days(None)) | set(
+            InteractionRollup.objects.order_by().values_list('day', flat=True).distinct()
+        ))
+    else:
+        days = get_touched_days(state.watermark)
+
+    buckets = 0
+    for i in range(0, len(days), REFRESH_BATCH_DAYS):
+        with transaction.atomic():
+            buckets += rebuild_days(days[i:i + REFRESH_BATCH_DAYS])
+
+    RollupState.objects.filter(pk=state.pk).update(watermark=started_at, refreshed_at=timezone.now())
+    return {'days': len(days), 'buckets': buckets}
+
+
+def get_dashboard(date_from: datetime.date = None, date_to: datetime.date = None) -> dict:
+    """
+    Данные для аналитики за период, прочитанные только из агрегатов
+    :param date_from:
+    :param date_to:
+    :return:
+    """
+    rollups = InteractionRollup.objects.order_by()
+    if date_from:
+        rollups = rollups.filter(day__gte=date_from)
+    if date_to:
+        rollups = rollups.filter(day__lte=date_to)
+
+    channels = dict(CHANNELS)
+    marks = dict(MARKS)
+
+    per_day = {}
+    for row in rollups.values('day', 'channel').annotate(total=Sum('count')).order_by('day'):
+        per_day.setdefault(row['day'], dict.fromkeys(channels, 0))[row['channel']] = row['total']
+
+    per_manager = {}
+    for row in rollups.values('manager__username', 'mark').annotate(total=Sum('count')).order_by('manager__username'):
+        per_manager.setdefault(row['manager__username'], dict.fromkeys(marks, 0))[row['mark']] = row['total']
+
+    per_company_month = [
+        {'month': row['month'], 'company': row['company__company_name'], 'total': row['total']}
+        for row in rollups.annotate(month=TruncMonth('day'))
+        .values('month', 'company__company_name').annotate(total=Sum('count'))
+        .order_by('-month', 'company__company_name')
+    ]
+
+    state = RollupState.objects.filter(name=ROLLUP_NAME).first()
+    return {
+        'channels': channels,
+        'marks': marks,
+        'per_day': per_day,
+        'per_manager': per_manager,
+        'per_company_month': per_company_month,
+        'refreshed_at': state.refreshed_at if state else None,
+    }
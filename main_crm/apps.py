@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class MainCrmConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'main_crm'
+
+    def ready(self):
+        from . import checks, signals, tasks  # noqa: F401
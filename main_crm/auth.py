@@ -0,0 +1,46 @@
+"""
+Бэкенд аутентификации, который кеширует пользователя вместе с профилем.
+AuthenticationMiddleware получает пользователя сессии через get_user на каждом запросе;
+закешированный пользователь уже содержит Profile, поэтому request.user.profile не требует запроса.
+Запись удаляется из кеша сигналами при сохранении или удалении User и Profile (в том числе при смене
+пароля, после чего проверка хеша сессии завершает старые сессии).
+"""
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+
+from . import caching
+
+UserModel = get_user_model()
+
+USER_TIMEOUT = 5 * 60
+
+
+def user_key(user_id) -> str:
+    return f'{caching.KEY_PREFIX}:user:{user_id}'
+
+
+def invalidate_user(user_id):
+    cache.delete(user_key(user_id))
+
+
+class CachedModelBackend(ModelBackend):
+    """
+    ModelBackend, который берет пользователя сессии из кеша
+    """
+
+    def get_user(self, user_id):
+        """
+        Переопределенный метод для получения пользователя с профилем из кеша или базы данных
+        :param user_id:
+        :return:
+        """
+        key = user_key(user_id)
+        user = cache.get(key)
+        caching.record('user', user is not None)
+        if user is None:
+            user = UserModel.objects.select_related('profile').filter(pk=user_id).first()
+            if user is None:
+                return None
+            cache.set(key, user, USER_TIMEOUT)
+        return user if self.user_can_authenticate(user) else None
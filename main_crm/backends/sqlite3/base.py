@@ -0,0 +1,146 @@
+"""
+Бэкенд SQLite для рабочей нагрузки с параллельными запросами (ENGINE 'main_crm.backends.sqlite3').
+Расширяет django.db.backends.sqlite3:
+    - при открытии соединения выполняет PRAGMA из DEFAULT_PRAGMAS и OPTIONS['pragmas']: журнал WAL
+      (чтение не ждет записи), synchronous, mmap_size, cache_size, busy_timeout, temp_store;
+    - начинает транзакции (transaction.atomic) в режиме OPTIONS['transaction_mode'], по умолчанию
+      BEGIN IMMEDIATE: блокировка записи берется в начале транзакции и ожидается через busy_timeout.
+      При BEGIN (DEFERRED) транзакция, которая сначала читает, а потом пишет, получает "database is locked"
+      без ожидания, если запись уже начала другая транзакция (взаимоблокировка повышения блокировки);
+    - ведет статистику каждого соединения (get_stats): открытия, запросы, транзакции, ожидание блокировки записи
+      и ошибки блокировки.
+Соединения переиспользуются между запросами через стандартную настройку CONN_MAX_AGE.
+"""
+import re
+import threading
+import time
+import weakref
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db import OperationalError
+from django.db.backends.sqlite3 import base
+
+# busy_timeout первым: переключение журнала тоже может ждать блокировку
+DEFAULT_PRAGMAS = {
+    'busy_timeout': 5000,
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'cache_size': -64000,
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'MEMORY',
+}
+
+TRANSACTION_MODES = ('DEFERRED', 'IMMEDIATE', 'EXCLUSIVE')
+
+# Параметры OPTIONS, которые обрабатывает бэкенд, а не sqlite3.connect
+BACKEND_OPTIONS = ('pragmas', 'transaction_mode')
+
+LOCKED_MESSAGES = ('database is locked', 'database table is locked')
+
+# Начало транзакции дольше этого времени считается ожиданием блокировки записи
+LOCK_WAIT_MS = 1
+
+PRAGMA_NAME_RE = re.compile(r'^[a-z_]+$')
+PRAGMA_VALUE_RE = re.compile(r'^-?\w+$')
+
+wrappers = weakref.WeakSet()
+wrappers_lock = threading.Lock()
+
+
+def get_pragmas(options: dict) -> dict:
+    """
+    Возвращает PRAGMA соединения: значения по умолчанию, переопределенные OPTIONS['pragmas']
+    (значение None отключает PRAGMA)
+    :param options:
+    :return:
+    """
+    pragmas = {**DEFAULT_PRAGMAS, **options.get('pragmas', {})}
+    for name, value in pragmas.items():
+        if not PRAGMA_NAME_RE.match(name) or value is not None and not PRAGMA_VALUE_RE.match(str(value)):
+            raise ImproperlyConfigured(f'Invalid SQLite pragma {name} = {value!r}')
+    return {name: value for name, value in pragmas.items() if value is not None}
+
+
+def is_locked(exception) -> bool:
+    return any(message in str(exception) for message in LOCKED_MESSAGES)
+
+
+def get_stats() -> list:
+    """
+    Возвращает статистику соединений всех потоков текущего процесса
+    :return:
+    """
+    with wrappers_lock:
+        current = list(wrappers)
+    return sorted((wrapper.get_stats() for wrapper in current), key=lambda stats: (stats['alias'], stats['thread']))
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        options = self.settings_dict['OPTIONS']
+        self.pragmas = get_pragmas(options)
+        self.transaction_mode = options.get('transaction_mode', 'IMMEDIATE').upper()
+        if self.transaction_mode not in TRANSACTION_MODES:
+            raise ImproperlyConfigured(f'transaction_mode must be one of {", ".join(TRANSACTION_MODES)}')
+        self.thread_name = threading.current_thread().name
+        self.connected_at = None
+        self.stats = dict.fromkeys(
+            ('connections', 'queries', 'transactions', 'lock_waits', 'lock_errors', 'lock_wait_ms', 'max_lock_wait_ms'),
+            0,
+        )
+        # Постоянная обертка: connection.execute_wrapper() добавляет и снимает свои обертки после нее
+        self.execute_wrappers.append(self.record_query)
+        with wrappers_lock:
+            wrappers.add(self)
+
+    def get_connection_params(self) -> dict:
+        params = super().get_connection_params()
+        for name in BACKEND_OPTIONS:
+            params.pop(name, None)
+        return params
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for name, value in self.pragmas.items():
+            conn.execute(f'PRAGMA {name} = {value}').fetchall()
+        self.stats['connections'] += 1
+        self.connected_at = time.monotonic()
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        """
+        Начинает транзакцию в режиме transaction_mode и считает время ожидания блокировки записи
+        """
+        started = time.perf_counter()
+        self.cursor().execute(f'BEGIN {self.transaction_mode}')
+        wait = (time.perf_counter() - started) * 1000
+        self.stats['transactions'] += 1
+        if self.transaction_mode != 'DEFERRED':
+            self.stats['lock_wait_ms'] += wait
+            self.stats['max_lock_wait_ms'] = max(self.stats['max_lock_wait_ms'], wait)
+            if wait >= LOCK_WAIT_MS:
+                self.stats['lock_waits'] += 1
+
+    def record_query(self, execute, sql, params, many, context):
+        self.stats['queries'] += 1
+        try:
+            return execute(sql, params, many, context)
+        except OperationalError as exc:
+            if is_locked(exc):
+                self.stats['lock_errors'] += 1
+            raise
+
+    def get_stats(self) -> dict:
+        return {
+            'alias': self.alias,
+            'thread': self.thread_name,
+            'connected': self.connection is not None,
+            'age_s': round(time.monotonic() - self.connected_at, 1) if self.connection is not None else None,
+            'transaction_mode': self.transaction_mode,
+            'pragmas': self.pragmas,
+            **self.stats,
+            'lock_wait_ms': round(self.stats['lock_wait_ms'], 3),
+            'max_lock_wait_ms': round(self.stats['max_lock_wait_ms'], 3),
+        }
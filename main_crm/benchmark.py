@@ -0,0 +1,214 @@
+"""
+Бенчмарк всех именованных маршрутов main_crm.urls.
+Для каждого масштаба данных (количество взаимодействий) тестовая база заполняется
+детерминированными данными (main_crm.datagen), после чего каждый маршрут запрашивается тестовым
+клиентом от имени менеджера-суперпользователя. Для маршрута записываются перцентили времени ответа,
+количество SQL-запросов и пиковое выделение памяти (tracemalloc).
+Результаты сохраняются в JSON и сравниваются с сохраненным базовым прогоном (compare).
+"""
+import math
+import platform
+import time
+import tracemalloc
+
+import django
+from django.contrib.auth.tokens import default_token_generator
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, URLResolver, reverse
+from django.utils import timezone
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+
+from . import datagen, export, urls
+from .models import Company, Project, Interaction, User
+
+SCALES = {'1k': 1000, '100k': 100000, '1m': 1000000}
+
+# Маршруты, которые не запрашиваются, и причина
+SKIPPED_ROUTES = {
+    'logout': 'ends the benchmark session',
+    'profile-file': 'requires a saved profile',
+}
+
+# Разница p95, которая не считается регрессией при любом относительном пороге (шум измерений)
+NOISE_MS = 1.0
+
+
+def get_route_names(patterns=None) -> list:
+    """
+    Возвращает имена всех маршрутов, в том числе вложенных через include
+    :param patterns:
+    :return:
+    """
+    names = []
+    for pattern in urls.urlpatterns if patterns is None else patterns:
+        if isinstance(pattern, URLResolver):
+            names.extend(get_route_names(pattern.url_patterns))
+        elif isinstance(pattern, URLPattern) and pattern.name:
+            names.append(pattern.name)
+    return names
+
+
+def get_sample(user) -> dict:
+    """
+    Возвращает объекты, подставляемые в параметры маршрутов: самые нагруженные компания и проект
+    :param user:
+    :return:
+    """
+    company = Company.objects.order_by('-interaction_count', 'pk').only('pk', 'slug').first()
+    project = Project.objects.filter(user=company).order_by('-interaction_count', 'pk').only('pk').first()
+    interaction = Interaction.objects.filter(manager=user).only('pk').order_by('pk').first()
+    return {
+        'slug': company.slug,
+        'company_pk': company.pk,
+        'project_pk': project.pk,
+        'interaction_pk': interaction.pk if interaction else None,
+        'uidb64': urlsafe_base64_encode(force_bytes(user.pk)),
+        'token': default_token_generator.make_token(user),
+        'export': next(iter(export.EXPORTS)),
+    }
+
+
+def get_route_kwargs(name: str, sample: dict) -> dict:
+    """
+    Подбирает параметры маршрута по его имени
+    :param name:
+    :param sample:
+    :return:
+    """
+    if name in ('company-detail', 'company-update', 'company-delete', 'company-projects-list', 'project-create',
+                'company-interactions-list'):
+        return {'slug': sample['slug']}
+    if name in ('project-delete', 'project-update', 'project-detail', 'project-interaction-list',
+                'interaction-create'):
+        return {'pk': sample['project_pk']}
+    if name in ('interaction-detail', 'interaction-delete', 'interaction-update'):
+        return {'pk': sample['interaction_pk']}
+    if name == 'password_reset_confirm':
+        return {'uidb64': sample['uidb64'], 'token': sample['token']}
+    if name == 'export':
+        return {'name': sample['export']}
+    return {}
+
+
+def percentile(values: list, rank: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(max(math.ceil(rank / 100 * len(ordered)) - 1, 0), len(ordered) - 1)]
+
+
+def fetch(client: Client, path: str):
+    response = client.get(path)
+    if response.streaming:
+        b''.join(response.streaming_content)
+    return response
+
+
+def measure(client: Client, path: str, requests: int, cold: bool = False) -> dict:
+    """
+    Измеряет маршрут: одна разогревающая выборка, requests замеров времени и один замер памяти
+    :param client:
+    :param path:
+    :param requests:
+    :param cold: Очищать кеш перед каждым запросом
+    :return:
+    """
+    fetch(client, path)
+    timings = []
+    for _ in range(requests):
+        if cold:
+            cache.clear()
+        started = time.perf_counter()
+        response = fetch(client, path)
+        timings.append((time.perf_counter() - started) * 1000)
+
+    if cold:
+        cache.clear()
+    with CaptureQueriesContext(connection) as context:
+        tracemalloc.start()
+        fetch(client, path)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    return {
+        'status': response.status_code,
+        'p50_ms': round(percentile(timings, 50), 3),
+        'p95_ms': round(percentile(timings, 95), 3),
+        'p99_ms': round(percentile(timings, 99), 3),
+        'queries': len(context.captured_queries),
+        'peak_kb': round(peak / 1024, 1),
+    }
+
+
+def run_scale(scale: str, interactions: int, requests: int, routes=None, cold: bool = False, seed: int = 0,
+              progress=None) -> list:
+    """
+    Заполняет пустую базу данными масштаба и измеряет маршруты
+    :param scale: Название масштаба
+    :param interactions:
+    :param requests:
+    :param routes: Имена маршрутов (None - все)
+    :param cold:
+    :param seed:
+    :param progress: Функция, которая вызывается со строкой сообщения
+    :return: Список результатов по маршрутам
+    """
+    cache.clear()
+    datagen.generate(interactions, seed=seed)
+    user = User.objects.filter(interaction__isnull=False).order_by('pk').first()
+    client = Client()
+    client.login(username=user.username, password=datagen.MANAGER_PASSWORD)
+    sample = get_sample(user)
+
+    results = []
+    for name in routes or get_route_names():
+        result = {'scale': scale, 'interactions': interactions, 'route': name}
+        if name in SKIPPED_ROUTES:
+            results.append({**result, 'skipped': SKIPPED_ROUTES[name]})
+            continue
+        result['path'] = reverse(name, kwargs=get_route_kwargs(name, sample))
+        result.update(measure(client, result['path'], requests, cold))
+        results.append(result)
+        if progress:
+            progress(f"{scale} {name}: p50 {result['p50_ms']} ms, p95 {result['p95_ms']} ms, "
+                     f"{result['queries']} queries, {result['peak_kb']} KiB")
+    return results
+
+
+def make_report(results: list, requests: int, cold: bool) -> dict:
+    return {
+        'meta': {
+            'created_at': timezone.now().isoformat(),
+            'requests': requests,
+            'cold_cache': cold,
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+        },
+        'results': results,
+    }
+
+
+def compare(report: dict, baseline: dict, threshold: float) -> list:
+    """
+    Сравнивает прогон с базовым
+    :param report:
+    :param baseline:
+    :param threshold: Допустимый относительный рост p95 (0.2 - на 20%)
+    :return: Список описаний регрессий
+    """
+    base = {(result['scale'], result['route']): result for result in baseline['results'] if 'p95_ms' in result}
+    regressions = []
+    for result in report['results']:
+        previous = base.get((result['scale'], result['route']))
+        if previous is None or 'p95_ms' not in result:
+            continue
+        key = f"{result['scale']} {result['route']}"
+        p95, previous_p95 = result['p95_ms'], previous['p95_ms']
+        if p95 > previous_p95 * (1 + threshold) and p95 - previous_p95 > NOISE_MS:
+            regressions.append(f'{key}: p95 {previous_p95} -> {p95} ms')
+        if result['queries'] > previous['queries']:
+            regressions.append(f"{key}: queries {previous['queries']} -> {result['queries']}")
+    return regressions
@@ -0,0 +1,157 @@
+"""
+Кеширование фрагментов страниц и страниц списка компаний.
+Ключ фрагмента строится из имени фрагмента, версии пространства имен объекта (например, company:1)
+и отметки времени изменения объекта (edited/updated_at). Сигналы (main_crm.signals) при изменении
+Company, Phone, Email, Project и Interaction меняют версию пространства имен, поэтому старые ключи
+больше не используются и вытесняются кешем по таймауту.
+Попадания и промахи считаются в самом кеше отдельно для каждого фрагмента.
+"""
+import hashlib
+import time
+
+from django.core.cache import cache
+
+KEY_PREFIX = 'crm'
+
+# Пространство имен страниц списка компаний
+COMPANY_LIST = 'companies'
+
+FRAGMENTS = (
+    'company_card',
+    'company_contacts',
+    'company_projects',
+    'project_card',
+    'company_list',
+)
+
+# Статистика попаданий ведется также для сессий (main_crm.sessions) и пользователей (main_crm.auth)
+STATS = FRAGMENTS + ('session', 'user')
+
+
+def namespace(obj) -> str:
+    return object_namespace(obj._meta.model_name, obj.pk)
+
+
+def object_namespace(model_name: str, pk) -> str:
+    return f'{model_name}:{pk}'
+
+
+def version_key(name: str) -> str:
+    return f'{KEY_PREFIX}:version:{name}'
+
+
+def get_version(name: str) -> int:
+    """
+    Возвращает текущую версию пространства имен. Начальная версия - текущее время,
+    чтобы после вытеснения версии из кеша не вернуться к уже использованным ключам
+    :param name:
+    :return:
+    """
+    return cache.get_or_set(version_key(name), time.time_ns, timeout=None)
+
+
+def invalidate(*names):
+    """
+    Делает недействительными все фрагменты пространств имен, меняя их версии
+    :param names:
+    :return:
+    """
+    version = time.time_ns()
+    cache.set_many({version_key(name): version for name in names}, timeout=None)
+
+
+def get_stamp(obj) -> str:
+    stamp = getattr(obj, 'updated_at', None) or getattr(obj, 'edited', None)
+    return stamp.isoformat() if stamp else ''
+
+
+def fragment_key(name: str, obj=None, *vary_on, namespace_name: str = None) -> str:
+    """
+    Формирует ключ фрагмента
+    :param name: Имя фрагмента
+    :param obj: Объект, от которого зависит фрагмент
+    :param vary_on: Дополнительные значения, от которых зависит фрагмент
+    :param namespace_name: Пространство имен (по умолчанию - пространство имен obj)
+    :return:
+    """
+    namespace_name = namespace_name or namespace(obj)
+    parts = [namespace_name, str(get_version(namespace_name))]
+    if obj is not None:
+        parts.append(get_stamp(obj))
+    parts.extend(str(value) for value in vary_on)
+    digest = hashlib.md5(':'.join(parts).encode()).hexdigest()
+    return f'{KEY_PREFIX}:fragment:{name}:{digest}'
+
+
+def stats_key(name: str, result: str) -> str:
+    return f'{KEY_PREFIX}:stats:{name}:{result}'
+
+
+def record(name: str, hit: bool):
+    key = stats_key(name, 'hits' if hit else 'misses')
+    if not cache.add(key, 1, timeout=None):
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, 1, timeout=None)
+
+
+def get_or_render(name: str, key: str, render):
+    """
+    Возвращает значение из кеша или вычисляет его функцией render и сохраняет
+    :param name: Имя фрагмента для статистики
+    :param key:
+    :param render:
+    :return:
+    """
+    value = cache.get(key)
+    record(name, value is not None)
+    if value is None:
+        value = render()
+        cache.set(key, value)
+    return value
+
+
+def get_stats() -> dict:
+    """
+    Возвращает статистику попаданий и промахов по фрагментам, сессиям и пользователям
+    :return: {имя: {'hits', 'misses', 'hit_ratio'}}
+    """
+    keys = [stats_key(name, result) for name in STATS for result in ('hits', 'misses')]
+    values = cache.get_many(keys)
+    stats = {}
+    for name in STATS:
+        hits = values.get(stats_key(name, 'hits'), 0)
+        misses = values.get(stats_key(name, 'misses'), 0)
+        stats[name] = {
+            'hits': hits,
+            'misses': misses,
+            'hit_ratio': round(hits / (hits + misses), 3) if hits + misses else None,
+        }
+    return stats
+
+
+def reset_stats():
+    cache.delete_many([stats_key(name, result) for name in STATS for result in ('hits', 'misses')])
+
+
+class CachedPageMixin:
+    """
+    Миксин для списков с курсорной пагинацией, который кеширует страницу записей.
+    Ключ зависит от версии cache_namespace и всех GET-параметров (фильтры, сортировка, курсор)
+    """
+    cache_fragment = 'company_list'
+    cache_namespace = COMPANY_LIST
+
+    def paginate_queryset(self, queryset, page_size):
+        """
+        Переопределенный метод, который берет страницу из кеша
+        :param queryset:
+        :param page_size:
+        :return:
+        """
+        query = sorted(self.request.GET.lists())
+        key = fragment_key(self.cache_fragment, None, query, page_size, namespace_name=self.cache_namespace)
+        page = get_or_render(self.cache_fragment, key,
+                             lambda: super(CachedPageMixin, self).paginate_queryset(queryset, page_size)[1])
+        return None, page, page.object_list, page.has_other_pages()
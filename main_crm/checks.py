@@ -0,0 +1,32 @@
+"""
+Системные проверки настроек main_crm
+"""
+from django.conf import settings
+from django.core import checks
+
+# Кеш, который хранит данные в памяти процесса и не виден другим процессам сервера
+LOCAL_CACHE_BACKEND = 'django.core.cache.backends.locmem.LocMemCache'
+
+CACHED_SESSION_ENGINE = 'main_crm.sessions'
+CACHED_AUTH_BACKEND = 'main_crm.auth.CachedModelBackend'
+
+
+@checks.register(checks.Tags.caches)
+def check_session_cache(app_configs, **kwargs):
+    """
+    Кешированные сессии и пользователь сессии требуют общего для всех процессов кеша: с LocMemCache выход,
+    смена пароля или блокировка пользователя в одном процессе не доходят до остальных до истечения записи кеша
+    """
+    settings_names = []
+    if settings.SESSION_ENGINE == CACHED_SESSION_ENGINE:
+        settings_names.append('SESSION_ENGINE')
+    if CACHED_AUTH_BACKEND in settings.AUTHENTICATION_BACKENDS:
+        settings_names.append('AUTHENTICATION_BACKENDS')
+    if not settings_names or settings.CACHES['default']['BACKEND'] != LOCAL_CACHE_BACKEND:
+        return []
+    return [checks.Error(
+        f'{" и ".join(settings_names)} используют кеш {LOCAL_CACHE_BACKEND}, который не общий для процессов сервера',
+        hint='Настройте общий кеш (например, django.core.cache.backends.redis.RedisCache) или используйте '
+             'сессии в базе данных и django.contrib.auth.backends.ModelBackend',
+        id='main_crm.E001',
+    )]
@@ -0,0 +1,119 @@
+"""
+Условные GET-запросы (ETag / Last-Modified): неизмененная страница возвращается ответом 304
+без загрузки записей и рендеринга шаблона.
+Для детальных страниц ETag строится из отметки времени изменения объекта и версии его пространства
+имен в кеше (main_crm.caching), для списков - из одного агрегата по отфильтрованному queryset
+(количество записей и максимальные отметки времени), GET-параметров и версии списка.
+"""
+import hashlib
+import posixpath
+from pathlib import Path
+
+from django.core.exceptions import SuspiciousFileOperation
+from django.db.models import Count, Max
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+from django.views import static
+
+from . import caching
+
+
+def make_etag(*parts) -> str:
+    return quote_etag(hashlib.md5(':'.join(str(part) for part in parts).encode()).hexdigest())
+
+
+def set_validators(response, etag: str, last_modified=None):
+    response.headers['ETag'] = etag
+    if last_modified is not None:
+        response.headers['Last-Modified'] = http_date(last_modified)
+    return response
+
+
+class ConditionalGetMixin:
+    """
+    Миксин для контроллеров, который отвечает 304 на условный GET-запрос, если страница не изменилась.
+    Списки описывают сигнатуру атрибутом signature_fields: поля, максимум которых входит в ETag
+    вместе с количеством записей. Детальные страницы переопределяют get_etag_parts
+    """
+    signature_fields = ()
+    signature_namespace = caching.COMPANY_LIST
+
+    def get_signature_queryset(self):
+        """
+        Метод для получения queryset, по которому считается сигнатура списка (с фильтрами FilterView)
+        :return:
+        """
+        queryset = self.get_queryset()
+        filterset_class = getattr(self, 'filterset_class', None)
+        if filterset_class is None:
+            return queryset
+        filterset = filterset_class(self.request.GET or None, queryset=queryset, request=self.request)
+        if filterset.is_bound and not filterset.is_valid():
+            return queryset.none()
+        return filterset.qs
+
+    def get_etag_parts(self):
+        """
+        Метод для получения значений, от которых зависит страница; None - страница не поддерживает условный GET
+        :return:
+        """
+        aggregates = {'count': Count('pk')}
+        aggregates.update({f'max_{field}': Max(field) for field in self.signature_fields})
+        signature = self.get_signature_queryset().order_by().aggregate(**aggregates)
+        return [sorted(self.request.GET.lists()), caching.get_version(self.signature_namespace),
+                *signature.values()]
+
+    def get_last_modified(self):
+        """
+        Метод для получения времени последнего изменения страницы (datetime) или None
+        :return:
+        """
+        return None
+
+    def get(self, request, *args, **kwargs):
+        """
+        Переопределенный метод, который проверяет If-None-Match/If-Modified-Since до загрузки записей
+        :param request:
+        :param args:
+        :param kwargs:
+        :return:
+        """
+        parts = self.get_etag_parts()
+        if parts is None:
+            return super().get(request, *args, **kwargs)
+
+        etag = make_etag(request.user.pk, *parts)
+        last_modified = self.get_last_modified()
+        timestamp = int(last_modified.timestamp()) if last_modified else None
+
+        response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+        if response is None:
+            response = super().get(request, *args, **kwargs)
+        patch_cache_control(response, private=True, no_cache=True)
+        return set_validators(response, etag, timestamp)
+
+
+def serve(request, path, document_root=None, show_indexes=False):
+    """
+    Контроллер для раздачи статических и медиа файлов с ETag по времени изменения и размеру файла
+    :param request:
+    :param path:
+    :param document_root:
+    :param show_indexes:
+    :return:
+    """
+    try:
+        fullpath = Path(safe_join(document_root, posixpath.normpath(path).lstrip('/')))
+        stat = fullpath.stat() if fullpath.is_file() else None
+    except (OSError, SuspiciousFileOperation):
+        stat = None
+    if stat is None:
+        return static.serve(request, path, document_root, show_indexes)
+
+    etag = quote_etag(f'{stat.st_mtime_ns:x}-{stat.st_size:x}')
+    response = get_conditional_response(request, etag=etag, last_modified=int(stat.st_mtime))
+    if response is None:
+        response = static.serve(request, path, document_root, show_indexes)
+    patch_cache_control(response, no_cache=True)
+    return set_validators(response, etag, int(stat.st_mtime))
@@ -1,5 +1,8 @@
 INDEX_PAGINATE_BY = 4
 
+# Длина начала описания простым текстом, которое хранится для списков
+DESCRIPTION_EXCERPT_LENGTH = 255
+
 CHANNELS = (
     ('r', 'Заявка'),
     ('l', 'Письмо'),
@@ -14,3 +17,10 @@ MARKS = (
     ('4', 'Хорошо'),
     ('5', 'Отлично'),
 )
+
+JOB_STATUSES = (
+    ('q', 'В очереди'),
+    ('r', 'Выполняется'),
+    ('d', 'Выполнено'),
+    ('f', 'Ошибка'),
+)
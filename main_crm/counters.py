@@ -0,0 +1,184 @@
+"""
+Поддержка денормализованных счетчиков Company и Project (см. models.ActivityCounters).
+Счетчики изменяются инкрементально через F-выражения в той же транзакции, что и запись
+взаимодействия или проекта, поэтому обработчики POST контроллеров, которые пишут эти модели, обернуты в
+transaction.atomic (GET формы транзакцию не открывает: BEGIN IMMEDIATE берет блокировку записи).
+Вместе со счетчиками обновляется updated_at строки: от него зависят ETag страниц (main_crm.conditional).
+"""
+from django.apps import apps as global_apps
+from django.db.models import F, Max, Sum, Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .const import MARKS
+from .models import Company, Project, Interaction
+
+
+def mark_field(mark: str) -> str:
+    return f'mark_{mark}_count'
+
+
+def change_interaction_counters(project, mark: str, delta: int, updated_at=None):
+    """
+    Изменяет счетчики проекта и его компании на delta взаимодействий с оценкой mark
+    :param project:
+    :param mark:
+    :param delta: 1 - взаимодействие добавлено, -1 - удалено
+    :param updated_at: Время изменения добавленного взаимодействия
+    :return:
+    """
+    changes = {
+        'interaction_count': F('interaction_count') + delta,
+        mark_field(mark): F(mark_field(mark)) + delta,
+        'updated_at': timezone.now(),
+    }
+    if updated_at:
+        changes['last_interaction_at'] = updated_at
+    Project.objects.filter(pk=project.pk).update(**changes)
+    Company.objects.filter(pk=project.user_id).update(**changes)
+
+
+def change_mark_counters(project, old_mark: str, new_mark: str, updated_at):
+    """
+    Переносит взаимодействие из одной оценки в другую при его редактировании
+    :param project:
+    :param old_mark:
+    :param new_mark:
+    :param updated_at:
+    :return:
+    """
+    changes = {'last_interaction_at': updated_at, 'updated_at': timezone.now()}
+    if old_mark != new_mark:
+        changes[mark_field(old_mark)] = F(mark_field(old_mark)) - 1
+        changes[mark_field(new_mark)] = F(mark_field(new_mark)) + 1
+    Project.objects.filter(pk=project.pk).update(**changes)
+    Company.objects.filter(pk=project.user_id).update(**changes)
+
+
+def refresh_last_interaction(project, removed_at):
+    """
+    Пересчитывает время последнего взаимодействия после удаления, только если удалено последнее
+    :param project:
+    :param removed_at: Время изменения удаленного взаимодействия
+    :return:
+    """
+    latest = Interaction.objects.order_by('-updated_at').values('updated_at')
+    now = timezone.now()
+    Project.objects.filter(pk=project.pk, last_interaction_at__lte=removed_at).update(
+        last_interaction_at=Subquery(latest.filter(project=OuterRef('pk'))[:1]), updated_at=now,
+    )
+    Company.objects.filter(pk=project.user_id, last_interaction_at__lte=removed_at).update(
+        last_interaction_at=Subquery(latest.filter(project__user=OuterRef('pk'))[:1]), updated_at=now,
+    )
+
+
+def move_interaction_counters(interaction, old_project_id: int, old_mark: str, old_updated_at):
+    """
+    Переносит взаимодействие в счетчиках из прежнего проекта (и его компании) в текущий
+    :param interaction:
+    :param old_project_id:
+    :param old_mark: Оценка до изменения
+    :param old_updated_at: Время изменения до сохранения
+    :return:
+    """
+    old_project = Project.objects.only('pk', 'user').filter(pk=old_project_id).first()
+    if old_project is not None:
+        change_interaction_counters(old_project, old_mark, -1)
+        refresh_last_interaction(old_project, old_updated_at)
+    change_interaction_counters(interaction.project, interaction.mark, 1, interaction.updated_at)
+
+
+def refresh_company_last_interaction(company_ids: list):
+    """
+    Пересчитывает время последнего взаимодействия компаний по их проектам
+    :param company_ids:
+    :return:
+    """
+    company_projects = Project.objects.filter(user=OuterRef('pk')).values('user')
+    Company.objects.filter(pk__in=company_ids).update(last_interaction_at=Subquery(
+        company_projects.order_by().annotate(value=Max('last_interaction_at')).values('value')
+    ), updated_at=timezone.now())
+
+
+def move_project_counters(project, old_company_id: int, old_cost: int):
+    """
+    Переносит проект вместе со счетчиками его взаимодействий из прежней компании в текущую
+    :param project:
+    :param old_company_id:
+    :param old_cost: Затраты на проект до изменения
+    :return:
+    """
+    counts = {'interaction_count': project.interaction_count}
+    now = timezone.now()
+    counts.update({mark_field(mark): getattr(project, mark_field(mark)) for mark, _ in MARKS})
+    Company.objects.filter(pk=old_company_id).update(
+        project_count=F('project_count') - 1,
+        total_cost=F('total_cost') - old_cost,
+        updated_at=now,
+        **{name: F(name) - value for name, value in counts.items()}
+    )
+    Company.objects.filter(pk=project.user_id).update(
+        project_count=F('project_count') + 1,
+        total_cost=F('total_cost') + (project.cost or 0),
+        updated_at=now,
+        **{name: F(name) + value for name, value in counts.items()}
+    )
+    refresh_company_last_interaction([old_company_id, project.user_id])
+
+
+def change_project_counters(project, delta: int, cost_delta: int):
+    """
+    Изменяет количество проектов и суммарные затраты компании
+    :param project:
+    :param delta: 1 - проект добавлен, -1 - удален, 0 - изменен
+    :param cost_delta:
+    :return:
+    """
+    Company.objects.filter(pk=project.user_id).update(
+        project_count=F('project_count') + delta,
+        total_cost=F('total_cost') + cost_delta,
+        updated_at=timezone.now(),
+    )
+
+
+def recompute_counters(apps=global_apps, companies=None):
+    """
+    Полный пересчет счетчиков агрегатами: по одному UPDATE для проектов и компаний
+    :param apps: Реестр моделей (в миграциях передается исторический)
+    :param companies: Queryset компаний для пересчета, None - все
+    :return: Количество пересчитанных компаний
+    """
+    Company = apps.get_model('main_crm', 'Company')
+    Project = apps.get_model('main_crm', 'Project')
+    Interaction = apps.get_model('main_crm', 'Interaction')
+
+    if companies is None:
+        companies = Company.objects.all()
+    projects = Project.objects.filter(user__in=companies.values('pk'))
+
+    def aggregate(queryset, expression):
+        return Coalesce(
+            Subquery(queryset.order_by().annotate(value=expression).values('value')),
+            Value(0),
+        )
+
+    now = timezone.now()
+    interactions = Interaction.objects.filter(project=OuterRef('pk')).values('project')
+    projects.update(
+        updated_at=now,
+        interaction_count=aggregate(interactions, Count('pk')),
+        last_interaction_at=Subquery(interactions.order_by().annotate(value=Max('updated_at')).values('value')),
+        **{mark_field(mark): aggregate(interactions.filter(mark=mark), Count('pk')) for mark, _ in MARKS}
+    )
+
+    company_projects = Project.objects.filter(user=OuterRef('pk')).values('user')
+    return companies.update(
+        updated_at=now,
+        project_count=aggregate(company_projects, Count('pk')),
+        total_cost=aggregate(company_projects, Sum('cost')),
+        interaction_count=aggregate(company_projects, Sum('interaction_count')),
+        last_interaction_at=Subquery(
+            company_projects.order_by().annotate(value=Max('last_interaction_at')).values('value')
+        ),
+        **{mark_field(mark): aggregate(company_projects, Sum(mark_field(mark))) for mark, _ in MARKS}
+    )
@@ -0,0 +1,427 @@
+"""
+Генерация синтетических данных для бенчмарков и нагрузочных тестов.
+Создаются менеджеры, компании с названиями и ФИО на русском языке (слаги через unidecode),
+от 0 до N телефонов и адресов почты, проекты с корректными датами начала и окончания
+и взаимодействия с неравномерным распределением по проектам, менеджерам, каналам и оценкам.
+Записи вставляются пачками через bulk_create (без сигналов), даты в прошлом проставляются в обход
+auto_now/auto_now_add (backdated). Взаимодействия, которых на порядки больше, вставляются готовыми строками
+через executemany частями с заранее выделенными диапазонами id, которые можно создавать параллельно в процессах.
+После вставки одним проходом пересчитываются счетчики, полнотекстовый индекс и агрегаты аналитики.
+Один и тот же seed и масштаб дают одинаковые данные независимо от количества процессов.
+"""
+import datetime
+import itertools
+import random
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager, nullcontext
+from multiprocessing import Lock
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.color import no_style
+from django.db import connection, connections, models, transaction
+from django.utils import timezone
+
+from . import analytics, counters, richtext, search
+from .models import Company, Phone, Email, Project, Interaction, Profile, User
+from .utils import slugify
+
+# На сколько взаимодействий приходится одна компания, один проект и один менеджер
+INTERACTIONS_PER_COMPANY = 100
+INTERACTIONS_PER_PROJECT = 20
+INTERACTIONS_PER_MANAGER = 1000
+MIN_MANAGERS = 5
+
+MANAGER_PASSWORD = 'benchmark-password'
+
+START_DATE = datetime.date(2015, 1, 1)
+
+# Количество взаимодействий в одной части, которая вставляется одним процессом
+CHUNK_SIZE = 50000
+
+# Доли каналов и оценок: заявок и хороших оценок больше всего
+CHANNEL_WEIGHTS = {'r': 45, 'l': 30, 'w': 20, 'i': 5}
+MARK_WEIGHTS = {'1': 4, '2': 8, '3': 20, '4': 38, '5': 30}
+
+# Показатели распределения Парето для нагрузки: чем меньше, тем сильнее перекос
+PROJECT_SKEW = 1.2
+COMPANY_SKEW = 1.5
+MANAGER_SKEW = 1.0
+
+LEGAL_FORMS = ('ООО', 'АО', 'ПАО', 'ЗАО', 'ИП')
+NAME_ADJECTIVES = (
+    'Северная', 'Южная', 'Восточная', 'Западная', 'Первая', 'Новая', 'Волжская', 'Уральская', 'Сибирская',
+    'Балтийская', 'Городская', 'Народная', 'Торговая', 'Строительная', 'Транспортная', 'Инженерная', 'Цифровая',
+    'Промышленная', 'Золотая', 'Красная',
+)
+NAME_NOUNS = (
+    'Звезда', 'Линия', 'Компания', 'Гавань', 'Мануфактура', 'Сеть', 'Артель', 'Слобода', 'Мастерская', 'Фабрика',
+    'Верфь', 'Лаборатория', 'Марка', 'Пристань', 'Долина', 'Станция', 'Палата', 'Ярмарка', 'Галерея', 'Роща',
+)
+SURNAMES = ('Иванов', 'Смирнов', 'Кузнецов', 'Попов', 'Васильев', 'Петров', 'Соколов', 'Михайлов', 'Новиков',
+            'Федоров', 'Морозов', 'Волков', 'Алексеев', 'Лебедев', 'Семенов', 'Егоров')
+MALE_NAMES = ('Александр', 'Дмитрий', 'Максим', 'Сергей', 'Андрей', 'Алексей', 'Артем', 'Илья', 'Кирилл', 'Михаил')
+FEMALE_NAMES = ('Анна', 'Мария', 'Елена', 'Ольга', 'Наталья', 'Татьяна', 'Ирина', 'Екатерина', 'Светлана', 'Юлия')
+PATRONYMICS = ('Александров', 'Дмитриев', 'Сергеев', 'Андреев', 'Алексеев', 'Михайлов', 'Иванов', 'Петров')
+PROJECT_KINDS = ('Внедрение', 'Разработка', 'Поддержка', 'Аудит', 'Модернизация', 'Поставка', 'Обучение персонала',
+                 'Миграция', 'Проектирование', 'Сопровождение')
+PROJECT_OBJECTS = ('CRM', 'склада', 'сайта', 'мобильного приложения', 'бухгалтерии', 'call-центра', 'сети филиалов',
+                   'документооборота', 'логистики', 'отчетности')
+DESCRIPTION_SENTENCES = (
+    'Клиент запросил коммерческое предложение.',
+    'Обсудили сроки и стоимость работ.',
+    'Договор отправлен на согласование юристам.',
+    'Счет выставлен, ожидаем оплату.',
+    'Назначена встреча с руководством компании.',
+    'Подготовлен отчет о ходе проекта.',
+    'Клиент доволен результатом первого этапа.',
+    'Есть замечания по качеству документации.',
+    'Требуется уточнить техническое задание.',
+    'Передали контакты ответственного инженера.',
+)
+EMAIL_BOXES = ('info', 'sales', 'office', 'zakaz', 'hello')
+EMAIL_DOMAINS = ('mail.ru', 'yandex.ru', 'gmail.com', 'bk.ru', 'list.ru')
+
+# Размер кеша страниц SQLite в KiB для соединений, которые вставляют взаимодействия: при стандартных 2 МБ
+# вставка в несколько индексов упирается в чтение страниц с диска
+SQLITE_CACHE_KIB = 256 * 1024
+
+# Поля взаимодействия в порядке значений строки, которую создает insert_interactions
+INTERACTION_FIELDS = ('id', 'project_id', 'manager_id', 'channel', 'mark', 'description', 'description_html',
+                      'description_excerpt', 'created_at', 'updated_at')
+
+# Данные процесса, который вставляет взаимодействия (заполняются init_worker)
+worker_context = None
+
+
+def get_sizes(interactions: int) -> dict:
+    return {
+        'companies': max(interactions // INTERACTIONS_PER_COMPANY, 1),
+        'projects': max(interactions // INTERACTIONS_PER_PROJECT, 1),
+        'managers': max(interactions // INTERACTIONS_PER_MANAGER, MIN_MANAGERS),
+        'interactions': interactions,
+    }
+
+
+@contextmanager
+def backdated(*model_classes):
+    """
+    Отключает auto_now и auto_now_add у полей дат моделей, чтобы сохранялись заданные значения
+    :param model_classes:
+    :return:
+    """
+    fields = [
+        (field, field.auto_now, field.auto_now_add)
+        for model in model_classes for field in model._meta.concrete_fields
+        if isinstance(field, models.DateField) and (field.auto_now or field.auto_now_add)
+    ]
+    for field, _, _ in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in fields:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def bulk_insert(model, rows, batch_size: int, progress=None) -> list:
+    """
+    Создает записи пачками
+    :param model:
+    :param rows: Итератор несохраненных объектов
+    :param batch_size:
+    :param progress: Функция, которая вызывается с (имя модели, количество созданных записей)
+    :return: Первичные ключи созданных записей
+    """
+    ids = []
+    rows = iter(rows)
+    while True:
+        batch = list(itertools.islice(rows, batch_size))
+        if not batch:
+            break
+        ids.extend(obj.pk for obj in model.objects.bulk_create(batch))
+        if progress:
+            progress(model.__name__, len(ids))
+    return ids
+
+
+def get_cum_weights(rng: random.Random, count: int, skew: float) -> list:
+    """
+    Возвращает накопленные веса count элементов, распределенные по Парето (для random.choices)
+    :param rng:
+    :param count:
+    :param skew:
+    :return:
+    """
+    return list(itertools.accumulate(rng.paretovariate(skew) for _ in range(count)))
+
+
+def random_date(rng: random.Random, start: datetime.date, end: datetime.date) -> datetime.date:
+    return start + datetime.timedelta(days=rng.randrange(max((end - start).days, 0) + 1))
+
+
+def make_fio(rng: random.Random) -> str:
+    surname, patronymic = rng.choice(SURNAMES), rng.choice(PATRONYMICS)
+    if rng.random() < 0.5:
+        return f'{surname} {rng.choice(MALE_NAMES)} {patronymic}ич'
+    return f'{surname}а {rng.choice(FEMALE_NAMES)} {patronymic}на'
+
+
+def make_descriptions(rng: random.Random, count: int = 50) -> list:
+    """
+    Возвращает описания вместе с производными полями, чтобы HTML не обрабатывался для каждой записи
+    :param rng:
+    :param count:
+    :return: Список (description, description_html, description_excerpt)
+    """
+    descriptions = []
+    for _ in range(count):
+        description = ''.join(
+            f'<p>{" ".join(rng.sample(DESCRIPTION_SENTENCES, rng.randint(1, 4)))}</p>'
+            for _ in range(rng.randint(1, 3))
+        )
+        description_html = richtext.sanitize_html(description)
+        descriptions.append((description, description_html, richtext.make_excerpt(description_html)))
+    return descriptions
+
+
+def generate_managers(rng: random.Random, count: int, batch_size: int, progress=None) -> list:
+    """
+    Создает менеджеров-суперпользователей с паролем MANAGER_PASSWORD и их профили
+    :return: Первичные ключи менеджеров
+    """
+    password = make_password(MANAGER_PASSWORD)
+    first = (User.objects.aggregate(value=models.Max('pk'))['value'] or 0) + 1
+
+    def make_manager(i):
+        return User(username=f'manager{first + i}', email=f'manager{first + i}@example.com', password=password,
+                    first_name=rng.choice(MALE_NAMES), last_name=rng.choice(SURNAMES),
+                    is_staff=True, is_superuser=True)
+
+    manager_ids = bulk_insert(User, (make_manager(i) for i in range(count)), batch_size, progress)
+    bulk_insert(Profile, (Profile(user_id=pk) for pk in manager_ids), batch_size, progress)
+    return manager_ids
+
+
+def generate_companies(rng: random.Random, count: int, max_contacts: int, descriptions: list, today: datetime.date,
+                       batch_size: int, progress=None) -> tuple:
+    """
+    Создает компании с уникальными названиями и слагами, их телефоны и адреса почты
+    :return: (первичные ключи компаний, даты публикации, количество телефонов, количество адресов)
+    """
+    names = set(Company.objects.values_list('company_name', flat=True))
+    slugs = set(Company.objects.values_list('slug', flat=True))
+    published = []
+
+    def make_company(i):
+        name = f'{rng.choice(LEGAL_FORMS)} «{rng.choice(NAME_ADJECTIVES)} {rng.choice(NAME_NOUNS)}»'
+        if name in names:
+            name = f'{name} {i + 1}'
+        slug = slugify(name)
+        if slug in slugs:
+            slug = f'{slug}-{i + 1}'
+        names.add(name)
+        slugs.add(slug)
+        date = random_date(rng, START_DATE, today)
+        published.append(date)
+        description, description_html, excerpt = rng.choice(descriptions)
+        edited = random_date(rng, date, today)
+        return Company(company_name=name, slug=slug, fio=make_fio(rng), description=description,
+                       description_html=description_html, description_excerpt=excerpt,
+                       published=date, edited=edited,
+                       updated_at=timezone.make_aware(datetime.datetime.combine(edited, datetime.time.min)))
+
+    with backdated(Company):
+        company_ids = bulk_insert(Company, (make_company(i) for i in range(count)), batch_size, progress)
+
+    def make_phone(pk):
+        return Phone(user_id=pk, phone=f'+7 9{rng.randrange(100):02d} {rng.randrange(1000):03d}-'
+                                       f'{rng.randrange(100):02d}-{rng.randrange(100):02d}')
+
+    def make_email(pk):
+        return Email(user_id=pk, email=f'{rng.choice(EMAIL_BOXES)}{pk}@{rng.choice(EMAIL_DOMAINS)}')
+
+    phones = bulk_insert(Phone, (make_phone(pk) for pk in company_ids for _ in range(rng.randint(0, max_contacts))),
+                         batch_size, progress)
+    emails = bulk_insert(Email, (make_email(pk) for pk in company_ids for _ in range(rng.randint(0, max_contacts))),
+                         batch_size, progress)
+    return company_ids, published, len(phones), len(emails)
+
+
+def generate_projects(rng: random.Random, count: int, company_ids: list, published: list, descriptions: list,
+                      today: datetime.date, batch_size: int, progress=None) -> list:
+    """
+    Создает проекты, неравномерно распределенные по компаниям. Проект начинается не раньше публикации
+    компании и заканчивается не раньше начала (Project.clean), часть проектов не завершена
+    :return: Список (id проекта, порядковый номер даты начала, длительность в днях)
+    """
+    companies = range(len(company_ids))
+    weights = get_cum_weights(rng, len(company_ids), COMPANY_SKEW)
+    spans = []
+
+    def make_project():
+        index = rng.choices(companies, cum_weights=weights)[0]
+        started_at = random_date(rng, published[index], today)
+        finished_at = None if rng.random() < 0.2 else started_at + datetime.timedelta(days=rng.randrange(7, 540))
+        spans.append((started_at.toordinal(), (min(finished_at or today, today) - started_at).days))
+        description, description_html, excerpt = rng.choice(descriptions)
+        return Project(user_id=company_ids[index], title=f'{rng.choice(PROJECT_KINDS)} {rng.choice(PROJECT_OBJECTS)}',
+                       started_at=started_at, finished_at=finished_at, cost=int(rng.lognormvariate(12, 1.5)),
+                       description=description, description_html=description_html, description_excerpt=excerpt)
+
+    project_ids = bulk_insert(Project, (make_project() for _ in range(count)), batch_size, progress)
+    return [(pk, start, span) for pk, (start, span) in zip(project_ids, spans)]
+
+
+def init_worker(context: dict):
+    global worker_context
+    worker_context = context
+
+
+def insert_rows(model, fields: tuple, rows: list):
+    """
+    Вставляет готовые значения столбцов одним executemany, без построения SQL для каждого объекта
+    :param model:
+    :param fields: Имена полей (attname)
+    :param rows: Кортежи значений в формате базы данных
+    :return:
+    """
+    opts = model._meta
+    columns = ', '.join(connection.ops.quote_name(opts.get_field(name).column) for name in fields)
+    placeholders = ', '.join(['%s'] * len(fields))
+    with connection.cursor() as cursor:
+        cursor.executemany(f'INSERT INTO {connection.ops.quote_name(opts.db_table)} ({columns}) '
+                           f'VALUES ({placeholders})', rows)
+
+
+def insert_interactions(number: int, first_id: int, count: int) -> int:
+    """
+    Вставляет часть взаимодействий с id начиная с first_id. Случайные значения зависят только от seed и номера части
+    :param number: Номер части
+    :param first_id:
+    :param count:
+    :return: Количество вставленных записей
+    """
+    context = worker_context
+    rng = random.Random(f"{context['seed']}-{number}")
+    projects, managers, descriptions, now = (context['projects'], context['managers'], context['descriptions'],
+                                             context['now'])
+    channels, channel_weights = zip(*CHANNEL_WEIGHTS.items())
+    marks, mark_weights = zip(*MARK_WEIGHTS.items())
+    adapt_datetime = connection.ops.adapt_datetimefield_value
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA cache_size = -{SQLITE_CACHE_KIB}')
+
+    def make_rows(first: int, size: int) -> list:
+        # Случайный выбор по весам делается сразу для всей пачки: так он в разы быстрее, чем по одной записи
+        rows = []
+        for pk, (project_id, start, span), manager_id, channel, mark, description in zip(
+            range(first, first + size),
+            rng.choices(projects, cum_weights=context['project_weights'], k=size),
+            rng.choices(managers, cum_weights=context['manager_weights'], k=size),
+            rng.choices(channels, channel_weights, k=size),
+            rng.choices(marks, mark_weights, k=size),
+            rng.choices(descriptions, k=size),
+        ):
+            created_at = min(now, datetime.datetime.combine(
+                datetime.date.fromordinal(start + int(rng.random() * (span + 1))), datetime.time.min,
+                tzinfo=datetime.timezone.utc,
+            ) + datetime.timedelta(seconds=rng.randrange(8 * 3600, 20 * 3600)))
+            updated_at = created_at
+            if rng.random() < 0.3:
+                updated_at = min(now, created_at + datetime.timedelta(minutes=rng.randrange(10 * 24 * 60)))
+            rows.append((pk, project_id, manager_id, channel, mark, *description, adapt_datetime(created_at),
+                         adapt_datetime(updated_at)))
+        return rows
+
+    for start in range(0, count, context['batch_size']):
+        rows = make_rows(first_id + start, min(context['batch_size'], count - start))
+        with context['lock'] or nullcontext(), transaction.atomic():
+            insert_rows(Interaction, INTERACTION_FIELDS, rows)
+    return count
+
+
+def generate_interactions(rng: random.Random, count: int, projects: list, manager_ids: list, descriptions: list,
+                          seed: int, batch_size: int, workers: int = 1, progress=None) -> int:
+    """
+    Создает взаимодействия частями по CHUNK_SIZE. Части получают непересекающиеся диапазоны id,
+    поэтому при workers > 1 создаются параллельно в отдельных процессах. SQLite допускает одну пишущую
+    транзакцию, поэтому для нее процессы вставляют готовые пачки по очереди под общей блокировкой
+    :return: Количество созданных взаимодействий
+    """
+    parallel = workers > 1 and count > CHUNK_SIZE
+    context = {
+        'seed': seed,
+        'projects': projects,
+        'project_weights': get_cum_weights(rng, len(projects), PROJECT_SKEW),
+        'managers': manager_ids,
+        'manager_weights': get_cum_weights(rng, len(manager_ids), MANAGER_SKEW),
+        'descriptions': descriptions,
+        'batch_size': batch_size,
+        # Даты ограничены началом текущего дня, чтобы повторный запуск в тот же день давал те же данные
+        'now': timezone.now().replace(hour=0, minute=0, second=0, microsecond=0),
+        'lock': Lock() if parallel and connection.vendor == 'sqlite' else None,
+    }
+    first_id = (Interaction.objects.aggregate(value=models.Max('pk'))['value'] or 0) + 1
+    chunks = [(number, first_id + start, min(CHUNK_SIZE, count - start))
+              for number, start in enumerate(range(0, count, CHUNK_SIZE))]
+
+    total = 0
+    if parallel:
+        # Соединения с базой данных не должны наследоваться дочерними процессами
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(context,)) as executor:
+            for inserted in executor.map(insert_interactions, *zip(*chunks)):
+                total += inserted
+                if progress:
+                    progress(Interaction.__name__, total)
+    else:
+        init_worker(context)
+        for chunk in chunks:
+            total += insert_interactions(*chunk)
+            if progress:
+                progress(Interaction.__name__, total)
+
+    # Явно заданные id не сдвигают последовательность первичного ключа в PostgreSQL и Oracle
+    with connection.cursor() as cursor:
+        for sql in connection.ops.sequence_reset_sql(no_style(), [Interaction]):
+            cursor.execute(sql)
+    return total
+
+
+def generate(interactions: int, seed: int = 0, batch_size: int = 5000, workers: int = 1, companies: int = None,
+             projects: int = None, managers: int = None, max_contacts: int = 3, progress=None) -> dict:
+    """
+    Заполняет базу данными масштаба interactions взаимодействий
+    :param interactions:
+    :param seed:
+    :param batch_size: Количество записей в одном INSERT
+    :param workers: Количество процессов для вставки взаимодействий
+    :param companies: Количество компаний (по умолчанию зависит от interactions)
+    :param projects: Количество проектов (по умолчанию зависит от interactions)
+    :param managers: Количество менеджеров (по умолчанию зависит от interactions)
+    :param max_contacts: Максимальное количество телефонов и адресов почты у компании
+    :param progress: Функция, которая вызывается с (имя модели, количество созданных записей)
+    :return: Количество созданных записей по моделям
+    """
+    rng = random.Random(seed)
+    sizes = get_sizes(interactions)
+    sizes.update({name: value for name, value in
+                  (('companies', companies), ('projects', projects), ('managers', managers)) if value})
+    today = timezone.localdate()
+    descriptions = make_descriptions(rng)
+
+    with transaction.atomic():
+        manager_ids = generate_managers(rng, sizes['managers'], batch_size, progress)
+        company_ids, published, sizes['phones'], sizes['emails'] = generate_companies(
+            rng, sizes['companies'], max_contacts, descriptions, today, batch_size, progress)
+        project_spans = generate_projects(rng, sizes['projects'], company_ids, published, descriptions, today,
+                                          batch_size, progress)
+
+    generate_interactions(rng, interactions, project_spans, manager_ids, descriptions, seed, batch_size, workers,
+                          progress)
+
+    counters.recompute_counters()
+    search.rebuild_index(batch_size=batch_size)
+    analytics.refresh_rollups(full=True)
+    return sizes
@@ -0,0 +1,212 @@
+"""
+Потоковая выгрузка взаимодействий, проектов и компаний в CSV или JSON Lines.
+Записи читаются пачками по pk (без OFFSET), связанные колонки выбираются тем же запросом,
+а результат отдается генератором, поэтому память не зависит от объема выгрузки.
+Django 4.0 под ASGI перебирает StreamingHttpResponse в цикле событий, где запросы ORM запрещены
+(SynchronousOnlyOperation), поэтому под ASGI выгрузка сначала записывается во временный файл (spool_export)
+в потоке контроллера, а затем отдается из файла.
+"""
+import csv
+import json
+import tempfile
+import zlib
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .filters import CompanyFilter, InteractionFilter
+from .models import Company, Project, Interaction
+from .utils import html_to_text
+
+FORMATS = {
+    'csv': 'text/csv',
+    'jsonl': 'application/x-ndjson',
+}
+
+CHUNK_SIZE = 2000
+
+# Размер выгрузки, после которого временный файл spool_export переносится из памяти на диск
+SPOOL_MAX_SIZE = 8 * 1024 * 1024
+
+
+class Export:
+    """
+    Описание выгрузки
+    атрибуты:
+        model (class): Модель;
+        filterset_class (class): FilterSet, применяемый к GET-параметрам;
+        columns (tuple): Пары (заголовок, поле для values_list);
+        text_columns (tuple): Заголовки rich-text колонок, которые выгружаются простым текстом;
+    """
+
+    def __init__(self, model, columns, filterset_class=None, text_columns=()):
+        self.model = model
+        self.columns = columns
+        self.filterset_class = filterset_class
+        self.text_columns = text_columns
+
+    @property
+    def headers(self) -> list:
+        return [header for header, _ in self.columns]
+
+    def get_queryset(self, data=None):
+        """
+        Возвращает queryset выгрузки с фильтрами, как в соответствующем списке
+        (недопустимые значения фильтров дают пустую выгрузку, как пустой список)
+        :param data: GET-параметры (QueryDict)
+        :return:
+        """
+        queryset = self.model.objects.all()
+        if self.filterset_class and data is not None:
+            filterset = self.filterset_class(data, queryset=queryset)
+            if not filterset.is_valid():
+                return queryset.none()
+            queryset = filterset.qs
+        return queryset
+
+    def iter_rows(self, queryset, chunk_size: int = CHUNK_SIZE):
+        """
+        Генератор строк выгрузки; каждая пачка - один запрос с условием pk > последнего pk
+        :param queryset:
+        :param chunk_size:
+        :return:
+        """
+        fields = [field for _, field in self.columns]
+        text_indexes = [i for i, header in enumerate(self.headers) if header in self.text_columns]
+        queryset = queryset.order_by('pk').values_list('pk', *fields)
+
+        last_pk = None
+        while True:
+            chunk = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+            rows = list(chunk[:chunk_size])
+            if not rows:
+                return
+            for row in rows:
+                row = list(row[1:])
+                for i in text_indexes:
+                    row[i] = html_to_text(row[i])
+                yield row
+            last_pk = rows[-1][0]
+
+
+EXPORTS = {
+    'interactions': Export(
+        Interaction,
+        columns=(
+            ('id', 'id'),
+            ('company', 'project__user__company_name'),
+            ('project', 'project__title'),
+            ('channel', 'channel'),
+            ('manager', 'manager__username'),
+            ('mark', 'mark'),
+            ('description', 'description'),
+            ('created_at', 'created_at'),
+            ('updated_at', 'updated_at'),
+        ),
+        filterset_class=InteractionFilter,
+        text_columns=('description',),
+    ),
+    'projects': Export(
+        Project,
+        columns=(
+            ('id', 'id'),
+            ('company', 'user__company_name'),
+            ('title', 'title'),
+            ('started_at', 'started_at'),
+            ('finished_at', 'finished_at'),
+            ('cost', 'cost'),
+            ('interaction_count', 'interaction_count'),
+        ),
+    ),
+    'companies': Export(
+        Company,
+        columns=(
+            ('id', 'id'),
+            ('company_name', 'company_name'),
+            ('slug', 'slug'),
+            ('fio', 'fio'),
+            ('published', 'published'),
+            ('edited', 'edited'),
+            ('project_count', 'project_count'),
+            ('interaction_count', 'interaction_count'),
+            ('total_cost', 'total_cost'),
+        ),
+        filterset_class=CompanyFilter,
+    ),
+}
+
+
+class Echo:
+    """
+    Псевдо-файл для csv.writer: возвращает записанную строку вместо буферизации
+    """
+
+    def write(self, value):
+        return value
+
+
+def render_csv(headers, rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(headers)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def render_jsonl(headers, rows):
+    for row in rows:
+        yield json.dumps(dict(zip(headers, row)), cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
+
+
+def gzip_stream(chunks, buffer_size: int = 64 * 1024):
+    """
+    Сжимает поток строк в gzip на лету, отдавая сжатые блоки примерно по buffer_size байт исходных данных
+    :param chunks:
+    :param buffer_size:
+    :return:
+    """
+    compressor = zlib.compressobj(6, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+    buffer = []
+    size = 0
+    for chunk in chunks:
+        data = chunk.encode()
+        buffer.append(data)
+        size += len(data)
+        if size >= buffer_size:
+            compressed = compressor.compress(b''.join(buffer))
+            buffer, size = [], 0
+            if compressed:
+                yield compressed
+    yield compressor.compress(b''.join(buffer)) + compressor.flush()
+
+
+def stream_export(export: Export, queryset, export_format: str = 'csv', compress: bool = False,
+                  chunk_size: int = CHUNK_SIZE):
+    """
+    Генератор содержимого выгрузки
+    :param export:
+    :param queryset:
+    :param export_format: csv или jsonl
+    :param compress: Сжать результат в gzip
+    :param chunk_size:
+    :return: Генератор строк (или байтов при compress=True)
+    """
+    render = render_jsonl if export_format == 'jsonl' else render_csv
+    content = render(export.headers, export.iter_rows(queryset, chunk_size))
+    return gzip_stream(content) if compress else content
+
+
+def spool_export(export: Export, queryset, export_format: str = 'csv', compress: bool = False,
+                 chunk_size: int = CHUNK_SIZE):
+    """
+    Записывает выгрузку во временный файл (в памяти до SPOOL_MAX_SIZE байт, затем на диске)
+    :param export:
+    :param queryset:
+    :param export_format: csv или jsonl
+    :param compress: Сжать результат в gzip
+    :param chunk_size:
+    :return: Файл, открытый на чтение с начала
+    """
+    file = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+    for chunk in stream_export(export, queryset, export_format, compress, chunk_size):
+        file.write(chunk if compress else chunk.encode())
+    file.seek(0)
+    return file
@@ -2,6 +2,7 @@ import django_filters as filters
 from django.contrib.auth.models import User
 from django.utils.translation import gettext_lazy as _
 
+from main_crm import search
 from main_crm.models import Company, Interaction
 
 
@@ -11,10 +12,15 @@ class MyOrderingFilter(filters.OrderingFilter):
 
 class CompanyFilter(filters.FilterSet):
     sort_by = MyOrderingFilter(
-        fields=('company_name', 'published'),
+        fields=('company_name', 'published', 'project_count', 'interaction_count', 'last_interaction_at',
+                'total_cost'),
         field_labels={
             'published': 'Дата публикации',
-            'company_name': 'Названию компании'
+            'company_name': 'Названию компании',
+            'project_count': 'Количеству проектов',
+            'interaction_count': 'Количеству взаимодействий',
+            'last_interaction_at': 'Последнему взаимодействию',
+            'total_cost': 'Затратам на проекты',
         }
     )
 
@@ -24,12 +30,44 @@ class CompanyFilter(filters.FilterSet):
 
 
 class InteractionFilter(filters.FilterSet):
+    q = filters.CharFilter(label='Поиск', method='filter_search')
     project__icontains = filters.CharFilter(label='Поиск по проекту', field_name='project__title',
-                                            lookup_expr='icontains')
+                                            lookup_expr='icontains', method='filter_search_column')
     company__icontains = filters.CharFilter(label='Поиск по компании', field_name='project__user__company_name',
-                                            lookup_expr='icontains')
+                                            lookup_expr='icontains', method='filter_search_column')
     manager = filters.ModelChoiceFilter(queryset=User.objects.filter(is_superuser=True))
 
     class Meta:
         model = Interaction
         fields = ['channel', 'manager', 'mark']
+
+    # Колонки полнотекстового индекса для фильтров по проекту и компании
+    search_columns = {
+        'project__title': 'project',
+        'project__user__company_name': 'company',
+    }
+
+    def filter_search(self, queryset, name, value):
+        """
+        Полнотекстовый поиск по компании, проекту и описанию с сортировкой по релевантности.
+        Слово со звездочкой на конце ищется по префиксу
+        :param queryset:
+        :param name:
+        :param value:
+        :return:
+        """
+        if not search.is_available():
+            return queryset.filter(description__icontains=value)
+        return search.search(queryset, value)
+
+    def filter_search_column(self, queryset, name, value):
+        """
+        Поиск по префиксам слов в одной колонке полнотекстового индекса вместо LIKE '%...%'
+        :param queryset:
+        :param name:
+        :param value:
+        :return:
+        """
+        if not search.is_available():
+            return queryset.filter(**{f'{name}__icontains': value})
+        return search.search(queryset, value, column=self.search_columns[name], prefix=True, ranked=False)
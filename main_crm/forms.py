@@ -3,12 +3,11 @@ from django.contrib.sites.shortcuts import get_current_site
 from django.core.exceptions import ValidationError
 from django.forms import ModelForm
 from django import forms
-from django.utils.encoding import force_bytes
-from django.utils.http import urlsafe_base64_encode
+from main_crm import tasks
 from main_crm.models import Company, Phone, Email, Project, Interaction, Profile, User
 from ckeditor_uploader.widgets import CKEditorUploadingWidget
 from django.forms import inlineformset_factory
-from django.contrib.auth.forms import UserCreationForm, PasswordResetForm, UserModel
+from django.contrib.auth.forms import UserCreationForm, PasswordResetForm
 from django.contrib.auth.forms import _
 
 
@@ -21,6 +20,20 @@ class CompanyForm(ModelForm):
         }
 
 
+class CompanyRowForm(CompanyForm):
+    """
+    Форма строки импорта компаний: уникальность названия проверяется импортом сразу для всей пачки
+    """
+
+    def validate_unique(self):
+        pass
+
+
+class CompanyImportForm(forms.Form):
+    file = forms.FileField(label='Файл CSV или XLSX')
+    batch_size = forms.IntegerField(label='Размер пачки', min_value=1, max_value=10000, initial=1000)
+
+
 class PhoneForm(ModelForm):
     class Meta:
         model = Phone
@@ -134,22 +147,12 @@ class ResetPasswordForm(PasswordResetForm):
             domain = current_site.domain
         else:
             site_name = domain = domain_override
-        email_field_name = UserModel.get_email_field_name()
         user = self.get_users(username)
-        user_email = getattr(user, email_field_name)
-        context = {
-            'email': user_email,
-            'domain': domain,
-            'site_name': site_name,
-            'uid': urlsafe_base64_encode(force_bytes(user.pk)),
-            'user': user,
-            'token': token_generator.make_token(user),
-            'protocol': 'https' if use_https else 'http',
-            **(extra_email_context or {}),
-        }
-        self.send_mail(
-            subject_template_name, email_template_name, context, from_email,
-            user_email, html_email_template_name=html_email_template_name,
+        # Письмо со ссылкой и токеном рендерится в фоновой задаче, в очереди хранится только id пользователя
+        tasks.enqueue_password_reset(
+            user.pk, subject_template_name, email_template_name, domain, site_name, use_https, token_generator,
+            from_email=from_email, html_email_template_name=html_email_template_name,
+            extra_email_context=extra_email_context,
         )
 
     def clean_username(self):
@@ -0,0 +1,113 @@
+"""
+Карта объектов запроса (identity map): каждый объект модели загружается не больше одного раза
+за запрос. Карта хранится в атрибуте запроса и содержит объекты по первичному ключу и по полю,
+по которому они были найдены (например, slug компании из ссылки), отдельно для каждого плана запроса:
+объект, загруженный с only()/defer() или без select_related, не возвращается тем, кто ожидает другой план.
+Контроллеры с одним объектом получают его через IdentityMapMixin, связанные объекты из ссылки
+(компания при создании проекта и т.п.) - через get_object_or_404.
+"""
+from django.shortcuts import get_object_or_404 as load_object_or_404
+
+REQUEST_ATTRIBUTE = '_identity_map'
+
+
+def freeze(value):
+    """
+    Приводит вложенные словари select_related к неизменяемому виду для ключа карты
+    :param value:
+    :return:
+    """
+    if isinstance(value, dict):
+        return tuple(sorted((key, freeze(item)) for key, item in value.items()))
+    return value
+
+
+def get_plan(queryset) -> tuple:
+    """
+    Возвращает план загрузки объектов queryset: загружаемые или отложенные поля (only/defer),
+    select_related и prefetch_related
+    :param queryset:
+    :return:
+    """
+    field_names, defer = queryset.query.deferred_loading
+    return (defer, tuple(sorted(field_names)), freeze(queryset.query.select_related),
+            tuple(str(lookup) for lookup in queryset._prefetch_related_lookups))
+
+
+class IdentityMap:
+    """
+    Объекты, загруженные во время одного запроса
+    """
+
+    def __init__(self):
+        self.objects = {}
+
+    @staticmethod
+    def make_key(model, field: str, value, plan: tuple) -> tuple:
+        return model._meta.label_lower, field, str(value), plan
+
+    def get(self, model, field: str, value, load, plan: tuple):
+        """
+        Возвращает объект из карты или загружает его функцией load и добавляет в карту
+        :param model:
+        :param field: Поле поиска ('pk', 'slug', ...)
+        :param value:
+        :param load: Функция без аргументов, которая загружает объект
+        :param plan: План загрузки (get_plan) queryset, из которого загружается объект
+        :return:
+        """
+        obj = self.objects.get(self.make_key(model, field, value, plan))
+        if obj is None:
+            obj = load()
+            self.add(obj, plan, field, value)
+        return obj
+
+    def add(self, obj, plan: tuple, field: str = None, value=None):
+        self.objects[self.make_key(type(obj), 'pk', obj.pk, plan)] = obj
+        if field is not None:
+            self.objects[self.make_key(type(obj), field, value, plan)] = obj
+
+
+def get_identity_map(request) -> IdentityMap:
+    identity_map = getattr(request, REQUEST_ATTRIBUTE, None)
+    if identity_map is None:
+        identity_map = IdentityMap()
+        setattr(request, REQUEST_ATTRIBUTE, identity_map)
+    return identity_map
+
+
+def get_object_or_404(request, queryset, **lookup):
+    """
+    Возвращает объект по одному полю из карты объектов запроса или из базы данных
+    :param request:
+    :param queryset: Queryset с планом запроса (select_related, only)
+    :param lookup: Поле и значение, например slug='company1'
+    :return:
+    """
+    (field, value), = lookup.items()
+    return get_identity_map(request).get(queryset.model, field, value,
+                                         lambda: load_object_or_404(queryset, **lookup), get_plan(queryset))
+
+
+class IdentityMapMixin:
+    """
+    Миксин для контроллеров с одним объектом (SingleObjectMixin): get_object возвращает объект
+    из карты объектов запроса, поэтому повторные вызовы (права доступа, контекст шаблона, обработка формы)
+    не выполняют запросов
+    """
+
+    def get_object(self, queryset=None):
+        """
+        Переопределенный метод для получения объекта из ссылки через карту объектов запроса
+        :param queryset:
+        :return:
+        """
+        load = super().get_object
+        if queryset is not None:
+            return load(queryset)
+        if self.pk_url_kwarg in self.kwargs:
+            field, value = 'pk', self.kwargs[self.pk_url_kwarg]
+        else:
+            field, value = self.get_slug_field(), self.kwargs.get(self.slug_url_kwarg)
+        queryset = self.get_queryset()
+        return get_identity_map(self.request).get(queryset.model, field, value, load, get_plan(queryset))
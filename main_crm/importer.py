@@ -0,0 +1,236 @@
+"""
+Пакетный импорт компаний с телефонами и адресами почты из CSV или XLSX.
+Строки читаются потоково и обрабатываются пачками: каждая пачка проверяется формами
+CompanyRowForm/PhoneForm/EmailForm, уникальность названий и слагов проверяется одним запросом на пачку,
+а записи создаются через bulk_create в отдельной транзакции.
+"""
+import csv
+import io
+import re
+
+from django.db import transaction
+from django.db.models import Q
+
+from . import caching, richtext
+from .forms import CompanyRowForm, PhoneForm, EmailForm
+from .models import Company, Phone, Email
+from .utils import slugify
+
+COLUMNS = ('company_name', 'fio', 'description', 'phones', 'emails')
+
+# Разделитель нескольких телефонов или адресов почты в одной ячейке
+MULTI_VALUE_RE = re.compile(r'\s*;\s*')
+
+# Количество слагов в одном запросе нумерованных вариантов: каждый слаг - отдельное условие LIKE,
+# а глубина дерева выражения SQLite ограничена 1000
+SLUG_VARIANTS_CHUNK = 200
+
+
+def read_csv(file):
+    """
+    Генератор строк CSV-файла в виде словарей; file - бинарный файл
+    :param file:
+    :return:
+    """
+    text = io.TextIOWrapper(file, encoding='utf-8-sig', newline='')
+    try:
+        yield from csv.DictReader(text)
+    finally:
+        text.detach()
+
+
+def read_xlsx(file):
+    """
+    Генератор строк первого листа XLSX-файла в виде словарей (требуется openpyxl)
+    :param file:
+    :return:
+    """
+    try:
+        import openpyxl
+    except ImportError:
+        raise ValueError('Для импорта XLSX установите пакет openpyxl')
+
+    workbook = openpyxl.load_workbook(file, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        headers = [str(value or '').strip() for value in next(rows, ())]
+        for row in rows:
+            yield {header: '' if value is None else str(value) for header, value in zip(headers, row)}
+    finally:
+        workbook.close()
+
+
+def read_rows(file, filename: str):
+    """
+    Выбирает способ чтения по расширению файла
+    :param file:
+    :param filename:
+    :return:
+    """
+    if filename.lower().endswith('.xlsx'):
+        return read_xlsx(file)
+    return read_csv(file)
+
+
+class ImportResult:
+    """
+    Результат импорта
+    атрибуты:
+        processed (int): Количество обработанных строк;
+        created (int): Количество созданных компаний;
+        errors (list): Ошибки строк в виде (номер строки, словарь ошибок);
+    """
+
+    def __init__(self):
+        self.processed = 0
+        self.created = 0
+        self.errors = []
+
+
+class CompanyImporter:
+    """
+    Импорт компаний пачками
+    атрибуты:
+        batch_size (int): Количество строк в одной транзакции;
+        progress (callable): Функция, которая вызывается с ImportResult после каждой пачки;
+    """
+
+    def __init__(self, batch_size: int = 1000, progress=None):
+        self.batch_size = batch_size
+        self.progress = progress
+        self.result = ImportResult()
+        self.seen_names = set()
+        self.seen_slugs = set()
+
+    def run(self, rows) -> ImportResult:
+        """
+        Импортирует строки (словари с колонками COLUMNS), нумерация строк начинается с 2 (после заголовка)
+        :param rows:
+        :return:
+        """
+        batch = []
+        for number, row in enumerate(rows, start=2):
+            batch.append((number, row))
+            if len(batch) >= self.batch_size:
+                self.process_batch(batch)
+                batch = []
+        if batch:
+            self.process_batch(batch)
+        self.result.errors.sort(key=lambda error: error[0])
+        return self.result
+
+    def validate_row(self, number: int, row: dict):
+        """
+        Проверяет строку формами и возвращает (cleaned_data компании, телефоны, адреса) или None
+        :param number:
+        :param row:
+        :return:
+        """
+        errors = {}
+        form = CompanyRowForm(data={field: (row.get(field) or '').strip() for field in ('company_name', 'fio',
+                                                                                         'description')})
+        if not form.is_valid():
+            errors.update(form.errors.get_json_data())
+
+        phones = []
+        for value in filter(None, MULTI_VALUE_RE.split((row.get('phones') or '').strip())):
+            phone_form = PhoneForm(data={'phone': value})
+            if phone_form.is_valid():
+                phones.append(phone_form.cleaned_data['phone'])
+            else:
+                errors.setdefault('phones', []).extend(phone_form.errors.get_json_data()['phone'])
+
+        emails = []
+        for value in filter(None, MULTI_VALUE_RE.split((row.get('emails') or '').strip())):
+            email_form = EmailForm(data={'email': value})
+            if email_form.is_valid():
+                emails.append(email_form.cleaned_data['email'])
+            else:
+                errors.setdefault('emails', []).extend(email_form.errors.get_json_data()['email'])
+
+        if errors:
+            self.result.errors.append((number, errors))
+            return None
+        return form.cleaned_data, phones, emails
+
+    def get_taken_slugs(self, slugs: set) -> set:
+        """
+        Возвращает занятые слаги среди кандидатов и их нумерованных вариантов (slug-2, slug-3...).
+        Варианты ищутся отдельными запросами (по SLUG_VARIANTS_CHUNK слагов) только для слагов с конфликтом
+        :param slugs:
+        :return:
+        """
+        taken = set(Company.objects.filter(slug__in=slugs).values_list('slug', flat=True))
+        conflicts = sorted(taken)
+        for start in range(0, len(conflicts), SLUG_VARIANTS_CHUNK):
+            variants = Q()
+            for slug in conflicts[start:start + SLUG_VARIANTS_CHUNK]:
+                variants |= Q(slug__startswith=f'{slug}-')
+            taken.update(Company.objects.filter(variants).values_list('slug', flat=True))
+        return taken
+
+    def make_slug(self, base: str, taken: set) -> str:
+        """
+        Возвращает свободный слаг с учетом занятых в базе и уже выданных в этом импорте
+        :param base:
+        :param taken:
+        :return:
+        """
+        slug = base
+        suffix = 2
+        while slug in taken or slug in self.seen_slugs:
+            slug = f'{base}-{suffix}'
+            suffix += 1
+        self.seen_slugs.add(slug)
+        return slug
+
+    def process_batch(self, batch: list):
+        """
+        Проверяет и сохраняет пачку строк в одной транзакции
+        :param batch:
+        :return:
+        """
+        valid = []
+        for number, row in batch:
+            cleaned = self.validate_row(number, row)
+            if cleaned:
+                valid.append((number, cleaned))
+
+        names = {cleaned[0]['company_name'] for _, cleaned in valid}
+        existing_names = set(Company.objects.filter(company_name__in=names).values_list('company_name', flat=True))
+        base_slugs = {number: slugify(cleaned[0]['company_name']) for number, cleaned in valid}
+        taken_slugs = self.get_taken_slugs(set(base_slugs.values()))
+
+        companies, contacts = [], []
+        for number, (data, phones, emails) in valid:
+            name = data['company_name']
+            if name in existing_names or name in self.seen_names:
+                error = Company().unique_error_message(Company, ('company_name',))
+                self.result.errors.append((number, {'company_name': [{'message': error.messages[0],
+                                                                       'code': error.code}]}))
+                continue
+            self.seen_names.add(name)
+            company = Company(slug=self.make_slug(base_slugs[number], taken_slugs), **data)
+            richtext.render_description(company)
+            companies.append(company)
+            contacts.append((phones, emails))
+
+        with transaction.atomic():
+            Company.objects.bulk_create(companies, batch_size=self.batch_size)
+            Phone.objects.bulk_create(
+                [Phone(user=company, phone=phone) for company, (phones, _) in zip(companies, contacts)
+                 for phone in phones],
+                batch_size=self.batch_size,
+            )
+            Email.objects.bulk_create(
+                [Email(user=company, email=email) for company, (_, emails) in zip(companies, contacts)
+                 for email in emails],
+                batch_size=self.batch_size,
+            )
+
+        if companies:
+            caching.invalidate(caching.COMPANY_LIST)
+        self.result.processed += len(batch)
+        self.result.created += len(companies)
+        if self.progress:
+            self.progress(self.result)
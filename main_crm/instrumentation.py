@@ -0,0 +1,210 @@
+"""
+Измерение времени запросов (RequestTimingMiddleware).
+Для каждого запроса считаются количество и суммарное время SQL-запросов, самые медленные запросы
+с местом вызова в коде приложения, время рендеринга шаблона и общее время обработки.
+Значения выводятся в заголовке Server-Timing, медленные запросы пишутся в лог main_crm.performance
+одной строкой JSON, а статистика по именам URL копится в памяти процесса (get_stats).
+Место вызова определяется только для запросов, попадающих в число самых медленных, поэтому
+обычный запрос к базе обходится одним вызовом perf_counter.
+"""
+import heapq
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger('main_crm.performance')
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+SKIP_FILES = {os.path.abspath(__file__), os.path.join(APP_DIR, 'backends', 'sqlite3', 'base.py')}
+
+SQL_PREVIEW_LENGTH = 200
+
+
+def find_call_site() -> str:
+    """
+    Возвращает первое место вызова в коде приложения (контроллеры, шаблонные теги, модули main_crm)
+    :return: 'views.py:123 get_context_data' или '-'
+    """
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(APP_DIR) and filename not in SKIP_FILES:
+            return f'{os.path.relpath(filename, APP_DIR)}:{frame.f_lineno} {frame.f_code.co_name}'
+        frame = frame.f_back
+    return '-'
+
+
+class RequestMetrics:
+    """
+    Метрики одного запроса
+    """
+
+    def __init__(self, slowest: int):
+        self.slowest = slowest
+        self.queries = 0
+        self.sql_time = 0.0
+        self.slow_queries = []
+        self.template_time = 0.0
+        self.template_started = None
+
+    def __call__(self, execute, sql, params, many, context):
+        """
+        Обертка выполнения SQL (connection.execute_wrapper)
+        """
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - started
+            self.queries += 1
+            self.sql_time += duration
+            if len(self.slow_queries) < self.slowest or duration > self.slow_queries[0][0]:
+                entry = (duration, self.queries, sql[:SQL_PREVIEW_LENGTH], find_call_site())
+                if len(self.slow_queries) < self.slowest:
+                    heapq.heappush(self.slow_queries, entry)
+                else:
+                    heapq.heapreplace(self.slow_queries, entry)
+
+    def start_template(self):
+        self.template_started = time.perf_counter()
+
+    def finish_template(self, response):
+        if self.template_started is not None:
+            self.template_time += time.perf_counter() - self.template_started
+            self.template_started = None
+        return response
+
+    def get_slow_queries(self) -> list:
+        return [
+            {'ms': round(duration * 1000, 2), 'sql': sql, 'site': site}
+            for duration, _, sql, site in sorted(self.slow_queries, reverse=True)
+        ]
+
+
+class Stats:
+    """
+    Статистика запросов по именам URL в памяти процесса
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.values = {}
+
+    def add(self, name: str, total: float, sql_time: float, queries: int, template_time: float):
+        with self.lock:
+            entry = self.values.get(name)
+            if entry is None:
+                entry = self.values[name] = {'count': 0, 'total': 0.0, 'max': 0.0, 'sql': 0.0, 'queries': 0,
+                                             'template': 0.0}
+            entry['count'] += 1
+            entry['total'] += total
+            entry['max'] = max(entry['max'], total)
+            entry['sql'] += sql_time
+            entry['queries'] += queries
+            entry['template'] += template_time
+
+    def get(self) -> dict:
+        """
+        Возвращает средние значения по именам URL (время в миллисекундах)
+        :return:
+        """
+        with self.lock:
+            values = {name: dict(entry) for name, entry in self.values.items()}
+        return {
+            name: {
+                'count': entry['count'],
+                'avg_ms': round(entry['total'] * 1000 / entry['count'], 2),
+                'max_ms': round(entry['max'] * 1000, 2),
+                'avg_sql_ms': round(entry['sql'] * 1000 / entry['count'], 2),
+                'avg_queries': round(entry['queries'] / entry['count'], 2),
+                'avg_template_ms': round(entry['template'] * 1000 / entry['count'], 2),
+            }
+            for name, entry in sorted(values.items())
+        }
+
+    def reset(self):
+        with self.lock:
+            self.values.clear()
+
+
+stats = Stats()
+
+
+def get_stats() -> dict:
+    return stats.get()
+
+
+def reset_stats():
+    stats.reset()
+
+
+def get_url_name(request) -> str:
+    match = getattr(request, 'resolver_match', None)
+    return (match.view_name if match else None) or '<unresolved>'
+
+
+class RequestTimingMiddleware:
+    """
+    Middleware для измерения времени запросов. Настройки:
+        REQUEST_TIMING_ENABLED (bool): Включить измерение (по умолчанию True);
+        REQUEST_TIMING_SLOW_MS (int): Порог медленного запроса для лога в миллисекундах;
+        REQUEST_TIMING_SLOWEST_QUERIES (int): Количество самых медленных SQL-запросов в логе;
+    Должен быть первым в MIDDLEWARE, чтобы учитывать время остальных middleware
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'REQUEST_TIMING_ENABLED', True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.slow_ms = getattr(settings, 'REQUEST_TIMING_SLOW_MS', 500)
+        self.slowest = getattr(settings, 'REQUEST_TIMING_SLOWEST_QUERIES', 5)
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        metrics = request.timing = RequestMetrics(self.slowest)
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(metrics))
+            response = self.get_response(request)
+        total = time.perf_counter() - started
+
+        response.headers['Server-Timing'] = (
+            f'sql;dur={metrics.sql_time * 1000:.2f};desc="{metrics.queries} queries", '
+            f'tpl;dur={metrics.template_time * 1000:.2f}, total;dur={total * 1000:.2f}'
+        )
+        url_name = get_url_name(request)
+        stats.add(url_name, total, metrics.sql_time, metrics.queries, metrics.template_time)
+        if total * 1000 >= self.slow_ms:
+            logger.warning(json.dumps({
+                'event': 'slow_request',
+                'url_name': url_name,
+                'path': request.path,
+                'method': request.method,
+                'status': response.status_code,
+                'total_ms': round(total * 1000, 2),
+                'sql_ms': round(metrics.sql_time * 1000, 2),
+                'queries': metrics.queries,
+                'template_ms': round(metrics.template_time * 1000, 2),
+                'slowest_queries': metrics.get_slow_queries(),
+            }, ensure_ascii=False))
+        return response
+
+    def process_template_response(self, request, response):
+        """
+        Рендеринг TemplateResponse выполняется сразу после этого метода, а после рендеринга
+        вызываются post_render_callback
+        """
+        metrics = getattr(request, 'timing', None)
+        if metrics is not None:
+            metrics.start_template()
+            response.add_post_render_callback(metrics.finish_template)
+        return response
@@ -0,0 +1,192 @@
+"""
+Очередь фоновых задач в базе данных (модель Job) без внешнего брокера.
+Задача ставится в очередь функцией enqueue и выполняется командой run_worker. Воркер забирает
+готовые задачи одним условным UPDATE (метка выборки locked_by и срок видимости locked_until),
+поэтому несколько воркеров не выполняют одну задачу одновременно, а задача упавшего воркера
+снова становится доступной после истечения срока видимости. Неудачные попытки повторяются
+с экспоненциальной задержкой до max_attempts.
+Обработчики регистрируются декоратором register (main_crm.tasks). Пакетный обработчик получает
+аргументы всех выбранных задач сразу, например, чтобы отправить все письма через одно соединение.
+"""
+import traceback
+import uuid
+from collections import namedtuple
+from datetime import timedelta
+
+from django.apps import apps as global_apps
+from django.db.models import F, Q
+from django.utils import timezone
+
+MAX_ATTEMPTS = 5
+
+# Задержка повтора: BACKOFF_BASE * 2 ** (попытка - 1) секунд, но не больше BACKOFF_MAX
+BACKOFF_BASE = 30
+BACKOFF_MAX = 60 * 60
+
+VISIBILITY_TIMEOUT = 5 * 60
+
+Handler = namedtuple('Handler', 'function batch')
+
+TASKS = {}
+
+
+def register(name: str, batch: bool = False):
+    """
+    Декоратор для регистрации обработчика задачи.
+    Обычный обработчик вызывается с аргументами одной задачи как именованными параметрами,
+    пакетный - со списком аргументов и возвращает список ошибок (None для успешных задач)
+    :param name:
+    :param batch:
+    :return:
+    """
+    def decorator(function):
+        TASKS[name] = Handler(function, batch)
+        return function
+    return decorator
+
+
+def get_model():
+    return global_apps.get_model('main_crm', 'Job')
+
+
+def enqueue(task: str, payload: dict = None, delay: int = 0, max_attempts: int = MAX_ATTEMPTS):
+    """
+    Ставит задачу в очередь (в транзакции задача станет видна воркеру после ее фиксации)
+    :param task: Имя зарегистрированного обработчика
+    :param payload: Аргументы, сериализуемые в JSON
+    :param delay: Задержка выполнения в секундах
+    :param max_attempts:
+    :return: Job
+    """
+    if task not in TASKS:
+        raise KeyError(f'Unknown task: {task}')
+    return get_model().objects.create(task=task, payload=payload or {}, max_attempts=max_attempts,
+                                      run_after=timezone.now() + timedelta(seconds=delay))
+
+
+def get_backoff(attempts: int) -> timedelta:
+    return timedelta(seconds=min(BACKOFF_BASE * 2 ** max(attempts - 1, 0), BACKOFF_MAX))
+
+
+def expire_exhausted():
+    """
+    Отмечает неудачными задачи, которые исчерпали попытки и не были завершены в срок видимости
+    :return:
+    """
+    now = timezone.now()
+    return get_model().objects.filter(status='r', locked_until__lt=now, attempts__gte=F('max_attempts')).update(
+        status='f', last_error='Visibility timeout expired', finished_at=now, locked_until=None,
+    )
+
+
+def claim(limit: int, visibility_timeout: int = VISIBILITY_TIMEOUT) -> tuple:
+    """
+    Забирает готовые задачи и задачи с истекшим сроком видимости
+    :param limit:
+    :param visibility_timeout: Время в секундах, в течение которого задача скрыта от других воркеров
+    :return: (метка выборки, список задач)
+    """
+    Job = get_model()
+    now = timezone.now()
+    ready = Q(status='q', run_after__lte=now) | Q(status='r', locked_until__lt=now)
+    ids = list(Job.objects.filter(ready).order_by('run_after', 'pk').values_list('pk', flat=True)[:limit])
+    if not ids:
+        return None, []
+    token = uuid.uuid4().hex
+    # Условие повторяется в UPDATE: задачи, которые успел забрать другой воркер, не изменятся
+    Job.objects.filter(ready, pk__in=ids).update(
+        status='r', locked_by=token, locked_until=now + timedelta(seconds=visibility_timeout),
+        attempts=F('attempts') + 1,
+    )
+    return token, list(Job.objects.filter(locked_by=token, pk__in=ids).order_by('run_after', 'pk'))
+
+
+def execute(task: str, payloads: list) -> list:
+    """
+    Выполняет обработчик для аргументов задач (в потоке или процессе пула)
+    :param task:
+    :param payloads:
+    :return: Список текстов ошибок (None для успешных задач)
+    """
+    handler = TASKS.get(task)
+    if handler is None:
+        return [f'Unknown task: {task}'] * len(payloads)
+    if handler.batch:
+        try:
+            errors = handler.function(payloads)
+        except Exception:
+            return [traceback.format_exc()] * len(payloads)
+        return [
+            None if error is None else ''.join(traceback.format_exception(type(error), error, error.__traceback__))
+            for error in errors
+        ]
+
+    errors = []
+    for payload in payloads:
+        try:
+            handler.function(**payload)
+        except Exception:
+            errors.append(traceback.format_exc())
+        else:
+            errors.append(None)
+    return errors
+
+
+def finish(token: str, jobs: list, errors: list):
+    """
+    Сохраняет результаты выполнения: успешные задачи завершаются, неудачные откладываются
+    для повтора или отмечаются неудачными, если попытки исчерпаны
+    :param token: Метка выборки (задачу, которую уже забрал другой воркер, не меняем)
+    :param jobs:
+    :param errors:
+    :return:
+    """
+    Job = get_model()
+    now = timezone.now()
+    done = [job.pk for job, error in zip(jobs, errors) if error is None]
+    if done:
+        Job.objects.filter(pk__in=done, locked_by=token).update(
+            status='d', finished_at=now, locked_until=None, last_error='',
+        )
+    for job, error in zip(jobs, errors):
+        if error is None:
+            continue
+        if job.attempts >= job.max_attempts:
+            changes = {'status': 'f', 'finished_at': now}
+        else:
+            changes = {'status': 'q', 'run_after': now + get_backoff(job.attempts)}
+        Job.objects.filter(pk=job.pk, locked_by=token).update(locked_until=None, last_error=error, **changes)
+
+
+def run_pending(executor, limit: int = 100, visibility_timeout: int = VISIBILITY_TIMEOUT) -> int:
+    """
+    Забирает одну выборку задач и выполняет ее в пуле: задачи пакетных обработчиков
+    передаются одним вызовом, остальные - по одной
+    :param executor: concurrent.futures.Executor
+    :param limit:
+    :param visibility_timeout:
+    :return: Количество выполненных задач
+    """
+    expire_exhausted()
+    token, jobs = claim(limit, visibility_timeout)
+    if not jobs:
+        return 0
+
+    groups = {}
+    for job in jobs:
+        handler = TASKS.get(job.task)
+        key = job.task if handler and handler.batch else job.pk
+        groups.setdefault(key, []).append(job)
+
+    futures = [(group, executor.submit(execute, group[0].task, [job.payload for job in group]))
+               for group in groups.values()]
+    results, errors = [], []
+    for group, future in futures:
+        try:
+            group_errors = future.result()
+        except Exception:
+            group_errors = [traceback.format_exc()] * len(group)
+        results.extend(group)
+        errors.extend(group_errors)
+    finish(token, results, errors)
+    return len(jobs)
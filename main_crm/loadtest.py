@@ -0,0 +1,432 @@
+"""
+Нагрузочное тестирование WSGI- и ASGI-приложения внутри процесса, без внешних инструментов.
+Запросы передаются прямо в приложение (WSGI_APPLICATION или ASGI_APPLICATION): для WSGI их выполняют
+N потоков, для ASGI - N задач asyncio. Каждый исполнитель работает от имени одного из залогиненных
+менеджеров и выбирает маршрут из смеси с весами (список, карточка, фильтр, создание взаимодействия).
+Отчет содержит пропускную способность, перцентили задержки, долю ошибок и ошибок "database is locked"
+в целом, по маршрутам и по интервалам времени. Взаимодействия, созданные маршрутом create, после прогона
+удаляются (keep=True оставляет их).
+compare_databases сравнивает один и тот же прогон WSGI на стандартном бэкенде django.db.backends.sqlite3
+(журнал DELETE, новое соединение на запрос) и на настроенном бэкенде (main_crm.backends.sqlite3).
+"""
+import asyncio
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.asgi import get_asgi_application
+from django.core.servers.basehttp import get_internal_wsgi_application
+from django.core.signals import got_request_exception
+from django.db import connection, connections
+from django.middleware.csrf import CSRF_ALLOWED_CHARS, CSRF_SECRET_LENGTH
+from django.test import Client, RequestFactory
+from django.urls import reverse
+from django.utils.crypto import get_random_string
+from django.utils.module_loading import import_string
+
+from .backends.sqlite3.base import is_locked
+from .benchmark import percentile
+from .const import CHANNELS, MARKS
+from .models import Project, Interaction
+
+DEFAULT_MIX = {'list': 4, 'detail': 4, 'filter': 2, 'create': 1}
+
+# Ключ окружения WSGI (scope ASGI), в который записывается исключение, завершившее запрос ошибкой 500
+EXCEPTION_KEY = 'main_crm.loadtest.exception'
+
+# Размер выборки объектов, к которым обращаются маршруты
+SAMPLE_SIZE = 1000
+
+# Метка в описании взаимодействий, которые создает маршрут create
+CREATED_MARKER = 'Нагрузочный тест'
+
+# Настройки базы данных до оптимизации: стандартный бэкенд без PRAGMA и без постоянных соединений
+BASELINE_DATABASE = {'ENGINE': 'django.db.backends.sqlite3', 'CONN_MAX_AGE': 0, 'OPTIONS': {}}
+
+SEARCH_WORDS = ('договор', 'счет', 'встреча', 'отчет', 'клиент')
+
+
+def parse_mix(value: str) -> dict:
+    """
+    Разбирает смесь маршрутов вида 'list=4,detail=4,filter=2,create=1'
+    :param value:
+    :return: {маршрут: вес}
+    """
+    mix = {}
+    for part in value.split(','):
+        name, _, weight = part.strip().partition('=')
+        if name not in DEFAULT_MIX:
+            raise ValueError(f'Неизвестный маршрут: {name}')
+        mix[name] = int(weight or 1)
+    return mix
+
+
+def get_sample() -> dict:
+    """
+    Выбирает случайные существующие взаимодействия и проекты в пределах диапазона первичных ключей,
+    не сортируя всю таблицу
+    :return:
+    """
+    sample = {}
+    for name, model in (('interactions', Interaction), ('projects', Project)):
+        ids = list(model.objects.order_by('pk').values_list('pk', flat=True)[:1])
+        last = list(model.objects.order_by('-pk').values_list('pk', flat=True)[:1])
+        if not ids:
+            raise ValueError(f'Нет данных: {model._meta.verbose_name_plural}')
+        candidates = random.Random(0).sample(range(ids[0], last[0] + 1), min(SAMPLE_SIZE, last[0] - ids[0] + 1))
+        sample[name] = list(model.objects.filter(pk__in=candidates).values_list('pk', flat=True)) or ids
+    return sample
+
+
+def login_sessions(users: int) -> list:
+    """
+    Создает сессии для первых users активных суперпользователей
+    :param users:
+    :return: Список cookie {имя: значение}
+    """
+    sessions = []
+    for user in User.objects.filter(is_active=True, is_superuser=True).order_by('pk')[:users]:
+        client = Client()
+        client.force_login(user)
+        sessions.append({
+            settings.SESSION_COOKIE_NAME: client.cookies[settings.SESSION_COOKIE_NAME].value,
+            settings.CSRF_COOKIE_NAME: get_random_string(CSRF_SECRET_LENGTH, CSRF_ALLOWED_CHARS),
+        })
+    if not sessions:
+        raise ValueError('Нет активных суперпользователей')
+    return sessions
+
+
+def make_request(route: str, rng: random.Random, sample: dict) -> tuple:
+    """
+    Создает запрос маршрута смеси
+    :param route:
+    :param rng:
+    :param sample:
+    :return: (метод, путь, данные формы)
+    """
+    if route == 'list':
+        return 'GET', reverse('all-interaction-list'), None
+    if route == 'detail':
+        return 'GET', reverse('interaction-detail', kwargs={'pk': rng.choice(sample['interactions'])}), None
+    if route == 'filter':
+        params = {'channel': rng.choice(CHANNELS)[0], 'mark': rng.choice(MARKS)[0]}
+        if rng.random() < 0.5:
+            params['q'] = rng.choice(SEARCH_WORDS)
+        return 'GET', f"{reverse('all-interaction-list')}?{urlencode(params)}", None
+    return 'POST', reverse('interaction-create', kwargs={'pk': rng.choice(sample['projects'])}), {
+        'channel': rng.choice(CHANNELS)[0],
+        'mark': rng.choice(MARKS)[0],
+        'description': f'<p>{CREATED_MARKER} {rng.randrange(10 ** 6)}</p>',
+    }
+
+
+def record_exception(sender, request=None, **kwargs):
+    """
+    Сохраняет исключение запроса в его окружение, чтобы исполнитель отличил "database is locked" от других ошибок
+    """
+    environ = getattr(request, 'scope', None) or getattr(request, 'environ', None)
+    if environ is not None:
+        environ[EXCEPTION_KEY] = sys.exc_info()[1]
+
+
+def get_last_interaction_pk() -> int:
+    return Interaction.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+
+
+def delete_created(last_pk: int) -> int:
+    """
+    Удаляет взаимодействия, созданные прогоном (через ORM, чтобы обработчики сигналов пересчитали счетчики,
+    поисковый индекс и кеш)
+    :param last_pk: Наибольший первичный ключ взаимодействия до прогона
+    :return: Количество удаленных взаимодействий
+    """
+    return Interaction.objects.filter(pk__gt=last_pk, description__contains=CREATED_MARKER).delete()[1].get(
+        Interaction._meta.label, 0)
+
+
+class Results:
+    """
+    Результаты запросов одного прогона
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = []
+
+    def add(self, route: str, started: float, duration: float, status: int, exception=None):
+        with self.lock:
+            self.entries.append((route, started, duration, status, exception))
+
+    @staticmethod
+    def summarize(entries: list, duration: float) -> dict:
+        timings = [entry[2] * 1000 for entry in entries]
+        errors = sum(1 for entry in entries if entry[3] >= 500)
+        locked = sum(1 for entry in entries if entry[4] is not None and is_locked(entry[4]))
+        count = len(entries)
+        return {
+            'requests': count,
+            'throughput': round(count / duration, 2) if duration else 0,
+            'p50_ms': round(percentile(timings, 50), 2) if timings else None,
+            'p95_ms': round(percentile(timings, 95), 2) if timings else None,
+            'p99_ms': round(percentile(timings, 99), 2) if timings else None,
+            'errors': errors,
+            'error_rate': round(errors / count, 4) if count else 0,
+            'locked': locked,
+            'locked_rate': round(locked / count, 4) if count else 0,
+        }
+
+    def get_report(self, started: float, duration: float, interval: float) -> dict:
+        """
+        Возвращает сводку прогона, по маршрутам и по интервалам времени
+        :param started: Время начала прогона (perf_counter)
+        :param duration: Длительность прогона в секундах
+        :param interval: Длина интервала в секундах
+        :return:
+        """
+        with self.lock:
+            entries = list(self.entries)
+        routes = {}
+        buckets = {}
+        for entry in entries:
+            routes.setdefault(entry[0], []).append(entry)
+            buckets.setdefault(int((entry[1] + entry[2] - started) // interval), []).append(entry)
+        return {
+            **self.summarize(entries, duration),
+            'statuses': dict(sorted(Counter(str(entry[3]) for entry in entries).items())),
+            'exceptions': dict(Counter(
+                f'{type(entry[4]).__name__}: {entry[4]}' for entry in entries if entry[4] is not None
+            ).most_common()),
+            'routes': {name: self.summarize(values, duration) for name, values in sorted(routes.items())},
+            'timeline': [
+                {'second': round(index * interval, 3), **self.summarize(buckets[index], interval)}
+                for index in sorted(buckets)
+            ],
+        }
+
+
+def get_host() -> str:
+    """
+    Возвращает имя хоста для заголовка Host, которое пропустит проверка ALLOWED_HOSTS
+    :return:
+    """
+    for host in settings.ALLOWED_HOSTS:
+        if host != '*' and not host.startswith('.'):
+            return host
+    return 'localhost'
+
+
+def get_wsgi_environ(factory: RequestFactory, method: str, path: str, data, cookies: dict) -> dict:
+    extra = {'HTTP_HOST': get_host()}
+    if method == 'POST':
+        data = {**data, 'csrfmiddlewaretoken': cookies[settings.CSRF_COOKIE_NAME]}
+        request = factory.post(path, data, **extra)
+    else:
+        request = factory.get(path, **extra)
+    return request.environ
+
+
+def run_wsgi(application, concurrency: int, duration: float, mix: dict, sample: dict, sessions: list,
+             results: Results, seed: int = 0):
+    """
+    Выполняет запросы к WSGI-приложению в concurrency потоках в течение duration секунд
+    """
+    routes, weights = zip(*mix.items())
+    deadline = time.perf_counter() + duration
+
+    def start_response(status, headers, exc_info=None):
+        return lambda data: None
+
+    def worker(index):
+        rng = random.Random(seed * 1000 + index)
+        factory = RequestFactory()
+        cookies = sessions[index % len(sessions)]
+        for name, value in cookies.items():
+            factory.cookies[name] = value
+        try:
+            while time.perf_counter() < deadline:
+                route = rng.choices(routes, weights)[0]
+                environ = get_wsgi_environ(factory, *make_request(route, rng, sample), cookies)
+                started = time.perf_counter()
+                response = application(environ, start_response)
+                try:
+                    for _ in response:
+                        pass
+                finally:
+                    response.close()
+                results.add(route, started, time.perf_counter() - started, response.status_code,
+                            environ.get(EXCEPTION_KEY))
+        finally:
+            connections.close_all()
+
+    threads = [threading.Thread(target=worker, args=(index,)) for index in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def get_asgi_scope(method: str, path: str, cookies: dict) -> dict:
+    path, _, query = path.partition('?')
+    cookie = '; '.join(f'{name}={value}' for name, value in cookies.items())
+    host = get_host()
+    headers = [(b'host', host.encode()), (b'cookie', cookie.encode())]
+    if method == 'POST':
+        headers.append((b'content-type', b'application/x-www-form-urlencoded'))
+    return {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': method, 'scheme': 'http',
+        'path': path, 'raw_path': path.encode(), 'query_string': query.encode(), 'root_path': '',
+        'headers': headers, 'client': ('127.0.0.1', 0), 'server': (host, 80),
+    }
+
+
+async def call_asgi(application, scope: dict, body: bytes) -> int:
+    """
+    Выполняет один запрос к ASGI-приложению
+    :return: Код ответа
+    """
+    messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+    status = None
+
+    async def receive():
+        return messages.pop() if messages else {'type': 'http.disconnect'}
+
+    async def send(message):
+        nonlocal status
+        if message['type'] == 'http.response.start':
+            status = message['status']
+
+    await application(scope, receive, send)
+    return status
+
+
+def run_asgi(application, concurrency: int, duration: float, mix: dict, sample: dict, sessions: list,
+             results: Results, seed: int = 0):
+    """
+    Выполняет запросы к ASGI-приложению в concurrency задачах asyncio в течение duration секунд
+    """
+    routes, weights = zip(*mix.items())
+
+    async def worker(index, deadline):
+        rng = random.Random(seed * 1000 + index)
+        cookies = sessions[index % len(sessions)]
+        while time.perf_counter() < deadline:
+            route = rng.choices(routes, weights)[0]
+            method, path, data = make_request(route, rng, sample)
+            body = b''
+            if method == 'POST':
+                body = urlencode({**data, 'csrfmiddlewaretoken': cookies[settings.CSRF_COOKIE_NAME]}).encode()
+            scope = get_asgi_scope(method, path, cookies)
+            started = time.perf_counter()
+            status = await call_asgi(application, scope, body)
+            results.add(route, started, time.perf_counter() - started, status, scope.get(EXCEPTION_KEY))
+
+    async def main():
+        deadline = time.perf_counter() + duration
+        await asyncio.gather(*(worker(index, deadline) for index in range(concurrency)))
+
+    asyncio.run(main())
+
+
+def get_application(interface: str):
+    if interface == 'wsgi':
+        return get_internal_wsgi_application()
+    path = getattr(settings, 'ASGI_APPLICATION', None)
+    return import_string(path) if path else get_asgi_application()
+
+
+def run(interface: str, concurrency: int, duration: float, mix: dict = None, users: int = 4, interval: float = 1.0,
+        seed: int = 0, keep: bool = False) -> dict:
+    """
+    Выполняет прогон нагрузочного теста
+    :param interface: 'wsgi' или 'asgi'
+    :param concurrency: Количество потоков (WSGI) или задач (ASGI)
+    :param duration: Длительность в секундах
+    :param mix: Смесь маршрутов {маршрут: вес}
+    :param users: Количество залогиненных менеджеров
+    :param interval: Длина интервала для динамики по времени в секундах
+    :param seed:
+    :param keep: Не удалять взаимодействия, созданные маршрутом create
+    :return: Отчет прогона
+    """
+    mix = mix or DEFAULT_MIX
+    sample = get_sample()
+    sessions = login_sessions(users)
+    application = get_application(interface)
+    runner = run_wsgi if interface == 'wsgi' else run_asgi
+
+    results = Results()
+    last_pk = get_last_interaction_pk()
+    got_request_exception.connect(record_exception)
+    try:
+        started = time.perf_counter()
+        runner(application, concurrency, duration, mix, sample, sessions, results, seed)
+        elapsed = time.perf_counter() - started
+    finally:
+        got_request_exception.disconnect(record_exception)
+        deleted = 0 if keep else delete_created(last_pk)
+
+    return {
+        'interface': interface,
+        'concurrency': concurrency,
+        'duration': round(elapsed, 3),
+        'mix': mix,
+        'users': len(sessions),
+        'deleted': deleted,
+        **results.get_report(started, elapsed, interval),
+    }
+
+
+@contextmanager
+def database_settings(alias: str = 'default', **overrides):
+    """
+    Временно меняет настройки базы данных. Действует на соединения, которые создаются в новых потоках
+    (соединение текущего потока не пересоздается, чтобы не потерять тестовую базу в памяти)
+    :param alias:
+    :param overrides: Ключи настроек базы (ENGINE, CONN_MAX_AGE, OPTIONS)
+    :return:
+    """
+    settings_dict = connections.settings[alias]
+    previous = {key: settings_dict[key] for key in overrides}
+    settings_dict.update(overrides)
+    try:
+        yield
+    finally:
+        settings_dict.update(previous)
+
+
+def set_journal_mode(mode: str) -> str:
+    with connection.cursor() as cursor:
+        cursor.execute(f'PRAGMA journal_mode = {mode}')
+        return cursor.fetchone()[0]
+
+
+def compare_databases(concurrency_values: list, duration: float, mix: dict = None, users: int = 4,
+                      interval: float = 1.0, seed: int = 0, keep: bool = False) -> list:
+    """
+    Выполняет прогоны WSGI до оптимизации (BASELINE_DATABASE, журнал DELETE) и после (настройки DATABASES)
+    :param concurrency_values: Количество потоков для каждой пары прогонов
+    :param duration:
+    :param mix:
+    :param users:
+    :param interval:
+    :param seed:
+    :param keep:
+    :return: [{'concurrency', 'before', 'after'}]
+    """
+    comparisons = []
+    journal_mode = getattr(connection, 'pragmas', {}).get('journal_mode', 'DELETE')
+    for concurrency in concurrency_values:
+        with database_settings(**BASELINE_DATABASE):
+            set_journal_mode('DELETE')
+            before = run('wsgi', concurrency, duration, mix, users, interval, seed, keep)
+        set_journal_mode(journal_mode)
+        after = run('wsgi', concurrency, duration, mix, users, interval, seed, keep)
+        comparisons.append({'concurrency': concurrency, 'before': before, 'after': after})
+    return comparisons
@@ -0,0 +1,68 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from main_crm import benchmark
+
+
+class Command(BaseCommand):
+    help = ('Измеряет время ответа, количество запросов и память всех маршрутов main_crm на тестовой базе '
+            'с данными нескольких масштабов')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scales', nargs='+', default=['1k'],
+                            help=f'Масштабы: {", ".join(benchmark.SCALES)} или количество взаимодействий')
+        parser.add_argument('--requests', type=int, default=20, help='Количество замеров на маршрут')
+        parser.add_argument('--routes', nargs='+', help='Имена маршрутов (по умолчанию все)')
+        parser.add_argument('--cold', action='store_true', help='Очищать кеш перед каждым запросом')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', default='benchmark-results.json', help='Файл результатов (JSON)')
+        parser.add_argument('--baseline', help='Файл базового прогона для сравнения')
+        parser.add_argument('--threshold', type=float, default=0.2,
+                            help='Допустимый относительный рост p95 по сравнению с базовым прогоном')
+
+    def get_scales(self, values) -> list:
+        scales = []
+        for value in values:
+            if value in benchmark.SCALES:
+                scales.append((value, benchmark.SCALES[value]))
+            elif value.isdigit():
+                scales.append((value, int(value)))
+            else:
+                raise CommandError(f'Неизвестный масштаб: {value}')
+        return scales
+
+    def handle(self, *args, **options):
+        scales = self.get_scales(options['scales'])
+        routes = options['routes']
+        unknown = set(routes or ()) - set(benchmark.get_route_names())
+        if unknown:
+            raise CommandError(f'Неизвестные маршруты: {", ".join(sorted(unknown))}')
+
+        results = []
+        setup_test_environment()
+        try:
+            for scale, interactions in scales:
+                self.stdout.write(f'Масштаб {scale}: {interactions} взаимодействий')
+                old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+                try:
+                    results.extend(benchmark.run_scale(scale, interactions, options['requests'], routes,
+                                                       options['cold'], options['seed'], self.stdout.write))
+                finally:
+                    connection.creation.destroy_test_db(old_name, verbosity=0)
+        finally:
+            teardown_test_environment()
+
+        report = benchmark.make_report(results, options['requests'], options['cold'])
+        with open(options['output'], 'w') as file:
+            json.dump(report, file, ensure_ascii=False, indent=2)
+        self.stdout.write(self.style.SUCCESS(f'Результаты сохранены в {options["output"]}'))
+
+        if options['baseline']:
+            with open(options['baseline']) as file:
+                regressions = benchmark.compare(report, json.load(file), options['threshold'])
+            if regressions:
+                raise CommandError('Регрессии производительности:\n' + '\n'.join(regressions))
+            self.stdout.write(self.style.SUCCESS('Регрессий нет'))
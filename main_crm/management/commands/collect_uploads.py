@@ -0,0 +1,44 @@
+from datetime import timedelta
+
+from ckeditor_uploader.utils import get_thumb_filename
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from main_crm.models import UploadBlob
+from main_crm.uploads import ContentAddressedStorage, recount_references
+
+
+class Command(BaseCommand):
+    help = 'Удаляет файлы CKEditor, на которые не ссылается ни одно описание'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recount', action='store_true',
+                            help='Пересчитать счетчики ссылок по всем описаниям перед удалением')
+        parser.add_argument('--grace-hours', type=int, default=24,
+                            help='Не удалять файлы, последний раз загруженные позже этого количества часов назад '
+                                 '(описание с ними может быть еще не сохранено)')
+        parser.add_argument('--dry-run', action='store_true', help='Только вывести файлы, которые будут удалены')
+
+    def handle(self, *args, **options):
+        if options['recount']:
+            changed = recount_references()
+            self.stdout.write(f'Счетчики ссылок исправлены у файлов: {changed}')
+
+        storage = ContentAddressedStorage()
+        deadline = timezone.now() - timedelta(hours=options['grace_hours'])
+        orphans = UploadBlob.objects.filter(ref_count__lte=0, last_uploaded_at__lt=deadline).only('pk', 'name', 'size')
+
+        removed, freed = [], 0
+        for blob in orphans.iterator():
+            self.stdout.write(blob.name)
+            if not options['dry_run']:
+                storage.delete(blob.name)
+                storage.delete(get_thumb_filename(blob.name))
+            removed.append(blob.pk)
+            freed += blob.size
+
+        if options['dry_run']:
+            self.stdout.write(self.style.SUCCESS(f'Будет удалено файлов: {len(removed)}, байт: {freed}'))
+            return
+        UploadBlob.objects.filter(pk__in=removed, ref_count__lte=0).delete()
+        self.stdout.write(self.style.SUCCESS(f'Удалено файлов: {len(removed)}, байт: {freed}'))
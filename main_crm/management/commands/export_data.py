@@ -0,0 +1,49 @@
+import sys
+from functools import partial
+
+from django.core.management.base import BaseCommand, CommandError
+from django.http import QueryDict
+
+from main_crm import export
+
+
+class Command(BaseCommand):
+    help = 'Потоковая выгрузка взаимодействий, проектов или компаний в CSV/JSON Lines'
+
+    def add_arguments(self, parser):
+        parser.add_argument('name', choices=sorted(export.EXPORTS), help='Что выгружать')
+        parser.add_argument('--format', choices=sorted(export.FORMATS), default='csv')
+        parser.add_argument('--gzip', action='store_true', help='Сжать результат в gzip')
+        parser.add_argument('--output', '-o', help='Файл для записи (по умолчанию - stdout)')
+        parser.add_argument('--filter', action='append', default=[], metavar='KEY=VALUE',
+                            help='Параметр фильтра, как в GET-запросе списка (можно указать несколько)')
+        parser.add_argument('--chunk-size', type=int, default=export.CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        current_export = export.EXPORTS[options['name']]
+
+        data = QueryDict(mutable=True)
+        for item in options['filter']:
+            key, sep, value = item.partition('=')
+            if not sep:
+                raise CommandError(f'Фильтр должен иметь вид KEY=VALUE: {item}')
+            data.appendlist(key, value)
+
+        queryset = current_export.get_queryset(data)
+        content = export.stream_export(current_export, queryset, options['format'], options['gzip'],
+                                       options['chunk_size'])
+
+        output = options['output']
+        if output:
+            stream = open(output, 'wb') if options['gzip'] else open(output, 'w', encoding='utf-8', newline='')
+            write = stream.write
+        elif options['gzip']:
+            stream, write = None, sys.stdout.buffer.write
+        else:
+            stream, write = None, partial(self.stdout.write, ending='')
+        try:
+            for chunk in content:
+                write(chunk)
+        finally:
+            if stream:
+                stream.close()
@@ -0,0 +1,40 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from main_crm import thumbnails
+from main_crm.models import Profile
+
+
+class Command(BaseCommand):
+    help = 'Строит уменьшенные копии существующих аватаров в пуле процессов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count(), help='Количество процессов')
+        parser.add_argument('--force', action='store_true', help='Обработать и аватары, у которых уже есть копии')
+        parser.add_argument('--batch-size', type=int, default=100,
+                            help='Количество профилей, обновляемых одним запросом')
+
+    def handle(self, *args, **options):
+        profiles = Profile.objects.exclude(profile_image='').exclude(profile_image__isnull=True)
+        if not options['force']:
+            profiles = profiles.filter(avatar_digest='')
+        names = {}
+        for pk, name in profiles.values_list('pk', 'profile_image').iterator():
+            names.setdefault(name, []).append(pk)
+        if not names:
+            self.stdout.write('Нет аватаров для обработки')
+            return
+
+        updated, failed = [], 0
+        with ProcessPoolExecutor(max_workers=options['workers']) as executor:
+            for name, digest, result in executor.map(thumbnails.process_avatar, names, chunksize=8):
+                if digest is None:
+                    failed += 1
+                    self.stderr.write(f'{name}: {result}')
+                    continue
+                updated.extend(Profile(pk=pk, avatar_digest=digest, avatar_formats=result) for pk in names[name])
+
+        Profile.objects.bulk_update(updated, ['avatar_digest', 'avatar_formats'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Обработано профилей: {len(updated)}, ошибок: {failed}'))
@@ -0,0 +1,45 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from main_crm import datagen
+
+
+class Command(BaseCommand):
+    help = ('Заполняет базу синтетическими компаниями, проектами и взаимодействиями для нагрузочного тестирования. '
+            f'Менеджеры создаются суперпользователями с паролем "{datagen.MANAGER_PASSWORD}"')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interactions', type=int, default=100000, help='Количество взаимодействий')
+        parser.add_argument('--companies', type=int, help='Количество компаний (по умолчанию 1 на 100 взаимодействий)')
+        parser.add_argument('--projects', type=int, help='Количество проектов (по умолчанию 1 на 20 взаимодействий)')
+        parser.add_argument('--managers', type=int,
+                            help='Количество менеджеров (по умолчанию 1 на 1000 взаимодействий)')
+        parser.add_argument('--max-contacts', type=int, default=3,
+                            help='Максимальное количество телефонов и адресов почты у компании')
+        parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                            help='Количество процессов для вставки взаимодействий')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Количество записей в одном INSERT')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        if options['interactions'] < 0 or options['batch_size'] < 1 or options['workers'] < 1:
+            raise CommandError('Количество взаимодействий, размер пачки и количество процессов '
+                               'должны быть положительными')
+
+        reported = {}
+
+        def progress(model, total):
+            # Сообщение не чаще одного раза на 100 000 записей модели
+            if total // 100000 != reported.get(model, -1):
+                reported[model] = total // 100000
+                self.stdout.write(f'{model}: {total}')
+
+        started = time.monotonic()
+        sizes = datagen.generate(options['interactions'], seed=options['seed'], batch_size=options['batch_size'],
+                                 workers=options['workers'], companies=options['companies'],
+                                 projects=options['projects'], managers=options['managers'],
+                                 max_contacts=options['max_contacts'], progress=progress)
+        created = ', '.join(f'{name} {value}' for name, value in sizes.items())
+        self.stdout.write(self.style.SUCCESS(f'Создано за {time.monotonic() - started:.1f} с: {created}'))
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from main_crm import importer
+
+
+class Command(BaseCommand):
+    help = 'Пакетный импорт компаний с телефонами и адресами почты из CSV/XLSX'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл CSV или XLSX')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Количество строк в одной транзакции')
+
+    def handle(self, *args, **options):
+        def progress(result):
+            self.stdout.write(f'Обработано строк: {result.processed}, создано компаний: {result.created}')
+
+        try:
+            with open(options['path'], 'rb') as file:
+                result = importer.CompanyImporter(options['batch_size'], progress).run(
+                    importer.read_rows(file, options['path'])
+                )
+        except (OSError, ValueError, UnicodeDecodeError) as e:
+            raise CommandError(e)
+
+        for number, errors in result.errors:
+            messages = '; '.join(f'{field}: {error["message"]}' for field, field_errors in errors.items()
+                                 for error in field_errors)
+            self.stderr.write(f'Строка {number}: {messages}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово: создано {result.created} из {result.processed}, ошибок: {len(result.errors)}'
+        ))
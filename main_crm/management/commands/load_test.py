@@ -0,0 +1,85 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from main_crm import loadtest
+
+
+class Command(BaseCommand):
+    help = ('Нагрузочный тест WSGI/ASGI-приложения внутри процесса на текущей базе данных. '
+            'Маршрут create создает взаимодействия и удаляет их после прогона')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interface', nargs='+', choices=('wsgi', 'asgi'), default=['wsgi'])
+        parser.add_argument('--concurrency', nargs='+', type=int, default=[1, 4],
+                            help='Количество потоков (WSGI) или задач (ASGI); прогон выполняется для каждого значения')
+        parser.add_argument('--duration', type=float, default=10, help='Длительность прогона в секундах')
+        parser.add_argument('--mix', help='Смесь маршрутов с весами, по умолчанию ' + ','.join(
+            f'{name}={weight}' for name, weight in loadtest.DEFAULT_MIX.items()))
+        parser.add_argument('--users', type=int, default=4, help='Количество залогиненных менеджеров')
+        parser.add_argument('--interval', type=float, default=1.0, help='Интервал динамики по времени в секундах')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--compare-databases', action='store_true',
+                            help='Сравнить прогоны WSGI на стандартном бэкенде SQLite и на настроенном в DATABASES')
+        parser.add_argument('--keep-data', action='store_true',
+                            help='Не удалять взаимодействия, созданные маршрутом create')
+        parser.add_argument('--output', help='Файл отчета (JSON)')
+
+    def handle(self, *args, **options):
+        try:
+            mix = loadtest.parse_mix(options['mix']) if options['mix'] else loadtest.DEFAULT_MIX
+        except ValueError as exc:
+            raise CommandError(exc)
+
+        if options['compare_databases']:
+            reports = self.compare(mix, options)
+        else:
+            reports = self.run(mix, options)
+
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                json.dump(reports, file, ensure_ascii=False, indent=2)
+            self.stdout.write(self.style.SUCCESS(f'Отчет сохранен в {options["output"]}'))
+
+    def run(self, mix: dict, options: dict) -> list:
+        reports = []
+        for interface in options['interface']:
+            for concurrency in options['concurrency']:
+                try:
+                    report = loadtest.run(interface, concurrency, options['duration'], mix, options['users'],
+                                          options['interval'], options['seed'], options['keep_data'])
+                except ValueError as exc:
+                    raise CommandError(exc)
+                reports.append(report)
+                self.write_report(report)
+        return reports
+
+    def compare(self, mix: dict, options: dict) -> list:
+        try:
+            comparisons = loadtest.compare_databases(options['concurrency'], options['duration'], mix,
+                                                     options['users'], options['interval'], options['seed'],
+                                                     options['keep_data'])
+        except ValueError as exc:
+            raise CommandError(exc)
+        for comparison in comparisons:
+            for label in ('before', 'after'):
+                report = comparison[label]
+                self.stdout.write(
+                    f"{label:>6} x{comparison['concurrency']}: {report['throughput']} req/s, "
+                    f"p95 {report['p95_ms']} ms, p99 {report['p99_ms']} ms, errors {report['error_rate']:.2%}, "
+                    f"database is locked {report['locked_rate']:.2%}"
+                )
+        return comparisons
+
+    def write_report(self, report: dict):
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"{report['interface']} x{report['concurrency']}: {report['throughput']} req/s, "
+            f"p50 {report['p50_ms']} ms, p95 {report['p95_ms']} ms, p99 {report['p99_ms']} ms, "
+            f"errors {report['error_rate']:.2%}, database is locked {report['locked_rate']:.2%}"
+        ))
+        for name, route in report['routes'].items():
+            self.stdout.write(f"  {name}: {route['requests']} requests, p95 {route['p95_ms']} ms, "
+                              f"errors {route['errors']}, locked {route['locked']}")
+        for bucket in report['timeline']:
+            self.stdout.write(f"  {bucket['second']:>6}s: {bucket['throughput']} req/s, p95 {bucket['p95_ms']} ms, "
+                              f"errors {bucket['errors']}, locked {bucket['locked']}")
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from main_crm import search
+
+
+class Command(BaseCommand):
+    help = ('Перестраивает полнотекстовый индекс взаимодействий (SQLite FTS5) пачками в теневой таблице '
+            'и подменяет ею индекс')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Количество взаимодействий, которые записываются в новый индекс одной транзакцией')
+
+    def handle(self, *args, **options):
+        if not search.is_available():
+            self.stderr.write('Полнотекстовый поиск поддерживается только для SQLite')
+            return
+
+        def progress(total):
+            self.stdout.write(f'Проиндексировано: {total}')
+
+        total = search.rebuild_index(batch_size=options['batch_size'], progress=progress)
+        self.stdout.write(self.style.SUCCESS(f'Индекс перестроен, записей: {total}'))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from main_crm import caching
+from main_crm.counters import recompute_counters
+from main_crm.models import Company
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает денормализованные счетчики компаний и проектов по данным взаимодействий'
+
+    def add_arguments(self, parser):
+        parser.add_argument('slugs', nargs='*', help='Слаги компаний для пересчета (по умолчанию - все)')
+
+    def handle(self, *args, **options):
+        companies = Company.objects.all()
+        if options['slugs']:
+            companies = companies.filter(slug__in=options['slugs'])
+
+        with transaction.atomic():
+            total = recompute_counters(companies=companies)
+        caching.invalidate(caching.COMPANY_LIST)
+        self.stdout.write(self.style.SUCCESS(f'Счетчики пересчитаны, компаний: {total}'))
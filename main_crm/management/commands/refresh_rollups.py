@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from main_crm import analytics
+
+
+class Command(BaseCommand):
+    help = 'Обновляет дневные агрегаты взаимодействий для аналитики (инкрементально от watermark)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Пересчитать все агрегаты заново')
+
+    def handle(self, *args, **options):
+        stats = analytics.refresh_rollups(full=options['full'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Агрегаты обновлены: дней {stats["days"]}, корзин {stats["buckets"]}'
+        ))
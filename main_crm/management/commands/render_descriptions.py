@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from main_crm.richtext import render_descriptions
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает очищенный HTML и начало описания простым текстом у компаний, проектов и взаимодействий'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Количество записей, обновляемых одним запросом')
+
+    def handle(self, *args, **options):
+        def progress(model_name, processed):
+            self.stdout.write(f'{model_name}: {processed}')
+
+        total = render_descriptions(batch_size=options['batch_size'], progress=progress)
+        self.stdout.write(self.style.SUCCESS(f'Описания пересчитаны, записей: {total}'))
@@ -0,0 +1,47 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from main_crm import jobs
+
+
+class Command(BaseCommand):
+    help = 'Выполняет фоновые задачи из очереди в пуле потоков или процессов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count(), help='Размер пула')
+        parser.add_argument('--processes', action='store_true',
+                            help='Использовать пул процессов вместо пула потоков (для задач, нагружающих CPU)')
+        parser.add_argument('--batch-size', type=int, default=100, help='Количество задач, забираемых за раз')
+        parser.add_argument('--visibility-timeout', type=int, default=jobs.VISIBILITY_TIMEOUT,
+                            help='Время в секундах, после которого незавершенную задачу может забрать другой воркер')
+        parser.add_argument('--poll-interval', type=float, default=1.0,
+                            help='Пауза в секундах, если в очереди нет готовых задач')
+        parser.add_argument('--once', action='store_true', help='Выполнить готовые задачи и завершиться')
+
+    def handle(self, *args, **options):
+        if options['processes']:
+            # Соединения с базой данных не должны наследоваться дочерними процессами
+            connections.close_all()
+            executor_class = ProcessPoolExecutor
+        else:
+            executor_class = ThreadPoolExecutor
+
+        total = 0
+        try:
+            with executor_class(max_workers=options['workers']) as executor:
+                while True:
+                    processed = jobs.run_pending(executor, options['batch_size'], options['visibility_timeout'])
+                    total += processed
+                    if processed:
+                        self.stdout.write(f'Выполнено задач: {processed}')
+                    elif options['once']:
+                        break
+                    else:
+                        time.sleep(options['poll_interval'])
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(self.style.SUCCESS(f'Воркер остановлен, выполнено задач: {total}'))
@@ -0,0 +1,178 @@
+# Generated by Django 4.0 on 2026-10-18 15:49
+
+import ckeditor_uploader.fields
+import django.core.validators
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('main_crm', '0007_profile'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='company',
+            name='company_name',
+            field=models.CharField(max_length=150, unique=True, verbose_name='Название компании'),
+        ),
+        migrations.AlterField(
+            model_name='company',
+            name='description',
+            field=ckeditor_uploader.fields.RichTextUploadingField(blank=True, verbose_name='Описание'),
+        ),
+        migrations.AlterField(
+            model_name='company',
+            name='edited',
+            field=models.DateField(auto_now=True, verbose_name='Последнее изменение'),
+        ),
+        migrations.AlterField(
+            model_name='company',
+            name='fio',
+            field=models.CharField(max_length=150, verbose_name='Руководитель компании'),
+        ),
+        migrations.AlterField(
+            model_name='company',
+            name='published',
+            field=models.DateField(auto_now_add=True, verbose_name='Дата публикации'),
+        ),
+        migrations.AlterField(
+            model_name='company',
+            name='slug',
+            field=models.SlugField(null=True, unique=True, verbose_name='Слаг'),
+        ),
+        migrations.AlterField(
+            model_name='email',
+            name='email',
+            field=models.EmailField(max_length=30, verbose_name='Адрес электронной почты'),
+        ),
+        migrations.AlterField(
+            model_name='email',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='main_crm.company', verbose_name='Компания'),
+        ),
+        migrations.AlterField(
+            model_name='interaction',
+            name='channel',
+            field=models.CharField(choices=[('r', 'Заявка'), ('l', 'Письмо'), ('w', 'Сайт'), ('i', 'Инициатива компании')], max_length=1, verbose_name='Канал обращения'),
+        ),
+        migrations.AlterField(
+            model_name='interaction',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, verbose_name='Дата создания'),
+        ),
+        migrations.AlterField(
+            model_name='interaction',
+            name='description',
+            field=ckeditor_uploader.fields.RichTextUploadingField(blank=True, verbose_name='Описание'),
+        ),
+        migrations.AlterField(
+            model_name='interaction',
+            name='manager',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='auth.user', verbose_name='Менеджер'),
+        ),
+        migrations.AlterField(
+            model_name='interaction',
+            name='mark',
+            field=models.CharField(choices=[('1', 'Ужасно'), ('2', 'Плохо'), ('3', 'Нормально'), ('4', 'Хорошо'), ('5', 'Отлично')], max_length=1, verbose_name='Оценка'),
+        ),
+        migrations.AlterField(
+            model_name='interaction',
+            name='project',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='main_crm.project', verbose_name='Проект'),
+        ),
+        migrations.AlterField(
+            model_name='interaction',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, verbose_name='Дата редактирования'),
+        ),
+        migrations.AlterField(
+            model_name='phone',
+            name='phone',
+            field=models.CharField(max_length=30, verbose_name='Номер телефона'),
+        ),
+        migrations.AlterField(
+            model_name='phone',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='main_crm.company', verbose_name='Компания'),
+        ),
+        migrations.AlterField(
+            model_name='profile',
+            name='profile_image',
+            field=models.ImageField(blank=True, null=True, upload_to='', verbose_name='Аватар'),
+        ),
+        migrations.AlterField(
+            model_name='profile',
+            name='user',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, to='auth.user', verbose_name='Пользователь'),
+        ),
+        migrations.AlterField(
+            model_name='project',
+            name='cost',
+            field=models.IntegerField(blank=True, null=True, validators=[django.core.validators.MinValueValidator(0)], verbose_name='Затраты на проект'),
+        ),
+        migrations.AlterField(
+            model_name='project',
+            name='description',
+            field=ckeditor_uploader.fields.RichTextUploadingField(blank=True, verbose_name='Описание'),
+        ),
+        migrations.AlterField(
+            model_name='project',
+            name='finished_at',
+            field=models.DateField(blank=True, null=True, verbose_name='Дата завершения проекта'),
+        ),
+        migrations.AlterField(
+            model_name='project',
+            name='started_at',
+            field=models.DateField(verbose_name='Дата начала проекта'),
+        ),
+        migrations.AlterField(
+            model_name='project',
+            name='title',
+            field=models.CharField(max_length=250, verbose_name='Название проекта'),
+        ),
+        migrations.AlterField(
+            model_name='project',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='main_crm.company', verbose_name='Компания'),
+        ),
+        migrations.AddIndex(
+            model_name='company',
+            index=models.Index(fields=['published', 'id'], name='company_published_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='company',
+            index=models.Index(fields=['company_name', 'id'], name='company_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='interaction',
+            index=models.Index(fields=['-updated_at', 'id'], name='interaction_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='interaction',
+            index=models.Index(fields=['project', '-updated_at', 'id'], name='interaction_project_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='interaction',
+            index=models.Index(fields=['manager', '-updated_at', 'id'], name='interaction_manager_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='interaction',
+            index=models.Index(fields=['channel', '-updated_at', 'id'], name='interaction_channel_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='interaction',
+            index=models.Index(fields=['mark', '-updated_at', 'id'], name='interaction_mark_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='project',
+            index=models.Index(fields=['-started_at', 'id'], name='project_started_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='project',
+            index=models.Index(fields=['user', '-started_at', 'id'], name='project_user_started_idx'),
+        ),
+    ]
@@ -0,0 +1,49 @@
+import html
+
+from django.db import migrations
+from django.utils.html import strip_tags
+
+FTS_TABLE = 'main_crm_interaction_fts'
+
+
+def html_to_text(value):
+    """
+    Копия main_crm.utils.html_to_text на момент миграции: миграция не должна зависеть от текущего кода приложения
+    :param value:
+    :return:
+    """
+    return ' '.join(html.unescape(strip_tags((value or '').replace('<', ' <'))).split())
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+        f"company, project, description, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+    )
+
+    Interaction = apps.get_model('main_crm', 'Interaction')
+    rows = Interaction.objects.values_list('id', 'project__user__company_name', 'project__title', 'description')
+    with schema_editor.connection.cursor() as cursor:
+        cursor.executemany(
+            f'INSERT INTO {FTS_TABLE} (rowid, company, project, description) VALUES (%s, %s, %s, %s)',
+            ((pk, company_name, title, html_to_text(description))
+             for pk, company_name, title, description in rows.iterator())
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_crm', '0008_composite_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
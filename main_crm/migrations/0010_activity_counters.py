@@ -0,0 +1,143 @@
+# Generated by Django 4.0 on 2026-10-18 15:53
+
+from django.db import migrations, models
+from django.db.models import Count, Max, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+# Оценки и агрегаты зафиксированы на момент миграции: изменения main_crm.counters ее не затрагивают
+MARKS = ('1', '2', '3', '4', '5')
+
+
+def aggregate(queryset, expression):
+    return Coalesce(Subquery(queryset.order_by().annotate(value=expression).values('value')), Value(0))
+
+
+def fill_counters(apps, schema_editor):
+    Company = apps.get_model('main_crm', 'Company')
+    Project = apps.get_model('main_crm', 'Project')
+    Interaction = apps.get_model('main_crm', 'Interaction')
+
+    interactions = Interaction.objects.filter(project=OuterRef('pk')).values('project')
+    Project.objects.update(
+        interaction_count=aggregate(interactions, Count('pk')),
+        last_interaction_at=Subquery(interactions.order_by().annotate(value=Max('updated_at')).values('value')),
+        **{f'mark_{mark}_count': aggregate(interactions.filter(mark=mark), Count('pk')) for mark in MARKS}
+    )
+
+    company_projects = Project.objects.filter(user=OuterRef('pk')).values('user')
+    Company.objects.update(
+        project_count=aggregate(company_projects, Count('pk')),
+        total_cost=aggregate(company_projects, Sum('cost')),
+        interaction_count=aggregate(company_projects, Sum('interaction_count')),
+        last_interaction_at=Subquery(
+            company_projects.order_by().annotate(value=Max('last_interaction_at')).values('value')
+        ),
+        **{f'mark_{mark}_count': aggregate(company_projects, Sum(f'mark_{mark}_count')) for mark in MARKS}
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_crm', '0009_interaction_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='company',
+            name='interaction_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество взаимодействий'),
+        ),
+        migrations.AddField(
+            model_name='company',
+            name='last_interaction_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Последнее взаимодействие'),
+        ),
+        migrations.AddField(
+            model_name='company',
+            name='mark_1_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Оценок "Ужасно"'),
+        ),
+        migrations.AddField(
+            model_name='company',
+            name='mark_2_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Оценок "Плохо"'),
+        ),
+        migrations.AddField(
+            model_name='company',
+            name='mark_3_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Оценок "Нормально"'),
+        ),
+        migrations.AddField(
+            model_name='company',
+            name='mark_4_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Оценок "Хорошо"'),
+        ),
+        migrations.AddField(
+            model_name='company',
+            name='mark_5_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Оценок "Отлично"'),
+        ),
+        migrations.AddField(
+            model_name='company',
+            name='project_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество проектов'),
+        ),
+        migrations.AddField(
+            model_name='company',
+            name='total_cost',
+            field=models.BigIntegerField(default=0, editable=False, verbose_name='Затраты на проекты'),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='interaction_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество взаимодействий'),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='last_interaction_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Последнее взаимодействие'),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='mark_1_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Оценок "Ужасно"'),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='mark_2_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Оценок "Плохо"'),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='mark_3_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Оценок "Нормально"'),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='mark_4_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Оценок "Хорошо"'),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='mark_5_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Оценок "Отлично"'),
+        ),
+        migrations.AddIndex(
+            model_name='company',
+            index=models.Index(fields=['project_count', 'id'], name='company_project_count_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='company',
+            index=models.Index(fields=['interaction_count', 'id'], name='company_interaction_count_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='company',
+            index=models.Index(fields=['last_interaction_at', 'id'], name='company_last_interaction_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='company',
+            index=models.Index(fields=['total_cost', 'id'], name='company_total_cost_idx'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
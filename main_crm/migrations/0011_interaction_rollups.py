@@ -0,0 +1,71 @@
+# Generated by Django 4.0 on 2026-10-18 15:56
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('main_crm', '0010_activity_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InteractionRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='День')),
+                ('channel', models.CharField(choices=[('r', 'Заявка'), ('l', 'Письмо'), ('w', 'Сайт'), ('i', 'Инициатива компании')], max_length=1, verbose_name='Канал обращения')),
+                ('mark', models.CharField(choices=[('1', 'Ужасно'), ('2', 'Плохо'), ('3', 'Нормально'), ('4', 'Хорошо'), ('5', 'Отлично')], max_length=1, verbose_name='Оценка')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='Количество')),
+            ],
+            options={
+                'verbose_name': 'Interaction rollup',
+                'verbose_name_plural': 'Interaction rollups',
+            },
+        ),
+        migrations.CreateModel(
+            name='RollupDirtyDay',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(unique=True, verbose_name='День')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='RollupState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True, verbose_name='Агрегат')),
+                ('watermark', models.DateTimeField(blank=True, null=True, verbose_name='Обработано до')),
+                ('refreshed_at', models.DateTimeField(blank=True, null=True, verbose_name='Последнее обновление')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='interaction',
+            index=models.Index(fields=['created_at'], name='interaction_created_idx'),
+        ),
+        migrations.AddField(
+            model_name='interactionrollup',
+            name='company',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='main_crm.company', verbose_name='Компания'),
+        ),
+        migrations.AddField(
+            model_name='interactionrollup',
+            name='manager',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='auth.user', verbose_name='Менеджер'),
+        ),
+        migrations.AddIndex(
+            model_name='interactionrollup',
+            index=models.Index(fields=['manager', 'day'], name='rollup_manager_day_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='interactionrollup',
+            index=models.Index(fields=['company', 'day'], name='rollup_company_day_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='interactionrollup',
+            constraint=models.UniqueConstraint(fields=('day', 'manager', 'company', 'channel', 'mark'), name='interaction_rollup_bucket'),
+        ),
+    ]
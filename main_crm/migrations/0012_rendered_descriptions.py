@@ -0,0 +1,175 @@
+# Generated by Django 4.0 on 2026-10-18 16:07
+
+import html
+from html.parser import HTMLParser
+from urllib.parse import urlsplit
+
+from django.db import migrations, models
+from django.utils.html import strip_tags
+
+# Копия правил main_crm.richtext на момент миграции: миграция не должна зависеть от текущего кода приложения
+EXCERPT_LENGTH = 255
+
+ALLOWED_TAGS = {
+    'a', 'b', 'blockquote', 'br', 'caption', 'code', 'div', 'em', 'figcaption', 'figure', 'h1', 'h2', 'h3', 'h4',
+    'h5', 'h6', 'hr', 'i', 'img', 'li', 'ol', 'p', 'pre', 's', 'span', 'strike', 'strong', 'sub', 'sup', 'table',
+    'tbody', 'td', 'tfoot', 'th', 'thead', 'tr', 'u', 'ul',
+}
+
+ALLOWED_ATTRIBUTES = {
+    'a': {'href', 'title', 'target'},
+    'img': {'src', 'alt', 'title', 'width', 'height'},
+    'td': {'colspan', 'rowspan'},
+    'th': {'colspan', 'rowspan', 'scope'},
+    'table': {'border', 'cellpadding', 'cellspacing'},
+}
+
+URL_ATTRIBUTES = {'href', 'src'}
+
+ALLOWED_SCHEMES = {'', 'http', 'https', 'mailto', 'tel'}
+
+DROP_CONTENT_TAGS = {'script', 'style', 'iframe', 'object', 'embed', 'template', 'noscript', 'textarea', 'select'}
+
+VOID_TAGS = {'br', 'hr', 'img'}
+
+RENDERED_MODELS = ('Company', 'Project', 'Interaction')
+
+BATCH_SIZE = 500
+
+
+class Sanitizer(HTMLParser):
+    """
+    Копия main_crm.richtext.Sanitizer на момент миграции
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self.stack = []
+        self.dropping = 0
+
+    def is_allowed_url(self, value: str) -> bool:
+        value = ''.join(value.split())
+        try:
+            return urlsplit(value).scheme.lower() in ALLOWED_SCHEMES
+        except ValueError:
+            return False
+
+    def render_attributes(self, tag: str, attrs) -> str:
+        allowed = ALLOWED_ATTRIBUTES.get(tag, set())
+        result = []
+        for name, value in attrs:
+            if name not in allowed or value is None:
+                continue
+            if name in URL_ATTRIBUTES and not self.is_allowed_url(value):
+                continue
+            result.append(f' {name}="{html.escape(value)}"')
+        if tag == 'a' and any(name == 'target' for name, _ in attrs):
+            result.append(' rel="noopener noreferrer"')
+        return ''.join(result)
+
+    def handle_starttag(self, tag, attrs):
+        if tag in DROP_CONTENT_TAGS:
+            self.dropping += 1
+            return
+        if self.dropping or tag not in ALLOWED_TAGS:
+            return
+        self.parts.append(f'<{tag}{self.render_attributes(tag, attrs)}>')
+        if tag not in VOID_TAGS:
+            self.stack.append(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        if self.dropping or tag not in ALLOWED_TAGS:
+            return
+        self.parts.append(f'<{tag}{self.render_attributes(tag, attrs)}>')
+        if tag not in VOID_TAGS:
+            self.parts.append(f'</{tag}>')
+
+    def handle_endtag(self, tag):
+        if tag in DROP_CONTENT_TAGS:
+            self.dropping = max(self.dropping - 1, 0)
+            return
+        if self.dropping or tag not in self.stack:
+            return
+        while self.stack:
+            opened = self.stack.pop()
+            self.parts.append(f'</{opened}>')
+            if opened == tag:
+                break
+
+    def handle_data(self, data):
+        if not self.dropping:
+            self.parts.append(html.escape(data, quote=False))
+
+    def get_html(self) -> str:
+        self.close()
+        return ''.join(self.parts + [f'</{tag}>' for tag in reversed(self.stack)])
+
+
+def sanitize_html(value):
+    if not value:
+        return ''
+    sanitizer = Sanitizer()
+    sanitizer.feed(value)
+    return sanitizer.get_html()
+
+
+def html_to_text(value):
+    return ' '.join(html.unescape(strip_tags((value or '').replace('<', ' <'))).split())
+
+
+def fill_descriptions(apps, schema_editor):
+    for model_name in RENDERED_MODELS:
+        model = apps.get_model('main_crm', model_name)
+        queryset = model.objects.order_by('pk').only('pk', 'description')
+        last_pk = 0
+        while True:
+            batch = list(queryset.filter(pk__gt=last_pk)[:BATCH_SIZE])
+            if not batch:
+                break
+            for instance in batch:
+                instance.description_html = sanitize_html(instance.description)
+                instance.description_excerpt = html_to_text(instance.description_html)[:EXCERPT_LENGTH]
+            model.objects.bulk_update(batch, ['description_html', 'description_excerpt'])
+            last_pk = batch[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_crm', '0011_interaction_rollups'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='company',
+            name='description_excerpt',
+            field=models.CharField(blank=True, editable=False, max_length=255, verbose_name='Начало описания'),
+        ),
+        migrations.AddField(
+            model_name='company',
+            name='description_html',
+            field=models.TextField(blank=True, editable=False, verbose_name='Описание (HTML)'),
+        ),
+        migrations.AddField(
+            model_name='interaction',
+            name='description_excerpt',
+            field=models.CharField(blank=True, editable=False, max_length=255, verbose_name='Начало описания'),
+        ),
+        migrations.AddField(
+            model_name='interaction',
+            name='description_html',
+            field=models.TextField(blank=True, editable=False, verbose_name='Описание (HTML)'),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='description_excerpt',
+            field=models.CharField(blank=True, editable=False, max_length=255, verbose_name='Начало описания'),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='description_html',
+            field=models.TextField(blank=True, editable=False, verbose_name='Описание (HTML)'),
+        ),
+        migrations.RunPython(fill_descriptions, migrations.RunPython.noop),
+    ]
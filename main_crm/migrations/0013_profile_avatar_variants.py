@@ -0,0 +1,23 @@
+# Generated by Django 4.0 on 2026-10-18 16:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_crm', '0012_rendered_descriptions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='avatar_digest',
+            field=models.CharField(blank=True, editable=False, max_length=64, verbose_name='Хеш аватара'),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='avatar_formats',
+            field=models.CharField(blank=True, editable=False, max_length=20, verbose_name='Форматы аватара'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.0 on 2026-10-18 16:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_crm', '0013_profile_avatar_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UploadBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True, verbose_name='Имя файла')),
+                ('digest', models.CharField(max_length=64, verbose_name='Хеш содержимого')),
+                ('size', models.BigIntegerField(default=0, verbose_name='Размер')),
+                ('ref_count', models.IntegerField(default=0, verbose_name='Количество ссылок')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата загрузки')),
+            ],
+            options={
+                'verbose_name': 'Upload blob',
+                'verbose_name_plural': 'Upload blobs',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='uploadblob',
+            index=models.Index(fields=['ref_count', 'created_at'], name='upload_blob_orphan_idx'),
+        ),
+    ]
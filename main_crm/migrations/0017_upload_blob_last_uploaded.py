@@ -0,0 +1,33 @@
+# Generated by Django 4.0 on 2026-10-18 17:34
+
+from django.db import migrations, models
+from django.db.models import F
+import django.utils.timezone
+
+
+def copy_created_at(apps, schema_editor):
+    apps.get_model('main_crm', 'UploadBlob').objects.update(last_uploaded_at=F('created_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_crm', '0016_project_updated_at'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='uploadblob',
+            name='upload_blob_orphan_idx',
+        ),
+        migrations.AddField(
+            model_name='uploadblob',
+            name='last_uploaded_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, verbose_name='Дата последней загрузки'),
+        ),
+        migrations.RunPython(copy_created_at, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='uploadblob',
+            index=models.Index(fields=['ref_count', 'last_uploaded_at'], name='upload_blob_orphan_idx'),
+        ),
+    ]
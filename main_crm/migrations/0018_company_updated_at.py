@@ -0,0 +1,26 @@
+# Generated by Django 4.0 on 2026-10-18 17:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_crm', '0017_upload_blob_last_uploaded'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='company',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, verbose_name='Дата изменения'),
+        ),
+        migrations.AddIndex(
+            model_name='company',
+            index=models.Index(fields=['updated_at', 'id'], name='company_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='project',
+            index=models.Index(fields=['user', 'updated_at'], name='project_user_updated_idx'),
+        ),
+    ]
@@ -0,0 +1,50 @@
+from django.db.models import QuerySet
+
+# Полные rich-text поля, которые не нужны спискам: они выводят description_excerpt
+RICH_TEXT_FIELDS = ('description', 'description_html')
+
+
+def rich_text_fields(*relations: str) -> tuple:
+    """
+    Возвращает полные rich-text поля модели и связанных моделей для defer
+    :param relations: Пути связей, например 'project' или 'project__user'; '' - сама модель
+    :return:
+    """
+    return tuple(f'{relation}__{field}' if relation else field for relation in relations for field in RICH_TEXT_FIELDS)
+
+
+class QueryPlanMixin:
+    """
+    Миксин для контроллеров, который применяет к queryset объявленный план запроса:
+        select_related (tuple): Связи, загружаемые тем же запросом через JOIN;
+        prefetch_related (tuple): Связи, загружаемые одним дополнительным запросом;
+        defer_fields (tuple): Тяжелые поля, которые не выбираются из базы;
+        annotate_fields (dict): Вычисляемые поля (например, начало описания);
+    """
+    select_related = ()
+    prefetch_related = ()
+    defer_fields = ()
+    annotate_fields = {}
+
+    def get_queryset(self) -> QuerySet:
+        """
+        Переопределенный метод, который применяет план запроса к queryset контроллера
+        :return:
+        """
+        return self.apply_query_plan(super().get_queryset())
+
+    def apply_query_plan(self, queryset: QuerySet) -> QuerySet:
+        """
+        Метод для применения плана запроса к произвольному queryset
+        :param queryset:
+        :return:
+        """
+        if self.select_related:
+            queryset = queryset.select_related(*self.select_related)
+        if self.prefetch_related:
+            queryset = queryset.prefetch_related(*self.prefetch_related)
+        if self.annotate_fields:
+            queryset = queryset.annotate(**self.annotate_fields)
+        if self.defer_fields:
+            queryset = queryset.defer(*self.defer_fields)
+        return queryset
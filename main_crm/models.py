@@ -3,11 +3,71 @@ from django.db import models
 from django.core.validators import MinValueValidator
 from ckeditor_uploader.fields import RichTextUploadingField
 from django.urls import reverse_lazy
+from django.utils import timezone
 from django.contrib.auth.models import User
-from .const import CHANNELS, MARKS
+from .const import CHANNELS, MARKS, DESCRIPTION_EXCERPT_LENGTH, JOB_STATUSES
 
 
-class Company(models.Model):
+class ActivityCounters(models.Model):
+    """
+    Абстрактная модель денормализованных счетчиков взаимодействий.
+    Поддерживаются сигналами (main_crm.signals), восстанавливаются командой recompute_rollups
+    атрибуты:
+        interaction_count (int): Количество взаимодействий;
+        last_interaction_at (datetime): Время последнего изменения взаимодействия;
+        mark_1_count...mark_5_count (int): Распределение оценок взаимодействий;
+    """
+    interaction_count = models.PositiveIntegerField(default=0, editable=False,
+                                                    verbose_name='Количество взаимодействий')
+    last_interaction_at = models.DateTimeField(null=True, blank=True, editable=False,
+                                               verbose_name='Последнее взаимодействие')
+    mark_1_count = models.PositiveIntegerField(default=0, editable=False, verbose_name='Оценок "Ужасно"')
+    mark_2_count = models.PositiveIntegerField(default=0, editable=False, verbose_name='Оценок "Плохо"')
+    mark_3_count = models.PositiveIntegerField(default=0, editable=False, verbose_name='Оценок "Нормально"')
+    mark_4_count = models.PositiveIntegerField(default=0, editable=False, verbose_name='Оценок "Хорошо"')
+    mark_5_count = models.PositiveIntegerField(default=0, editable=False, verbose_name='Оценок "Отлично"')
+
+    class Meta:
+        abstract = True
+
+    @property
+    def mark_distribution(self) -> dict:
+        """
+        Возвращает распределение оценок в виде {оценка: количество}
+        :return:
+        """
+        return {mark: getattr(self, f'mark_{mark}_count') for mark, _ in MARKS}
+
+    @property
+    def mark_mean(self):
+        """
+        Возвращает среднюю оценку взаимодействий или None, если оценок нет
+        :return:
+        """
+        distribution = self.mark_distribution
+        total = sum(distribution.values())
+        if not total:
+            return None
+        return sum(int(mark) * count for mark, count in distribution.items()) / total
+
+
+class RenderedDescription(models.Model):
+    """
+    Абстрактная модель производных полей rich-text описания.
+    Заполняются при сохранении (main_crm.signals), восстанавливаются командой render_descriptions
+    атрибуты:
+        description_html (str): Описание, очищенное от небезопасной разметки;
+        description_excerpt (str): Начало описания простым текстом для списков;
+    """
+    description_html = models.TextField(blank=True, editable=False, verbose_name='Описание (HTML)')
+    description_excerpt = models.CharField(max_length=DESCRIPTION_EXCERPT_LENGTH, blank=True, editable=False,
+                                           verbose_name='Начало описания')
+
+    class Meta:
+        abstract = True
+
+
+class Company(ActivityCounters, RenderedDescription):
     """
     Модель компании
     атрибуты:
@@ -17,6 +77,9 @@ class Company(models.Model):
         description (str): Описание компании;
         published (date): Дата публикации записи;
         edited (date): Дата последнего изменения;
+        project_count (int): Количество проектов;
+        total_cost (int): Суммарные затраты на проекты;
+        updated_at (datetime): Время последнего изменения записи, в том числе счетчиков;
     """
     company_name = models.CharField(max_length=150, unique=True, verbose_name='Название компании')
     slug = models.SlugField(unique=True, null=True, verbose_name='Слаг')
@@ -24,11 +87,23 @@ class Company(models.Model):
     description = RichTextUploadingField(blank=True, verbose_name='Описание')
     published = models.DateField(auto_now_add=True, verbose_name='Дата публикации')
     edited = models.DateField(auto_now=True, verbose_name='Последнее изменение')
+    project_count = models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество проектов')
+    total_cost = models.BigIntegerField(default=0, editable=False, verbose_name='Затраты на проекты')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Дата изменения')
 
     class Meta:
         ordering = ['published']
         verbose_name = 'Company'
         verbose_name_plural = 'Companies'
+        indexes = [
+            models.Index(fields=['published', 'id'], name='company_published_idx'),
+            models.Index(fields=['company_name', 'id'], name='company_name_idx'),
+            models.Index(fields=['project_count', 'id'], name='company_project_count_idx'),
+            models.Index(fields=['interaction_count', 'id'], name='company_interaction_count_idx'),
+            models.Index(fields=['last_interaction_at', 'id'], name='company_last_interaction_idx'),
+            models.Index(fields=['total_cost', 'id'], name='company_total_cost_idx'),
+            models.Index(fields=['updated_at', 'id'], name='company_updated_idx'),
+        ]
 
     def __str__(self):
         """
@@ -67,7 +142,7 @@ class Email(models.Model):
     email = models.EmailField(max_length=30, verbose_name='Адрес электронной почты')
 
 
-class Project(models.Model):
+class Project(ActivityCounters, RenderedDescription):
     """
     Модель проекта
         атрибуты:
@@ -77,6 +152,7 @@ class Project(models.Model):
         started_at(Date): Дата начала работы над проектом;
         finished_at(Date): Дата окончания работы над проектом;
         cost(int): Затраты на проект;
+        updated_at(Datetime): Дата изменения проекта;
     """
     user = models.ForeignKey('Company', on_delete=models.CASCADE, verbose_name='Компания')
     title = models.CharField(max_length=250, verbose_name='Название проекта')
@@ -85,11 +161,17 @@ class Project(models.Model):
     finished_at = models.DateField(blank=True, null=True, verbose_name='Дата завершения проекта')
     cost = models.IntegerField(blank=True, null=True, validators=(MinValueValidator(0),)
                                , verbose_name='Затраты на проект')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Дата изменения')
 
     class Meta:
         ordering = ['-started_at']
         verbose_name = 'Project'
         verbose_name_plural = 'Projects'
+        indexes = [
+            models.Index(fields=['-started_at', 'id'], name='project_started_idx'),
+            models.Index(fields=['user', '-started_at', 'id'], name='project_user_started_idx'),
+            models.Index(fields=['user', 'updated_at'], name='project_user_updated_idx'),
+        ]
 
     def __str__(self):
         """
@@ -117,7 +199,7 @@ class Project(models.Model):
             raise ValidationError({'started_at': 'Started_at can`t be bigger then finished_at'})
 
 
-class Interaction(models.Model):
+class Interaction(RenderedDescription):
     """
     Модель взаимодействия
         атрибуты:
@@ -145,6 +227,14 @@ class Interaction(models.Model):
         ordering = ['-updated_at']
         verbose_name = 'Interaction'
         verbose_name_plural = 'Interactions'
+        indexes = [
+            models.Index(fields=['-updated_at', 'id'], name='interaction_updated_idx'),
+            models.Index(fields=['project', '-updated_at', 'id'], name='interaction_project_idx'),
+            models.Index(fields=['manager', '-updated_at', 'id'], name='interaction_manager_idx'),
+            models.Index(fields=['channel', '-updated_at', 'id'], name='interaction_channel_idx'),
+            models.Index(fields=['mark', '-updated_at', 'id'], name='interaction_mark_idx'),
+            models.Index(fields=['created_at'], name='interaction_created_idx'),
+        ]
 
     def get_absolute_url(self):
         """
@@ -167,9 +257,13 @@ class Profile(models.Model):
         атрибуты:
             user(class User): Основа профиля;
             profile_image(img): Картинка профиля;
+            avatar_digest(str): Хеш содержимого аватара, под которым хранятся его уменьшенные копии;
+            avatar_formats(str): Форматы уменьшенных копий через запятую;
     """
     user = models.OneToOneField(User, on_delete=models.CASCADE, verbose_name='Пользователь')
     profile_image = models.ImageField(verbose_name='Аватар', blank=True, null=True)
+    avatar_digest = models.CharField(max_length=64, blank=True, editable=False, verbose_name='Хеш аватара')
+    avatar_formats = models.CharField(max_length=20, blank=True, editable=False, verbose_name='Форматы аватара')
 
     def __str__(self):
         """
@@ -177,3 +271,129 @@ class Profile(models.Model):
         :return:
         """
         return self.user.username
+
+
+class InteractionRollup(models.Model):
+    """
+    Модель дневного агрегата взаимодействий для аналитики (см. main_crm.analytics)
+    атрибуты:
+        day (date): День создания взаимодействий;
+        manager (class User): Менеджер;
+        company (class Company): Компания;
+        channel (str): Канал обращения;
+        mark (str): Оценка;
+        count (int): Количество взаимодействий в корзине;
+    """
+    day = models.DateField(verbose_name='День')
+    manager = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name='Менеджер')
+    company = models.ForeignKey('Company', on_delete=models.CASCADE, verbose_name='Компания')
+    channel = models.CharField(max_length=1, choices=CHANNELS, verbose_name='Канал обращения')
+    mark = models.CharField(max_length=1, choices=MARKS, verbose_name='Оценка')
+    count = models.PositiveIntegerField(default=0, verbose_name='Количество')
+
+    class Meta:
+        verbose_name = 'Interaction rollup'
+        verbose_name_plural = 'Interaction rollups'
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'manager', 'company', 'channel', 'mark'],
+                                    name='interaction_rollup_bucket'),
+        ]
+        indexes = [
+            models.Index(fields=['manager', 'day'], name='rollup_manager_day_idx'),
+            models.Index(fields=['company', 'day'], name='rollup_company_day_idx'),
+        ]
+
+
+class RollupState(models.Model):
+    """
+    Модель состояния обновления агрегатов
+    атрибуты:
+        name (str): Название агрегата;
+        watermark (datetime): updated_at, до которого взаимодействия уже обработаны;
+        refreshed_at (datetime): Время последнего обновления;
+    """
+    name = models.CharField(max_length=50, unique=True, verbose_name='Агрегат')
+    watermark = models.DateTimeField(null=True, blank=True, verbose_name='Обработано до')
+    refreshed_at = models.DateTimeField(null=True, blank=True, verbose_name='Последнее обновление')
+
+    def __str__(self):
+        return self.name
+
+
+class RollupDirtyDay(models.Model):
+    """
+    Модель дня, агрегаты которого нужно пересчитать (удаления не видны по updated_at)
+    атрибуты:
+        day (date): День создания удаленного взаимодействия;
+    """
+    day = models.DateField(unique=True, verbose_name='День')
+
+
+class UploadBlob(models.Model):
+    """
+    Модель файла, загруженного через CKEditor и сохраненного под хешем содержимого (см. main_crm.uploads)
+    атрибуты:
+        name (str): Имя файла в хранилище;
+        digest (str): SHA-256 содержимого;
+        size (int): Размер в байтах;
+        ref_count (int): Количество описаний, которые ссылаются на файл;
+        created_at (datetime): Время первой загрузки;
+        last_uploaded_at (datetime): Время последней загрузки того же содержимого (от него считается срок,
+            после которого файл без ссылок удаляется);
+    """
+    name = models.CharField(max_length=255, unique=True, verbose_name='Имя файла')
+    digest = models.CharField(max_length=64, verbose_name='Хеш содержимого')
+    size = models.BigIntegerField(default=0, verbose_name='Размер')
+    ref_count = models.IntegerField(default=0, verbose_name='Количество ссылок')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата загрузки')
+    last_uploaded_at = models.DateTimeField(default=timezone.now, verbose_name='Дата последней загрузки')
+
+    class Meta:
+        verbose_name = 'Upload blob'
+        verbose_name_plural = 'Upload blobs'
+        indexes = [
+            models.Index(fields=['ref_count', 'last_uploaded_at'], name='upload_blob_orphan_idx'),
+        ]
+
+    def __str__(self):
+        return self.name
+
+
+class Job(models.Model):
+    """
+    Модель задачи очереди фоновых задач (см. main_crm.jobs)
+    атрибуты:
+        task (str): Имя зарегистрированного обработчика;
+        payload (dict): Аргументы задачи;
+        status (str): Состояние задачи;
+        attempts (int): Количество начатых попыток;
+        max_attempts (int): Количество попыток, после которого задача считается неудачной;
+        run_after (datetime): Время, раньше которого задача не выполняется (отложенный повтор);
+        locked_by (str): Метка выборки воркера, который выполняет задачу;
+        locked_until (datetime): Время, после которого невыполненную задачу может забрать другой воркер;
+        last_error (str): Текст последней ошибки;
+        created_at (datetime): Время постановки в очередь;
+        finished_at (datetime): Время завершения;
+    """
+    task = models.CharField(max_length=100, verbose_name='Задача')
+    payload = models.JSONField(default=dict, verbose_name='Аргументы')
+    status = models.CharField(max_length=1, choices=JOB_STATUSES, default='q', verbose_name='Состояние')
+    attempts = models.PositiveIntegerField(default=0, verbose_name='Попытки')
+    max_attempts = models.PositiveIntegerField(default=5, verbose_name='Максимум попыток')
+    run_after = models.DateTimeField(default=timezone.now, verbose_name='Выполнить после')
+    locked_by = models.CharField(max_length=32, blank=True, verbose_name='Воркер')
+    locked_until = models.DateTimeField(null=True, blank=True, verbose_name='Заблокирована до')
+    last_error = models.TextField(blank=True, verbose_name='Последняя ошибка')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name='Дата завершения')
+
+    class Meta:
+        verbose_name = 'Job'
+        verbose_name_plural = 'Jobs'
+        indexes = [
+            models.Index(fields=['status', 'run_after'], name='job_ready_idx'),
+            models.Index(fields=['status', 'locked_until'], name='job_expired_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.task} #{self.pk}'
@@ -0,0 +1,160 @@
+"""
+Обнаружение N+1 запросов.
+SQL-запросы одного HTTP-запроса группируются по форме (SQL без значений параметров, списки IN
+сворачиваются) и месту вызова: строке шаблона ({{ project.user }}) или методу модуля main_crm.
+Если запрос одной формы из одного места выполняется больше NPLUSONE_THRESHOLD раз, это N+1:
+связь нужно загрузить заранее через select_related (загрузка объекта по id) или prefetch_related
+(загрузка связанных записей по внешнему ключу).
+Проверка включается в DEBUG (NPlusOneMiddleware) и в тестах контроллеров (NPlusOneTestRunner),
+где найденный N+1 завершает тест ошибкой.
+"""
+import logging
+import os
+import re
+import sys
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.template.base import Node
+from django.test import override_settings
+from django.test.runner import DiscoverRunner
+
+logger = logging.getLogger('main_crm.nplusone')
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+SKIP_FILES = {
+    os.path.abspath(__file__),
+    os.path.join(APP_DIR, 'instrumentation.py'),
+    os.path.join(APP_DIR, 'backends', 'sqlite3', 'base.py'),
+}
+
+RENDER_CODE = Node.render_annotated.__code__
+
+IN_LIST_RE = re.compile(r'IN \((?:%s, )*%s\)')
+NUMBER_RE = re.compile(r'\b\d+\b')
+LOOKUP_RE = re.compile(r'FROM "(\w+)".*? WHERE "\w+"\."(\w+)" (?:= %s|IN \(\.\.\.\))')
+
+
+class NPlusOneError(AssertionError):
+    pass
+
+
+def normalize(sql: str) -> str:
+    return NUMBER_RE.sub('N', IN_LIST_RE.sub('IN (...)', sql))
+
+
+def get_hint(shape: str) -> str:
+    """
+    Возвращает подсказку, как загрузить связь заранее
+    :param shape: Нормализованный SQL
+    :return:
+    """
+    match = LOOKUP_RE.search(shape)
+    if match is None:
+        return 'load the rows in the view query'
+    table, column = match.groups()
+    if column == 'id':
+        return f'select_related() the foreign key to {table}'
+    return f'prefetch_related() the {table} rows joined by {column}'
+
+
+def find_call_site() -> str:
+    """
+    Возвращает строку шаблона, при рендеринге которой выполнен запрос, или первое место вызова в main_crm
+    :return:
+    """
+    frame = sys._getframe(2)
+    app_site = None
+    while frame is not None:
+        code = frame.f_code
+        if code is RENDER_CODE:
+            node = frame.f_locals.get('self')
+            token = getattr(node, 'token', None)
+            origin = getattr(node, 'origin', None)
+            if token is not None and origin is not None:
+                return f'{origin.template_name}:{token.lineno} {{{{ {token.contents} }}}}'
+        elif app_site is None and code.co_filename.startswith(APP_DIR) and code.co_filename not in SKIP_FILES:
+            app_site = f'{os.path.relpath(code.co_filename, APP_DIR)}:{frame.f_lineno} {code.co_name}'
+        frame = frame.f_back
+    return app_site or '-'
+
+
+class Detector:
+    """
+    Обертка выполнения SQL (connection.execute_wrapper), которая считает запросы по форме и месту вызова
+    """
+
+    def __init__(self, threshold: int):
+        self.threshold = threshold
+        self.counts = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        if sql.startswith('SELECT'):
+            self.counts[normalize(sql), find_call_site()] += 1
+        return execute(sql, params, many, context)
+
+    def install(self, stack: ExitStack):
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(self))
+
+    def get_findings(self) -> list:
+        return [
+            {'site': site, 'count': count, 'sql': shape, 'hint': get_hint(shape)}
+            for (shape, site), count in self.counts.most_common() if count > self.threshold
+        ]
+
+
+def format_findings(path: str, findings: list) -> str:
+    lines = [f'N+1 queries in {path}:']
+    for finding in findings:
+        lines.append(f"  {finding['count']} x at {finding['site']}: {finding['hint']}\n    {finding['sql']}")
+    return '\n'.join(lines)
+
+
+class NPlusOneMiddleware:
+    """
+    Middleware для обнаружения N+1 запросов. Настройки:
+        NPLUSONE_ENABLED (bool): Включить проверку (по умолчанию равно DEBUG);
+        NPLUSONE_THRESHOLD (int): Допустимое количество повторов запроса одной формы из одного места;
+        NPLUSONE_RAISE (bool): Вызывать NPlusOneError вместо записи в лог main_crm.nplusone;
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'NPLUSONE_ENABLED', settings.DEBUG):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        detector = Detector(getattr(settings, 'NPLUSONE_THRESHOLD', 3))
+        with ExitStack() as stack:
+            detector.install(stack)
+            response = self.get_response(request)
+
+        findings = detector.get_findings()
+        if findings:
+            message = format_findings(request.path, findings)
+            if getattr(settings, 'NPLUSONE_RAISE', False):
+                raise NPlusOneError(message)
+            logger.warning(message)
+        return response
+
+
+class NPlusOneTestRunner(DiscoverRunner):
+    """
+    Тестовый раннер, который включает NPlusOneMiddleware с ошибкой для тестов модулей NPLUSONE_TEST_MODULES
+    """
+
+    def build_suite(self, *args, **kwargs):
+        suite = super().build_suite(*args, **kwargs)
+        modules = set(getattr(settings, 'NPLUSONE_TEST_MODULES', ()))
+        decorated = set()
+        for test in suite:
+            test_class = type(test)
+            if test_class.__module__ in modules and test_class not in decorated:
+                override_settings(NPLUSONE_ENABLED=True, NPLUSONE_RAISE=True)(test_class)
+                decorated.add(test_class)
+        return suite
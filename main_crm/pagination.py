@@ -0,0 +1,215 @@
+from django.core import signing
+from django.core.exceptions import FieldDoesNotExist
+from django.core.paginator import InvalidPage
+from django.db.models import Q
+from django.http import Http404
+from django.utils.translation import gettext as _
+
+
+class CursorPage:
+    """
+    Страница курсорной пагинации
+    атрибуты:
+        object_list (list): Записи текущей страницы;
+        next_cursor (str): Токен следующей страницы или None;
+        previous_cursor (str): Токен предыдущей страницы или None;
+    """
+
+    def __init__(self, object_list, next_cursor, previous_cursor):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return f'<CursorPage {len(self.object_list)} objects>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self) -> bool:
+        return self.next_cursor is not None
+
+    def has_previous(self) -> bool:
+        return self.previous_cursor is not None
+
+    def has_other_pages(self) -> bool:
+        return self.has_next() or self.has_previous()
+
+
+class CursorPaginator:
+    """
+    Пагинатор по ключу (keyset): вместо OFFSET и COUNT(*) страница выбирается условием
+    "после/до значения ключа сортировки", поэтому стоимость любой страницы одинакова.
+    Ключом служит сортировка queryset (или Meta.ordering модели), дополненная pk.
+    В сортировке допускаются аннотации (например, релевантность поиска).
+    """
+    salt = 'main_crm.pagination.cursor'
+
+    def __init__(self, queryset, per_page):
+        self.per_page = int(per_page)
+        self.ordering = self.get_ordering(queryset)
+        self.queryset = queryset.order_by(*self.ordering)
+        self.opts = queryset.model._meta
+
+    @staticmethod
+    def get_ordering(queryset) -> list:
+        """
+        Возвращает сортировку queryset с pk в качестве последнего (уникального) ключа
+        :param queryset:
+        :return:
+        """
+        query = queryset.query
+        ordering = list(query.order_by or (query.default_ordering and query.get_meta().ordering) or [])
+        names = [field.lstrip('-') for field in ordering]
+        if 'pk' not in names and 'id' not in names:
+            ordering.append('pk')
+        return ordering
+
+    def get_field(self, name):
+        """
+        Возвращает поле модели для ключа сортировки или None для аннотации
+        :param name:
+        :return:
+        """
+        if name == 'pk':
+            return self.opts.pk
+        try:
+            return self.opts.get_field(name)
+        except FieldDoesNotExist:
+            return None
+
+    def get_value(self, obj, name):
+        field = self.get_field(name)
+        if field is None:
+            return getattr(obj, name)
+        if field.value_from_object(obj) is None:
+            return None
+        return field.value_to_string(obj)
+
+    def to_python(self, name, value):
+        field = self.get_field(name)
+        return value if field is None else field.to_python(value)
+
+    def encode(self, obj, direction: str) -> str:
+        """
+        Формирует непрозрачный токен из значений ключа сортировки записи
+        :param obj:
+        :param direction: 'n' - следующая страница, 'p' - предыдущая
+        :return:
+        """
+        values = [self.get_value(obj, field.lstrip('-')) for field in self.ordering]
+        return signing.dumps([direction, self.ordering, values], salt=self.salt, compress=True)
+
+    def decode(self, cursor: str):
+        try:
+            direction, ordering, values = signing.loads(cursor, salt=self.salt)
+        except (signing.BadSignature, ValueError, TypeError):
+            raise InvalidPage(_('That page number is not an integer'))
+        if ordering != self.ordering or direction not in ('n', 'p'):
+            raise InvalidPage(_('That page contains no results'))
+        try:
+            values = [self.to_python(field.lstrip('-'), value) for field, value in zip(ordering, values)]
+        except Exception:
+            raise InvalidPage(_('That page contains no results'))
+        return direction, values
+
+    def get_filter(self, values, forward: bool) -> Q:
+        """
+        Строит условие "строго после" (forward) или "строго до" значений ключа
+        с учетом направления сортировки каждого поля
+        :param values:
+        :param forward:
+        :return:
+        """
+        condition = Q()
+        equal = Q()
+        for field, value in zip(self.ordering, values):
+            name = field.lstrip('-')
+            descending = field.startswith('-')
+            condition |= equal & self.get_step_filter(name, value, ascending=descending != forward)
+            equal &= Q(**{f'{name}__isnull': True}) if value is None else Q(**{name: value})
+        return condition
+
+    def get_step_filter(self, name, value, ascending: bool) -> Q:
+        """
+        Условие "значение поля строго больше (ascending) или строго меньше value".
+        NULL считается меньше любого значения, как при сортировке в SQLite
+        :param name:
+        :param value:
+        :param ascending:
+        :return:
+        """
+        field = self.get_field(name)
+        nullable = field is not None and field.null
+        if value is None:
+            return Q(**{f'{name}__isnull': False}) if ascending else Q(pk__in=[])
+        if ascending:
+            return Q(**{f'{name}__gt': value})
+        if nullable:
+            return Q(**{f'{name}__lt': value}) | Q(**{f'{name}__isnull': True})
+        return Q(**{f'{name}__lt': value})
+
+    def reversed_ordering(self) -> list:
+        return [field[1:] if field.startswith('-') else f'-{field}' for field in self.ordering]
+
+    def page(self, cursor=None) -> CursorPage:
+        """
+        Возвращает страницу по токену курсора (None - первая страница)
+        :param cursor:
+        :return:
+        """
+        if not cursor:
+            rows = list(self.queryset[:self.per_page + 1])
+            object_list = rows[:self.per_page]
+            next_cursor = self.encode(object_list[-1], 'n') if len(rows) > self.per_page else None
+            return CursorPage(object_list, next_cursor, None)
+
+        direction, values = self.decode(cursor)
+        if direction == 'n':
+            rows = list(self.queryset.filter(self.get_filter(values, True))[:self.per_page + 1])
+            object_list = rows[:self.per_page]
+            has_next = len(rows) > self.per_page
+            has_previous = True
+        else:
+            queryset = self.queryset.filter(self.get_filter(values, False)).order_by(*self.reversed_ordering())
+            rows = list(queryset[:self.per_page + 1])
+            object_list = rows[:self.per_page][::-1]
+            has_next = True
+            has_previous = len(rows) > self.per_page
+
+        if not object_list:
+            return CursorPage([], None, None)
+        next_cursor = self.encode(object_list[-1], 'n') if has_next else None
+        previous_cursor = self.encode(object_list[0], 'p') if has_previous else None
+        return CursorPage(object_list, next_cursor, previous_cursor)
+
+
+class CursorPaginationMixin:
+    """
+    Миксин для ListView/FilterView, который заменяет постраничную пагинацию на курсорную.
+    Токен страницы передается в GET-параметре cursor_kwarg
+    """
+    cursor_kwarg = 'cursor'
+
+    def paginate_queryset(self, queryset, page_size):
+        """
+        Переопределенный метод пагинации без OFFSET и COUNT(*)
+        :param queryset:
+        :param page_size:
+        :return:
+        """
+        paginator = CursorPaginator(queryset, page_size)
+        try:
+            page = paginator.page(self.request.GET.get(self.cursor_kwarg))
+        except InvalidPage as e:
+            raise Http404(_('Invalid page (%(page_number)s): %(message)s') % {
+                'page_number': self.request.GET.get(self.cursor_kwarg),
+                'message': str(e),
+            })
+        return paginator, page, page.object_list, page.has_other_pages()
@@ -1,5 +1,7 @@
 from django.contrib.auth.mixins import AccessMixin
 
+from .identity import IdentityMapMixin
+
 
 class SuperUserRequired(AccessMixin):
     def dispatch(self, request, *args, **kwargs):
@@ -8,7 +10,7 @@ class SuperUserRequired(AccessMixin):
         return super().dispatch(request, *args, **kwargs)
 
 
-class OwnerRequired(AccessMixin):
+class OwnerRequired(IdentityMapMixin, AccessMixin):
     user_field = 'user'
 
     def dispatch(self, request, *args, **kwargs):
@@ -16,12 +18,11 @@ class OwnerRequired(AccessMixin):
         user_field_name = self.get_user_field()
         assert user_field_name, 'Должен быть указан user_field'
 
-        if not request.user == getattr(self.object, user_field_name):
+        # Сравнение по id владельца, чтобы не загружать связанного пользователя
+        user_id = getattr(self.object, self.object._meta.get_field(user_field_name).attname)
+        if request.user.pk != user_id:
             return self.handle_no_permission()
         return super().dispatch(request, *args, **kwargs)
 
-    def get_object(self):
-        return getattr(self, 'object', None) or super().get_object()
-
     def get_user_field(self):
         return self.user_field
@@ -0,0 +1,198 @@
+"""
+Профилирование отдельных запросов по требованию суперпользователя.
+Запрос профилируется, если в нем есть параметр ?profile=<режим> или заголовок X-Profile: <режим>
+и пользователь - суперпользователь:
+    1 / cprofile - детерминированный профилировщик cProfile (файл .prof для pstats/snakeviz)
+                   и семплирование стеков (файл .collapsed для flamegraph.pl / speedscope);
+    sample - только семплирование стеков, почти не искажающее время выполнения.
+Результаты сохраняются в PROFILE_DIR, хранятся последние PROFILE_KEEP профилей,
+список выводится на странице profiles/. Запрос без параметра и заголовка middleware только пропускает дальше.
+"""
+import cProfile
+import json
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime
+
+from django.conf import settings
+from django.utils import timezone
+
+TRIGGER_PARAMETER = 'profile'
+TRIGGER_HEADER = 'HTTP_X_PROFILE'
+
+MODES = {'1': 'cprofile', 'cprofile': 'cprofile', 'sample': 'sample'}
+
+SAMPLE_INTERVAL = 0.001
+
+PROFILE_NAME_RE = re.compile(r'^\d{8}-\d{6}-\d{6}-[0-9a-f]{4}\.(prof|collapsed)$')
+
+
+def get_profile_dir() -> str:
+    return str(getattr(settings, 'PROFILE_DIR', os.path.join(settings.BASE_DIR, 'profiles')))
+
+
+def get_mode(request):
+    """
+    Возвращает режим профилирования, запрошенный параметром или заголовком, или None
+    :param request:
+    :return:
+    """
+    value = request.GET.get(TRIGGER_PARAMETER) or request.META.get(TRIGGER_HEADER)
+    return MODES.get(value) if value else None
+
+
+def format_frame(code) -> str:
+    filename = code.co_filename
+    for root in (str(settings.BASE_DIR), sys.prefix):
+        if filename.startswith(root):
+            filename = os.path.relpath(filename, root)
+            break
+    return f'{code.co_name} ({filename}:{code.co_firstlineno})'
+
+
+class StackSampler(threading.Thread):
+    """
+    Поток, который с интервалом SAMPLE_INTERVAL снимает стек потока запроса
+    и считает одинаковые стеки (формат collapsed stacks)
+    """
+
+    def __init__(self, thread_id: int, interval: float = SAMPLE_INTERVAL):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(format_frame(frame.f_code))
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def stop(self) -> Counter:
+        self.stopped.set()
+        self.join()
+        return self.stacks
+
+
+def save_profile(directory: str, info: dict, profiler=None, stacks: Counter = None) -> str:
+    """
+    Сохраняет результаты профилирования и удаляет старые профили
+    :param directory:
+    :param info: Сведения о запросе (сохраняются в .json)
+    :param profiler: cProfile.Profile или None
+    :param stacks: Счетчик collapsed-стеков
+    :return: Имя профиля
+    """
+    os.makedirs(directory, exist_ok=True)
+    name = f'{datetime.now():%Y%m%d-%H%M%S-%f}-{uuid.uuid4().hex[:4]}'
+    files = []
+    if profiler is not None:
+        profiler.dump_stats(os.path.join(directory, f'{name}.prof'))
+        files.append(f'{name}.prof')
+    if stacks:
+        with open(os.path.join(directory, f'{name}.collapsed'), 'w') as file:
+            file.writelines(f'{stack} {count}\n' for stack, count in stacks.most_common())
+        files.append(f'{name}.collapsed')
+    with open(os.path.join(directory, f'{name}.json'), 'w') as file:
+        json.dump({**info, 'name': name, 'files': files}, file, ensure_ascii=False)
+    rotate(directory, getattr(settings, 'PROFILE_KEEP', 50))
+    return name
+
+
+def rotate(directory: str, keep: int):
+    """
+    Удаляет все профили, кроме keep последних
+    :param directory:
+    :param keep:
+    :return:
+    """
+    names = sorted((entry[:-5] for entry in os.listdir(directory) if entry.endswith('.json')), reverse=True)
+    for name in names[keep:]:
+        for extension in ('.json', '.prof', '.collapsed'):
+            path = os.path.join(directory, name + extension)
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def list_profiles(directory: str = None) -> list:
+    """
+    Возвращает сведения о сохраненных профилях, начиная с последнего
+    :param directory:
+    :return:
+    """
+    directory = directory or get_profile_dir()
+    if not os.path.isdir(directory):
+        return []
+    profiles = []
+    for entry in sorted(os.listdir(directory), reverse=True):
+        if not entry.endswith('.json'):
+            continue
+        try:
+            with open(os.path.join(directory, entry)) as file:
+                profiles.append(json.load(file))
+        except (OSError, ValueError):
+            continue
+    return profiles
+
+
+class ProfilerMiddleware:
+    """
+    Middleware для профилирования запроса суперпользователя по параметру profile или заголовку X-Profile.
+    Должен стоять после AuthenticationMiddleware
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if TRIGGER_PARAMETER not in request.META.get('QUERY_STRING', '') and TRIGGER_HEADER not in request.META:
+            return self.get_response(request)
+        mode = get_mode(request)
+        if mode is None or not request.user.is_superuser:
+            return self.get_response(request)
+        return self.profile(request, mode)
+
+    def profile(self, request, mode: str):
+        """
+        Метод для выполнения запроса под профилировщиком и сохранения результата
+        :param request:
+        :param mode:
+        :return:
+        """
+        sampler = StackSampler(threading.get_ident())
+        profiler = cProfile.Profile() if mode == 'cprofile' else None
+        started = time.perf_counter()
+        sampler.start()
+        if profiler is not None:
+            profiler.enable()
+        try:
+            response = self.get_response(request)
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            stacks = sampler.stop()
+        duration = time.perf_counter() - started
+
+        match = getattr(request, 'resolver_match', None)
+        name = save_profile(get_profile_dir(), {
+            'mode': mode,
+            'method': request.method,
+            'path': request.get_full_path(),
+            'url_name': match.view_name if match else '',
+            'status': response.status_code,
+            'user': request.user.get_username(),
+            'duration_ms': round(duration * 1000, 2),
+            'created_at': timezone.now().isoformat(),
+        }, profiler, stacks)
+        response.headers['X-Profile-Name'] = name
+        return response
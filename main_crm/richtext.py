@@ -0,0 +1,171 @@
+"""
+Производные поля rich-text описаний (см. models.RenderedDescription):
+    description_html - HTML из CKEditor, очищенный по белому списку тегов и атрибутов;
+    description_excerpt - начало описания простым текстом для списков.
+Поля вычисляются один раз при записи (сигнал pre_save), для существующих записей -
+миграцией и командой render_descriptions.
+"""
+import html
+from html.parser import HTMLParser
+from urllib.parse import urlsplit
+
+from django.apps import apps as global_apps
+
+from .const import DESCRIPTION_EXCERPT_LENGTH
+from .utils import html_to_text
+
+ALLOWED_TAGS = {
+    'a', 'b', 'blockquote', 'br', 'caption', 'code', 'div', 'em', 'figcaption', 'figure', 'h1', 'h2', 'h3', 'h4',
+    'h5', 'h6', 'hr', 'i', 'img', 'li', 'ol', 'p', 'pre', 's', 'span', 'strike', 'strong', 'sub', 'sup', 'table',
+    'tbody', 'td', 'tfoot', 'th', 'thead', 'tr', 'u', 'ul',
+}
+
+ALLOWED_ATTRIBUTES = {
+    'a': {'href', 'title', 'target'},
+    'img': {'src', 'alt', 'title', 'width', 'height'},
+    'td': {'colspan', 'rowspan'},
+    'th': {'colspan', 'rowspan', 'scope'},
+    'table': {'border', 'cellpadding', 'cellspacing'},
+}
+
+URL_ATTRIBUTES = {'href', 'src'}
+
+ALLOWED_SCHEMES = {'', 'http', 'https', 'mailto', 'tel'}
+
+# Теги, которые удаляются вместе с содержимым
+DROP_CONTENT_TAGS = {'script', 'style', 'iframe', 'object', 'embed', 'template', 'noscript', 'textarea', 'select'}
+
+VOID_TAGS = {'br', 'hr', 'img'}
+
+RENDERED_MODELS = ('Company', 'Project', 'Interaction')
+
+
+class Sanitizer(HTMLParser):
+    """
+    Парсер, который собирает HTML только из разрешенных тегов и атрибутов
+    и закрывает незакрытые теги
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self.stack = []
+        self.dropping = 0
+
+    def is_allowed_url(self, value: str) -> bool:
+        value = ''.join(value.split())
+        try:
+            return urlsplit(value).scheme.lower() in ALLOWED_SCHEMES
+        except ValueError:
+            return False
+
+    def render_attributes(self, tag: str, attrs) -> str:
+        allowed = ALLOWED_ATTRIBUTES.get(tag, set())
+        result = []
+        for name, value in attrs:
+            if name not in allowed or value is None:
+                continue
+            if name in URL_ATTRIBUTES and not self.is_allowed_url(value):
+                continue
+            result.append(f' {name}="{html.escape(value)}"')
+        if tag == 'a' and any(name == 'target' for name, _ in attrs):
+            result.append(' rel="noopener noreferrer"')
+        return ''.join(result)
+
+    def handle_starttag(self, tag, attrs):
+        if tag in DROP_CONTENT_TAGS:
+            self.dropping += 1
+            return
+        if self.dropping or tag not in ALLOWED_TAGS:
+            return
+        self.parts.append(f'<{tag}{self.render_attributes(tag, attrs)}>')
+        if tag not in VOID_TAGS:
+            self.stack.append(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        if self.dropping or tag not in ALLOWED_TAGS:
+            return
+        self.parts.append(f'<{tag}{self.render_attributes(tag, attrs)}>')
+        if tag not in VOID_TAGS:
+            self.parts.append(f'</{tag}>')
+
+    def handle_endtag(self, tag):
+        if tag in DROP_CONTENT_TAGS:
+            self.dropping = max(self.dropping - 1, 0)
+            return
+        if self.dropping or tag not in self.stack:
+            return
+        while self.stack:
+            opened = self.stack.pop()
+            self.parts.append(f'</{opened}>')
+            if opened == tag:
+                break
+
+    def handle_data(self, data):
+        if not self.dropping:
+            self.parts.append(html.escape(data, quote=False))
+
+    def get_html(self) -> str:
+        self.close()
+        return ''.join(self.parts + [f'</{tag}>' for tag in reversed(self.stack)])
+
+
+def sanitize_html(value: str) -> str:
+    """
+    Возвращает HTML, безопасный для вывода с |safe
+    :param value:
+    :return:
+    """
+    if not value:
+        return ''
+    sanitizer = Sanitizer()
+    sanitizer.feed(value)
+    return sanitizer.get_html()
+
+
+def make_excerpt(value: str) -> str:
+    """
+    Возвращает начало описания простым текстом
+    :param value: Очищенный HTML (содержимое script/style уже удалено)
+    :return:
+    """
+    return html_to_text(value)[:DESCRIPTION_EXCERPT_LENGTH]
+
+
+def render_description(instance):
+    """
+    Заполняет производные поля описания объекта
+    :param instance:
+    :return:
+    """
+    instance.description_html = sanitize_html(instance.description)
+    instance.description_excerpt = make_excerpt(instance.description_html)
+
+
+def render_descriptions(apps=global_apps, batch_size: int = 500, progress=None) -> int:
+    """
+    Пересчитывает производные поля описаний у всех записей пачками через bulk_update
+    :param apps: Реестр моделей (в миграциях передается исторический)
+    :param batch_size:
+    :param progress: Функция, которая вызывается с (имя модели, количество обработанных записей)
+    :return: Количество обновленных записей
+    """
+    total = 0
+    for model_name in RENDERED_MODELS:
+        model = apps.get_model('main_crm', model_name)
+        queryset = model.objects.order_by('pk').only('pk', 'description')
+        last_pk = 0
+        processed = 0
+        while True:
+            batch = list(queryset.filter(pk__gt=last_pk)[:batch_size])
+            if not batch:
+                break
+            for instance in batch:
+                render_description(instance)
+            model.objects.bulk_update(batch, ['description_html', 'description_excerpt'])
+            last_pk = batch[-1].pk
+            processed += len(batch)
+            if progress:
+                progress(model_name, processed)
+        total += processed
+    return total
@@ -0,0 +1,242 @@
+"""
+Полнотекстовый поиск по взаимодействиям на основе виртуальной таблицы SQLite FTS5.
+Одна строка индекса на взаимодействие (rowid = Interaction.id) с колонками:
+    company: название компании;
+    project: название проекта;
+    description: текст описания без HTML-разметки;
+Полная перестройка заполняет теневую таблицу короткими транзакциями и подменяет ею индекс в одной
+короткой транзакции, поэтому запись взаимодействий не ждет всю перестройку.
+"""
+import datetime
+import re
+
+from django.db import connection, transaction
+from django.db.models import Q, QuerySet
+from django.db.models.expressions import RawSQL
+from django.utils import timezone
+
+from .models import Interaction, Project
+from .utils import html_to_text
+
+FTS_TABLE = 'main_crm_interaction_fts'
+FTS_COLUMNS = ('company', 'project', 'description')
+FTS_OPTIONS = "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'"
+
+# Теневая таблица, в которую rebuild_index строит новый индекс, и прежний индекс, который удаляется после подмены
+REBUILD_TABLE = f'{FTS_TABLE}_rebuild'
+REPLACED_TABLE = f'{FTS_TABLE}_replaced'
+
+# Перекрытие при догоне изменений: записи из транзакций, которые начались до отметки времени,
+# а завершились после, обрабатываются повторно
+CATCH_UP_OVERLAP = datetime.timedelta(minutes=1)
+
+# Веса колонок для bm25: совпадение в названии проекта/компании важнее, чем в описании
+FTS_WEIGHTS = (4.0, 2.0, 1.0)
+
+TOKEN_RE = re.compile(r'\w+\*?')
+
+
+def is_available() -> bool:
+    """
+    Поиск через FTS5 доступен только для базы данных SQLite
+    :return:
+    """
+    return connection.vendor == 'sqlite'
+
+
+def build_match_query(value: str, column: str = None, prefix: bool = False) -> str:
+    """
+    Преобразует пользовательский ввод в безопасное выражение MATCH.
+    Каждое слово берется в кавычки, слово со звездочкой на конце (или любое слово при prefix=True)
+    ищется по префиксу. Слова объединяются по И.
+    :param value:
+    :param column: Ограничить поиск одной колонкой индекса
+    :param prefix:
+    :return:
+    """
+    terms = []
+    for token in TOKEN_RE.findall(value or ''):
+        word = token.rstrip('*')
+        star = '*' if prefix or token.endswith('*') else ''
+        terms.append(f'"{word}"{star}')
+    if not terms:
+        return ''
+    match = ' '.join(terms)
+    return f'{column} : ({match})' if column else match
+
+
+def search(queryset: QuerySet, value: str, column: str = None, prefix: bool = False,
+           ranked: bool = True) -> QuerySet:
+    """
+    Фильтрует queryset взаимодействий по полнотекстовому индексу
+    :param queryset:
+    :param value: Поисковая строка
+    :param column: Колонка индекса (company, project или description), None - по всем
+    :param prefix: Искать все слова по префиксу
+    :param ranked: Отсортировать результат по релевантности (bm25)
+    :return:
+    """
+    match = build_match_query(value, column, prefix)
+    if not match:
+        return queryset
+
+    table = queryset.model._meta.db_table
+    queryset = queryset.filter(id__in=RawSQL(f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', (match,)))
+    if ranked:
+        weights = ', '.join(str(weight) for weight in FTS_WEIGHTS)
+        rank = RawSQL(
+            f'SELECT bm25({FTS_TABLE}, {weights}) FROM {FTS_TABLE} '
+            f'WHERE {FTS_TABLE} MATCH %s AND {FTS_TABLE}.rowid = {table}.id',
+            (match,)
+        )
+        queryset = queryset.annotate(search_rank=rank).order_by('search_rank')
+    return queryset
+
+
+def get_index_rows(queryset: QuerySet):
+    """
+    Генератор строк индекса (rowid, company, project, description) для queryset взаимодействий
+    :param queryset:
+    :return:
+    """
+    rows = queryset.values_list('id', 'project__user__company_name', 'project__title', 'description')
+    for pk, company_name, title, description in rows.iterator():
+        yield pk, company_name, title, html_to_text(description)
+
+
+def index_interactions(queryset: QuerySet, table: str = FTS_TABLE) -> int:
+    """
+    Добавляет или обновляет записи индекса для queryset взаимодействий
+    :param queryset:
+    :param table: Таблица индекса
+    :return: Количество проиндексированных записей
+    """
+    if not is_available():
+        return 0
+    rows = list(get_index_rows(queryset))
+    with connection.cursor() as cursor:
+        cursor.executemany(f'DELETE FROM {table} WHERE rowid = %s', [(row[0],) for row in rows])
+        cursor.executemany(
+            f'INSERT INTO {table} (rowid, {", ".join(FTS_COLUMNS)}) VALUES (%s, %s, %s, %s)', rows
+        )
+    return len(rows)
+
+
+def remove_interaction(pk: int):
+    if is_available():
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', (pk,))
+
+
+def update_project_title(project_id: int, title: str):
+    """
+    Обновляет название проекта во всех записях индекса, относящихся к проекту
+    :param project_id:
+    :param title:
+    :return:
+    """
+    if is_available():
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'UPDATE {FTS_TABLE} SET project = %s '
+                f'WHERE rowid IN (SELECT id FROM main_crm_interaction WHERE project_id = %s)',
+                (title, project_id)
+            )
+
+
+def update_company_name(company_id: int, company_name: str):
+    """
+    Обновляет название компании во всех записях индекса, относящихся к компании
+    :param company_id:
+    :param company_name:
+    :return:
+    """
+    if is_available():
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'UPDATE {FTS_TABLE} SET company = %s WHERE rowid IN ('
+                f'SELECT i.id FROM main_crm_interaction i '
+                f'INNER JOIN main_crm_project p ON i.project_id = p.id WHERE p.user_id = %s)',
+                (company_name, company_id)
+            )
+
+
+def catch_up(table: str, since) -> int:
+    """
+    Переносит в теневую таблицу изменения, сделанные во время перестройки: взаимодействия, измененные
+    после since, и взаимодействия проектов и компаний, измененных после since
+    :param table:
+    :param since:
+    :return: Количество обновленных записей
+    """
+    since -= CATCH_UP_OVERLAP
+    projects = Project.objects.filter(Q(updated_at__gte=since) | Q(user__updated_at__gte=since)).values('pk')
+    total = index_interactions(Interaction.objects.filter(updated_at__gte=since), table)
+    total += index_interactions(Interaction.objects.filter(project__in=projects), table)
+    return total
+
+
+def remove_deleted(table: str):
+    """
+    Удаляет из теневой таблицы взаимодействия, удаленные во время перестройки. Требует полного просмотра индекса,
+    поэтому выполняется вне транзакции подмены: удаленные после него записи остаются в индексе, но не попадают
+    в результаты поиска, так как первичные ключи взаимодействий не используются повторно
+    :param table:
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {table} WHERE rowid NOT IN (SELECT id FROM {Interaction._meta.db_table})')
+
+
+def rebuild_index(batch_size: int = 1000, progress=None) -> int:
+    """
+    Полностью перестраивает индекс в теневой таблице, обрабатывая взаимодействия пачками по batch_size
+    в отдельных транзакциях. Затем догоняет изменения, сделанные во время перестройки, и в одной короткой
+    транзакции догоняет оставшиеся и подменяет индекс теневой таблицей. Прежний индекс удаляется уже после
+    подмены. Пока идет перестройка, поиск использует прежний индекс, при ошибке индекс остается нетронутым
+    :param batch_size:
+    :param progress: Функция, которая вызывается с количеством обработанных записей после каждой пачки
+    :return: Количество проиндексированных записей
+    """
+    if not is_available():
+        return 0
+
+    started_at = timezone.now()
+    with connection.cursor() as cursor:
+        cursor.execute(f'DROP TABLE IF EXISTS {REPLACED_TABLE}')
+        cursor.execute(f'DROP TABLE IF EXISTS {REBUILD_TABLE}')
+        cursor.execute(f'CREATE VIRTUAL TABLE {REBUILD_TABLE} USING fts5({", ".join(FTS_COLUMNS)}, {FTS_OPTIONS})')
+
+    total = 0
+    last_pk = 0
+    queryset = Interaction.objects.order_by('id')
+    try:
+        while True:
+            ids = list(queryset.filter(id__gt=last_pk).values_list('id', flat=True)[:batch_size])
+            if not ids:
+                break
+            with transaction.atomic():
+                total += index_interactions(queryset.filter(id__in=ids), REBUILD_TABLE)
+            last_pk = ids[-1]
+            if progress:
+                progress(total)
+
+        caught_up_at = timezone.now()
+        with transaction.atomic():
+            catch_up(REBUILD_TABLE, started_at)
+            remove_deleted(REBUILD_TABLE)
+        with connection.cursor() as cursor:
+            cursor.execute(f"INSERT INTO {REBUILD_TABLE} ({REBUILD_TABLE}) VALUES ('optimize')")
+
+        with transaction.atomic():
+            catch_up(REBUILD_TABLE, caught_up_at)
+            with connection.cursor() as cursor:
+                cursor.execute(f'ALTER TABLE {FTS_TABLE} RENAME TO {REPLACED_TABLE}')
+                cursor.execute(f'ALTER TABLE {REBUILD_TABLE} RENAME TO {FTS_TABLE}')
+    except BaseException:
+        with connection.cursor() as cursor:
+            cursor.execute(f'DROP TABLE IF EXISTS {REBUILD_TABLE}')
+        raise
+
+    with connection.cursor() as cursor:
+        cursor.execute(f'DROP TABLE {REPLACED_TABLE}')
+    return total
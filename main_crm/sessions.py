@@ -0,0 +1,29 @@
+"""
+Сессии в кеше с записью в базу данных (SESSION_ENGINE = 'main_crm.sessions').
+Отличается от django.contrib.sessions.backends.cached_db подсчетом попаданий в кеш
+(main_crm.caching.get_stats) и тем, что запрос без сессии не создает ключ сессии и не обращается к базе.
+"""
+from django.contrib.sessions.backends import cached_db
+
+from . import caching
+
+
+class SessionStore(cached_db.SessionStore):
+
+    def load(self):
+        if self.session_key is None:
+            return {}
+        try:
+            data = self._cache.get(self.cache_key)
+        except Exception:
+            data = None
+        caching.record('session', data is not None)
+
+        if data is None:
+            session = self._get_session_from_db()
+            if session:
+                data = self.decode(session.session_data)
+                self._cache.set(self.cache_key, data, self.get_expiry_age(expiry=session.expire_date))
+            else:
+                data = {}
+        return data
@@ -0,0 +1,244 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import analytics, auth, caching, counters, richtext, search, thumbnails, uploads
+from .models import Company, Phone, Email, Project, Interaction, Profile, User
+
+
+@receiver(pre_save, sender=Company)
+@receiver(pre_save, sender=Project)
+@receiver(pre_save, sender=Interaction)
+def render_description(sender, instance, update_fields=None, **kwargs):
+    """
+    Вычисление очищенного HTML и начала описания простым текстом перед записью
+    """
+    if update_fields is None or 'description' in update_fields:
+        richtext.render_description(instance)
+
+
+@receiver(pre_save, sender=Company)
+@receiver(pre_save, sender=Project)
+@receiver(pre_save, sender=Interaction)
+def remember_description(sender, instance, update_fields=None, **kwargs):
+    """
+    Запоминает описание до изменения для пересчета ссылок на загруженные файлы
+    """
+    instance._old_description = None
+    if update_fields is not None and 'description' not in update_fields:
+        return
+    instance._old_description = ''
+    if instance.pk:
+        instance._old_description = sender.objects.filter(pk=instance.pk).values_list(
+            'description', flat=True).first() or ''
+
+
+@receiver(post_save, sender=Company)
+@receiver(post_save, sender=Project)
+@receiver(post_save, sender=Interaction)
+def count_upload_references(sender, instance, **kwargs):
+    """
+    Обновление счетчиков ссылок на загруженные файлы после сохранения описания
+    """
+    old_description = getattr(instance, '_old_description', None)
+    if old_description is not None:
+        uploads.update_references(old_description, instance.description)
+
+
+@receiver(post_delete, sender=Company)
+@receiver(post_delete, sender=Project)
+@receiver(post_delete, sender=Interaction)
+def uncount_upload_references(sender, instance, **kwargs):
+    """
+    Уменьшение счетчиков ссылок на файлы из описания удаленного объекта
+    """
+    uploads.update_references(instance.description, '')
+
+
+@receiver(pre_save, sender=Interaction)
+def remember_interaction_mark(sender, instance, **kwargs):
+    """
+    Запоминает оценку, проект и время изменения взаимодействия до изменения для пересчета счетчиков
+    """
+    instance._old_mark = instance._old_project_id = instance._old_updated_at = None
+    if instance.pk:
+        old = sender.objects.filter(pk=instance.pk).values_list('mark', 'project_id', 'updated_at').first()
+        if old is not None:
+            instance._old_mark, instance._old_project_id, instance._old_updated_at = old
+
+
+@receiver(post_save, sender=Interaction)
+def index_interaction(sender, instance, **kwargs):
+    """
+    Обновление полнотекстового индекса после сохранения взаимодействия
+    """
+    search.index_interactions(Interaction.objects.filter(pk=instance.pk))
+
+
+@receiver(post_save, sender=Interaction)
+def count_interaction(sender, instance, created, **kwargs):
+    """
+    Обновление счетчиков проекта и компании после сохранения взаимодействия
+    """
+    old_mark = getattr(instance, '_old_mark', None)
+    old_project_id = getattr(instance, '_old_project_id', None)
+    if created or old_mark is None:
+        counters.change_interaction_counters(instance.project, instance.mark, 1, instance.updated_at)
+    elif old_project_id != instance.project_id:
+        counters.move_interaction_counters(instance, old_project_id, old_mark, instance._old_updated_at)
+    else:
+        counters.change_mark_counters(instance.project, old_mark, instance.mark, instance.updated_at)
+
+
+@receiver(post_delete, sender=Interaction)
+def unindex_interaction(sender, instance, **kwargs):
+    """
+    Удаление взаимодействия из полнотекстового индекса
+    """
+    search.remove_interaction(instance.pk)
+
+
+@receiver(post_delete, sender=Interaction)
+def uncount_interaction(sender, instance, **kwargs):
+    """
+    Обновление счетчиков проекта и компании после удаления взаимодействия
+    """
+    counters.change_interaction_counters(instance.project, instance.mark, -1)
+    counters.refresh_last_interaction(instance.project, instance.updated_at)
+
+
+@receiver(post_delete, sender=Interaction)
+def mark_rollup_day_dirty(sender, instance, **kwargs):
+    """
+    Удаление не меняет updated_at, поэтому день удаленного взаимодействия помечается для пересчета агрегатов
+    """
+    analytics.mark_day_dirty(timezone.localdate(instance.created_at))
+
+
+@receiver(pre_save, sender=Project)
+def remember_project_cost(sender, instance, **kwargs):
+    """
+    Запоминает затраты на проект и компанию до изменения для пересчета счетчиков компании
+    """
+    instance._old_cost, instance._old_user_id = 0, None
+    if instance.pk:
+        old = sender.objects.filter(pk=instance.pk).values_list('cost', 'user_id').first()
+        if old is not None:
+            instance._old_cost, instance._old_user_id = old[0] or 0, old[1]
+
+
+@receiver(post_save, sender=Project)
+def reindex_project(sender, instance, created, **kwargs):
+    """
+    Обновление названия проекта в полнотекстовом индексе
+    """
+    if not created:
+        search.update_project_title(instance.pk, instance.title)
+
+
+@receiver(post_save, sender=Project)
+def count_project(sender, instance, created, **kwargs):
+    """
+    Обновление количества проектов и затрат компании после сохранения проекта
+    """
+    old_user_id = getattr(instance, '_old_user_id', None)
+    if not created and old_user_id is not None and old_user_id != instance.user_id:
+        counters.move_project_counters(instance, old_user_id, instance._old_cost)
+        return
+    cost_delta = (instance.cost or 0) - getattr(instance, '_old_cost', 0)
+    if created or cost_delta:
+        counters.change_project_counters(instance, 1 if created else 0, cost_delta)
+
+
+@receiver(post_delete, sender=Project)
+def uncount_project(sender, instance, **kwargs):
+    """
+    Обновление количества проектов и затрат компании после удаления проекта
+    """
+    counters.change_project_counters(instance, -1, -(instance.cost or 0))
+
+
+def invalidate_on_commit(invalidate):
+    """
+    Сбрасывает кеш сразу (чтения текущей транзакции видят изменения) и повторно после фиксации транзакции:
+    фрагмент, который параллельный запрос успел закешировать из еще не измененных строк под новой версией,
+    больше не используется
+    :param invalidate: Функция сброса без аргументов
+    :return:
+    """
+    invalidate()
+    transaction.on_commit(invalidate)
+
+
+@receiver(post_save, sender=Company)
+def reindex_company(sender, instance, created, **kwargs):
+    """
+    Обновление названия компании в полнотекстовом индексе
+    """
+    if not created:
+        search.update_company_name(instance.pk, instance.company_name)
+
+
+@receiver([post_save, post_delete], sender=Company)
+def invalidate_company_cache(sender, instance, **kwargs):
+    """
+    Сброс кешированных фрагментов компании и страниц списка компаний
+    """
+    invalidate_on_commit(partial(caching.invalidate, caching.namespace(instance), caching.COMPANY_LIST))
+
+
+@receiver([post_save, post_delete], sender=Phone)
+@receiver([post_save, post_delete], sender=Email)
+def invalidate_contacts_cache(sender, instance, **kwargs):
+    """
+    Сброс кешированных контактов компании
+    """
+    invalidate_on_commit(partial(caching.invalidate, caching.object_namespace('company', instance.user_id)))
+
+
+@receiver([post_save, post_delete], sender=Project)
+def invalidate_project_cache(sender, instance, **kwargs):
+    """
+    Сброс кешированных фрагментов проекта, списка проектов компании (и прежней компании при переносе)
+    и страниц списка компаний (счетчики)
+    """
+    namespaces = [caching.namespace(instance), caching.object_namespace('company', instance.user_id)]
+    old_user_id = getattr(instance, '_old_user_id', None)
+    if old_user_id is not None and old_user_id != instance.user_id:
+        namespaces.append(caching.object_namespace('company', old_user_id))
+    invalidate_on_commit(partial(caching.invalidate, *namespaces, caching.COMPANY_LIST))
+
+
+@receiver([post_save, post_delete], sender=Interaction)
+def invalidate_interaction_cache(sender, instance, **kwargs):
+    """
+    Сброс страниц списка компаний, которые выводят счетчики взаимодействий
+    """
+    invalidate_on_commit(partial(caching.invalidate, caching.COMPANY_LIST))
+
+
+@receiver(pre_save, sender=Profile)
+def render_avatar(sender, instance, **kwargs):
+    """
+    Построение уменьшенных копий нового аватара
+    """
+    thumbnails.update_avatar(instance)
+
+
+@receiver([post_save, post_delete], sender=User)
+def invalidate_user_cache(sender, instance, **kwargs):
+    """
+    Сброс закешированного пользователя сессии (в том числе после смены пароля)
+    """
+    invalidate_on_commit(partial(auth.invalidate_user, instance.pk))
+
+
+@receiver([post_save, post_delete], sender=Profile)
+def invalidate_profile_cache(sender, instance, **kwargs):
+    """
+    Сброс закешированного пользователя, который хранится вместе с профилем
+    """
+    invalidate_on_commit(partial(auth.invalidate_user, instance.user_id))
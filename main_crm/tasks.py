@@ -0,0 +1,141 @@
+"""
+Обработчики фоновых задач (см. main_crm.jobs)
+"""
+from django.contrib.auth import get_user_model
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.template import loader
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+from django.utils.module_loading import import_string
+
+from . import jobs
+
+SEND_EMAIL = 'send_email'
+SEND_PASSWORD_RESET = 'send_password_reset'
+
+
+def send_messages(payloads: list, make_message) -> list:
+    """
+    Отправляет письма выборки через одно соединение с почтовым сервером
+    :param payloads: Аргументы задач
+    :param make_message: Функция, которая строит EmailMultiAlternatives по аргументам задачи и соединению
+    :return: Список ошибок (None для отправленных писем)
+    """
+    errors = []
+    with get_connection() as connection:
+        for payload in payloads:
+            try:
+                make_message(payload, connection).send()
+            except Exception as e:
+                errors.append(e)
+            else:
+                errors.append(None)
+    return errors
+
+
+def make_email(payload: dict, connection) -> EmailMultiAlternatives:
+    message = EmailMultiAlternatives(payload['subject'], payload['body'], payload.get('from_email'), payload['to'],
+                                     connection=connection)
+    if payload.get('html_message'):
+        message.attach_alternative(payload['html_message'], 'text/html')
+    return message
+
+
+def make_password_reset_email(payload: dict, connection) -> EmailMultiAlternatives:
+    """
+    Строит письмо сброса пароля. Токен создается только здесь, в очереди хранится лишь id пользователя
+    :param payload:
+    :param connection:
+    :return:
+    """
+    UserModel = get_user_model()
+    user = UserModel._default_manager.get(pk=payload['user_pk'])
+    user_email = getattr(user, UserModel.get_email_field_name())
+    token_generator = import_string(payload['token_generator'])()
+    context = {
+        'email': user_email,
+        'domain': payload['domain'],
+        'site_name': payload['site_name'],
+        'uid': urlsafe_base64_encode(force_bytes(user.pk)),
+        'user': user,
+        'token': token_generator.make_token(user),
+        'protocol': 'https' if payload['use_https'] else 'http',
+        **(payload.get('extra_email_context') or {}),
+    }
+    html_message = None
+    if payload.get('html_email_template_name'):
+        html_message = loader.render_to_string(payload['html_email_template_name'], context)
+    return make_email({
+        'subject': ''.join(loader.render_to_string(payload['subject_template_name'], context).splitlines()),
+        'body': loader.render_to_string(payload['email_template_name'], context),
+        'from_email': payload.get('from_email'),
+        'to': [user_email],
+        'html_message': html_message,
+    }, connection)
+
+
+@jobs.register(SEND_EMAIL, batch=True)
+def send_emails(payloads: list) -> list:
+    """
+    Отправляет письма выборки через одно соединение с почтовым сервером
+    :param payloads: Аргументы писем (subject, body, from_email, to, html_message)
+    :return: Список ошибок (None для отправленных писем)
+    """
+    return send_messages(payloads, make_email)
+
+
+@jobs.register(SEND_PASSWORD_RESET, batch=True)
+def send_password_resets(payloads: list) -> list:
+    """
+    Отправляет письма сброса пароля выборки через одно соединение с почтовым сервером
+    :param payloads: Аргументы enqueue_password_reset
+    :return: Список ошибок (None для отправленных писем)
+    """
+    return send_messages(payloads, make_password_reset_email)
+
+
+def enqueue_email(subject: str, body: str, from_email, to: list, html_message: str = None):
+    """
+    Ставит письмо в очередь отправки
+    :param subject:
+    :param body:
+    :param from_email:
+    :param to:
+    :param html_message:
+    :return: Job
+    """
+    return jobs.enqueue(SEND_EMAIL, {
+        'subject': subject, 'body': body, 'from_email': from_email, 'to': list(to), 'html_message': html_message,
+    })
+
+
+def enqueue_password_reset(user_pk: int, subject_template_name: str, email_template_name: str, domain: str,
+                           site_name: str, use_https: bool, token_generator, from_email=None,
+                           html_email_template_name: str = None, extra_email_context: dict = None):
+    """
+    Ставит письмо сброса пароля в очередь отправки. Ссылка с токеном не сохраняется в задаче:
+    письмо рендерится при отправке
+    :param user_pk:
+    :param subject_template_name:
+    :param email_template_name:
+    :param domain:
+    :param site_name:
+    :param use_https:
+    :param token_generator: Генератор токенов (в задаче сохраняется путь к его классу)
+    :param from_email:
+    :param html_email_template_name:
+    :param extra_email_context:
+    :return: Job
+    """
+    return jobs.enqueue(SEND_PASSWORD_RESET, {
+        'user_pk': user_pk,
+        'subject_template_name': subject_template_name,
+        'email_template_name': email_template_name,
+        'html_email_template_name': html_email_template_name,
+        'domain': domain,
+        'site_name': site_name,
+        'use_https': use_https,
+        'token_generator': f'{type(token_generator).__module__}.{type(token_generator).__qualname__}',
+        'from_email': from_email,
+        'extra_email_context': extra_email_context,
+    })
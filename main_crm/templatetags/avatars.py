@@ -0,0 +1,48 @@
+from django import template
+from django.templatetags.static import static
+from django.utils.html import format_html, format_html_join
+
+from main_crm import thumbnails
+
+register = template.Library()
+
+DEFAULT_AVATAR = 'cms/images/default.png'
+
+
+@register.simple_tag
+def avatar(profile, size: int = 200, alt: str = 'Картинка пользователя'):
+    """
+    Выводит аватар профиля высотой size: вариант не меньше size и вариант для экранов с двойной плотностью,
+    WebP с запасным JPEG. Если вариантов нет - исходный файл или картинка по умолчанию
+    :param profile:
+    :param size:
+    :param alt:
+    :return:
+    """
+    image = getattr(profile, 'profile_image', None)
+    if not image:
+        return format_html('<img src="{}" alt="{}" height="{}">', static(DEFAULT_AVATAR), alt, size)
+    if not profile.avatar_digest:
+        return format_html('<img src="{}" alt="{}" height="{}">', image.url, alt, size)
+
+    variants = ((thumbnails.pick_size(size), '1x'), (thumbnails.pick_size(size * 2), '2x'))
+
+    def srcset(image_format):
+        return ', '.join(
+            f'{thumbnails.get_variant_url(profile.avatar_digest, variant, image_format)} {density}'
+            for variant, density in variants
+        )
+
+    sources = format_html_join(
+        '', '<source type="image/{}" srcset="{}">',
+        ((image_format, srcset(image_format)) for image_format in profile.avatar_formats.split(',')
+         if image_format != 'jpeg'),
+    )
+    return format_html(
+        '<picture>{}<img src="{}" srcset="{}" alt="{}" height="{}"></picture>',
+        sources,
+        thumbnails.get_variant_url(profile.avatar_digest, variants[0][0], 'jpeg'),
+        srcset('jpeg'),
+        alt,
+        size,
+    )
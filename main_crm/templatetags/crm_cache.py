@@ -0,0 +1,38 @@
+from django import template
+
+from main_crm import caching
+
+register = template.Library()
+
+
+class CachedFragmentNode(template.Node):
+    def __init__(self, nodelist, name, obj, vary_on):
+        self.nodelist = nodelist
+        self.name = name
+        self.obj = obj
+        self.vary_on = vary_on
+
+    def render(self, context):
+        name = self.name.resolve(context)
+        obj = self.obj.resolve(context)
+        key = caching.fragment_key(name, obj, *(value.resolve(context) for value in self.vary_on))
+        return caching.get_or_render(name, key, lambda: self.nodelist.render(context))
+
+
+@register.tag('cached_fragment')
+def do_cached_fragment(parser, token):
+    """
+    Кеширует фрагмент шаблона до изменения объекта:
+        {% cached_fragment 'company_card' company [vary_on ...] %} ... {% endcached_fragment %}
+    """
+    nodelist = parser.parse(('endcached_fragment',))
+    parser.delete_first_token()
+    bits = token.split_contents()
+    if len(bits) < 3:
+        raise template.TemplateSyntaxError(f"'{bits[0]}' tag requires at least 2 arguments.")
+    return CachedFragmentNode(
+        nodelist,
+        parser.compile_filter(bits[1]),
+        parser.compile_filter(bits[2]),
+        [parser.compile_filter(bit) for bit in bits[3:]],
+    )
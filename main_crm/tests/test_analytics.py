@@ -0,0 +1,87 @@
+import datetime
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase, Client
+from django.urls import reverse
+from django.utils import timezone
+
+from main_crm import analytics
+from main_crm.models import Company, Project, Interaction, InteractionRollup
+
+
+class InteractionRollupTest(TestCase):
+
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_superuser(username='GGGGGG', password='qweqweqweqwe')
+        self.company = Company.objects.create(company_name='Company1', slug='company1', fio='Nikhil Estes')
+        self.project = Project.objects.create(user=self.company, title='Project1',
+                                              started_at=datetime.date(1991, 12, 21))
+        self.interactions = [
+            Interaction.objects.create(project=self.project, channel=channel, manager=self.user, mark=mark)
+            for channel, mark in (('r', '1'), ('r', '1'), ('w', '5'))
+        ]
+
+    def buckets(self):
+        return {(rollup.channel, rollup.mark): rollup.count for rollup in InteractionRollup.objects.all()}
+
+    def test_full_refresh(self):
+        stats = analytics.refresh_rollups(full=True)
+        self.assertEquals(stats, {'days': 1, 'buckets': 2})
+        self.assertEquals(self.buckets(), {('r', '1'): 2, ('w', '5'): 1})
+
+    def test_full_refresh_keeps_other_days(self):
+        old_day = timezone.now() - datetime.timedelta(days=40)
+        old = Interaction.objects.create(project=self.project, channel='l', manager=self.user, mark='3')
+        Interaction.objects.filter(pk=old.pk).update(created_at=old_day, updated_at=old_day)
+        analytics.refresh_rollups()
+        stale_day = timezone.localdate() - datetime.timedelta(days=20)
+        InteractionRollup.objects.create(day=stale_day, manager=self.user, company=self.company, channel='i',
+                                         mark='2', count=7)
+
+        # Пока пересчитывается пачка одного дня, агрегаты остальных дней остаются в таблице
+        seen = []
+        rebuild_days = analytics.rebuild_days
+
+        def check_rebuild_days(days):
+            seen.append(InteractionRollup.objects.exclude(day__in=days).count())
+            return rebuild_days(days)
+
+        with mock.patch.object(analytics, 'REFRESH_BATCH_DAYS', 1), \
+                mock.patch.object(analytics, 'rebuild_days', check_rebuild_days):
+            stats = analytics.refresh_rollups(full=True)
+
+        self.assertEquals(stats, {'days': 3, 'buckets': 3})
+        self.assertEquals(seen, [3, 3, 1])
+        self.assertEquals(self.buckets(), {('r', '1'): 2, ('w', '5'): 1, ('l', '3'): 1})
+
+    def test_incremental_refresh_reprocesses_only_touched_days(self):
+        old_day = timezone.now() - datetime.timedelta(days=10)
+        old = Interaction.objects.create(project=self.project, channel='l', manager=self.user, mark='3')
+        Interaction.objects.filter(pk=old.pk).update(created_at=old_day, updated_at=old_day)
+        analytics.refresh_rollups()
+
+        interaction = self.interactions[0]
+        interaction.mark = '4'
+        interaction.save()
+        self.interactions[2].delete()
+
+        stats = analytics.refresh_rollups()
+        self.assertEquals(stats['days'], 1)
+        self.assertEquals(self.buckets(), {('r', '1'): 1, ('r', '4'): 1, ('l', '3'): 1})
+
+    def test_refresh_command_and_dashboard(self):
+        call_command('refresh_rollups', stdout=open('/dev/null', 'w'))
+        self.client.login(username='GGGGGG', password='qweqweqweqwe')
+
+        response = self.client.get(reverse('analytics'))
+        self.assertEquals(response.status_code, 200)
+        self.assertTemplateUsed(response, 'cms_mainpage/analytics.html')
+        self.assertEquals(response.context['per_manager'], {'GGGGGG': {'1': 2, '2': 0, '3': 0, '4': 0, '5': 1}})
+
+        response = self.client.get(reverse('analytics-data'))
+        data = response.json()
+        self.assertEquals(list(data['per_day'].values()), [{'r': 2, 'l': 0, 'w': 1, 'i': 0}])
+        self.assertEquals(data['per_company_month'][0]['total'], 3)
@@ -0,0 +1,87 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from main_crm import caching, checks
+from main_crm.auth import user_key
+from main_crm.models import Profile
+
+AUTH_TABLES = ('django_session', 'auth_user', 'main_crm_profile')
+
+CACHED_AUTH_SETTINGS = {
+    'SESSION_ENGINE': 'main_crm.sessions',
+    'AUTHENTICATION_BACKENDS': ['main_crm.auth.CachedModelBackend', 'django.contrib.auth.backends.ModelBackend'],
+}
+
+
+@override_settings(**CACHED_AUTH_SETTINGS)
+class AuthCacheTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.user = User.objects.create_superuser(username='GGGGGG', password='qweqweqweqwe')
+        self.profile = Profile.objects.create(user=self.user)
+        self.client.login(username='GGGGGG', password='qweqweqweqwe')
+        self.url = reverse('manager-profile')
+
+    def get_auth_queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        return response, [query['sql'] for query in context.captured_queries
+                          if any(f'"{table}"' in query['sql'] for table in AUTH_TABLES)]
+
+    def test_no_auth_queries_on_warm_cache(self):
+        caching.reset_stats()
+        self.client.get(self.url)
+        response, queries = self.get_auth_queries(self.url)
+        self.assertEquals(response.status_code, 200)
+        self.assertEquals(queries, [])
+        self.assertEquals(response.context['user'].profile, self.profile)
+
+        stats = caching.get_stats()
+        self.assertEquals((stats['session']['hits'], stats['session']['misses']), (2, 0))
+        self.assertEquals((stats['user']['hits'], stats['user']['misses']), (1, 1))
+
+    def test_invalidated_on_user_and_profile_save(self):
+        self.client.get(self.url)
+        self.profile.save()
+        self.assertIsNone(cache.get(user_key(self.user.pk)))
+
+        self.client.get(self.url)
+        self.user.first_name = 'Nikhil'
+        self.user.save()
+        self.assertEquals(self.client.get(self.url).context['user'].first_name, 'Nikhil')
+
+    def test_password_change_ends_sessions(self):
+        self.client.get(self.url)
+        self.user.set_password('asdasdasdasd')
+        self.user.save()
+        self.assertEquals(self.client.get(self.url).status_code, 302)
+
+    def test_anonymous_request_without_session(self):
+        self.client = Client()
+        response, queries = self.get_auth_queries(reverse('login'))
+        self.assertEquals(response.status_code, 200)
+        self.assertEquals(queries, [])
+
+
+class SessionCacheCheckTest(TestCase):
+
+    def test_default_settings(self):
+        self.assertEquals(checks.check_session_cache(None), [])
+
+    def test_local_cache(self):
+        with override_settings(**CACHED_AUTH_SETTINGS):
+            errors = checks.check_session_cache(None)
+        self.assertEquals([error.id for error in errors], ['main_crm.E001'])
+        self.assertIn('SESSION_ENGINE и AUTHENTICATION_BACKENDS', errors[0].msg)
+
+    def test_shared_cache(self):
+        caches = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+                              'LOCATION': 'redis://127.0.0.1:6379'}}
+        with override_settings(CACHES=caches, **CACHED_AUTH_SETTINGS):
+            self.assertEquals(checks.check_session_cache(None), [])
@@ -0,0 +1,38 @@
+from django.test import TestCase
+
+from main_crm import benchmark
+
+
+class BenchmarkTest(TestCase):
+
+    def test_run_scale(self):
+        results = benchmark.run_scale('test', 50, 2)
+        routes = {result['route']: result for result in results}
+        self.assertEquals(set(routes), set(benchmark.get_route_names()))
+        self.assertEquals(routes['logout']['skipped'], benchmark.SKIPPED_ROUTES['logout'])
+        for name in ('index', 'company-detail', 'project-detail', 'interaction-detail', 'export'):
+            self.assertEquals(routes[name]['status'], 200)
+            self.assertGreater(routes[name]['p95_ms'], 0)
+            self.assertGreater(routes[name]['peak_kb'], 0)
+        self.assertGreater(routes['index']['queries'], 0)
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEquals(benchmark.percentile(values, 50), 50)
+        self.assertEquals(benchmark.percentile(values, 95), 95)
+        self.assertEquals(benchmark.percentile([3.0], 99), 3.0)
+
+    def test_compare(self):
+        baseline = {'results': [
+            {'scale': '1k', 'route': 'index', 'p95_ms': 10.0, 'queries': 2},
+            {'scale': '1k', 'route': 'export', 'p95_ms': 10.0, 'queries': 2},
+            {'scale': '1k', 'route': 'logout', 'skipped': 'reason'},
+        ]}
+        report = {'results': [
+            {'scale': '1k', 'route': 'index', 'p95_ms': 11.5, 'queries': 2},
+            {'scale': '1k', 'route': 'export', 'p95_ms': 13.0, 'queries': 3},
+            {'scale': '1k', 'route': 'logout', 'skipped': 'reason'},
+            {'scale': '1k', 'route': 'analytics', 'p95_ms': 100.0, 'queries': 4},
+        ]}
+        self.assertEquals(benchmark.compare(report, baseline, 0.2),
+                          ['1k export: p95 10.0 -> 13.0 ms', '1k export: queries 2 -> 3'])
@@ -0,0 +1,69 @@
+import datetime
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, Client
+from django.urls import reverse
+
+from main_crm import caching
+from main_crm.models import Company, Phone, Email, Project, Interaction
+
+
+class CachingTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.user = User.objects.create_superuser(username='GGGGGG', password='qweqweqweqwe')
+        self.client.login(username='GGGGGG', password='qweqweqweqwe')
+        self.company = Company.objects.create(company_name='Company1', slug='company1', fio='Nikhil Estes')
+        Phone.objects.create(user=self.company, phone='+32134824390')
+        self.project = Project.objects.create(user=self.company, title='Project1',
+                                              started_at=datetime.date(1991, 12, 21))
+        self.detail_url = reverse('company-detail', args=['company1'])
+
+    def test_company_detail_fragments(self):
+        self.client.get(self.detail_url)
+        with self.assertNumQueries(4):
+            response = self.client.get(self.detail_url)
+        self.assertContains(response, '+32134824390')
+        self.assertContains(response, 'Project1')
+
+        stats = caching.get_stats()
+        self.assertEquals(stats['company_contacts'], {'hits': 1, 'misses': 1, 'hit_ratio': 0.5})
+
+    def test_invalidated_again_on_commit(self):
+        namespace = caching.object_namespace('company', self.company.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            Email.objects.create(user=self.company, email='mail@gmail.com')
+            # Параллельный запрос до фиксации кеширует старые контакты под новой версией
+            version = caching.get_version(namespace)
+        self.assertNotEquals(caching.get_version(namespace), version)
+
+    def test_contacts_invalidated_on_change(self):
+        self.client.get(self.detail_url)
+        Email.objects.create(user=self.company, email='mail@gmail.com')
+        self.assertContains(self.client.get(self.detail_url), 'mail@gmail.com')
+
+        Phone.objects.filter(user=self.company).get().delete()
+        self.assertNotContains(self.client.get(self.detail_url), '+32134824390')
+
+    def test_projects_invalidated_on_change(self):
+        self.client.get(self.detail_url)
+        self.project.title = 'Renamed'
+        self.project.save()
+        self.assertContains(self.client.get(self.detail_url), 'Renamed')
+
+    def test_company_list_page_cache(self):
+        self.client.get(reverse('index'))
+        with self.assertNumQueries(3):
+            self.client.get(reverse('index'))
+
+        Interaction.objects.create(project=self.project, channel='r', manager=self.user, mark='5')
+        response = self.client.get(reverse('index'))
+        self.assertEquals(response.context['company_list'][0].interaction_count, 1)
+
+    def test_cache_stats_view(self):
+        self.client.get(self.detail_url)
+        response = self.client.get(reverse('cache-stats'))
+        self.assertEquals(response.json()['company_card']['misses'], 1)
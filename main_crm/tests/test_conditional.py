@@ -0,0 +1,97 @@
+import datetime
+import os
+import tempfile
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, Client, RequestFactory
+from django.urls import reverse
+
+from main_crm.conditional import serve
+from main_crm.models import Company, Phone, Project, Interaction
+
+
+class ConditionalGetTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.user = User.objects.create_superuser(username='GGGGGG', password='qweqweqweqwe')
+        self.client.login(username='GGGGGG', password='qweqweqweqwe')
+        self.company = Company.objects.create(company_name='Company1', slug='company1', fio='Nikhil Estes')
+        self.project = Project.objects.create(user=self.company, title='Project1',
+                                              started_at=datetime.date(1991, 12, 21))
+        self.interaction = Interaction.objects.create(project=self.project, channel='r', manager=self.user,
+                                                      description='Desc1', mark='1')
+
+    def assertNotModified(self, url, data=None, num=3):
+        response = self.client.get(url, data)
+        self.assertEquals(response.status_code, 200)
+        with self.assertNumQueries(num):
+            response = self.client.get(url, data, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEquals(response.status_code, 304)
+        return response['ETag']
+
+    def test_detail_pages(self):
+        etag = self.assertNotModified(reverse('company-detail', args=['company1']))
+        Phone.objects.create(user=self.company, phone='+32134824390')
+        response = self.client.get(reverse('company-detail', args=['company1']), HTTP_IF_NONE_MATCH=etag)
+        self.assertEquals(response.status_code, 200)
+
+        url = reverse('interaction-detail', args=[self.interaction.pk])
+        self.assertNotModified(url)
+        response = self.client.get(url)
+        self.assertIn('Last-Modified', response)
+        self.interaction.mark = '5'
+        self.interaction.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEquals(response.status_code, 200)
+
+        url = reverse('project-detail', args=[self.project.pk])
+        etag = self.assertNotModified(url)
+        # Запись без сигналов (другой процесс, .update()) меняет дату изменения в базе
+        Project.objects.filter(pk=self.project.pk).update(title='Project2',
+                                                          updated_at=self.project.updated_at + datetime.timedelta(1))
+        self.assertEquals(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        etag = self.assertNotModified(url)
+        Project.objects.filter(pk=self.project.pk).delete()
+        self.assertEquals(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 404)
+
+    def test_pages_follow_updates_without_signals(self):
+        """
+        Запись без сигналов (другой процесс, .update()) меняет даты изменения в базе, от которых зависят ETag
+        """
+        urls = [reverse('index'), reverse('company-detail', args=['company1']), reverse('all-projects')]
+        etags = [self.assertNotModified(url) for url in urls]
+        Company.objects.filter(pk=self.company.pk).update(company_name='NEW',
+                                                          updated_at=self.company.updated_at + datetime.timedelta(1))
+        for url, etag in zip(urls, etags):
+            self.assertEquals(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200, url)
+
+        urls = [reverse('company-detail', args=['company1']), reverse('all-projects'),
+                reverse('company-projects-list', args=['company1'])]
+        etags = [self.assertNotModified(url) for url in urls]
+        Project.objects.filter(pk=self.project.pk).update(title='Project2',
+                                                          updated_at=self.project.updated_at + datetime.timedelta(1))
+        for url, etag in zip(urls, etags):
+            self.assertEquals(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200, url)
+
+    def test_list_pages(self):
+        self.assertNotModified(reverse('index'))
+        self.assertNotModified(reverse('all-projects'))
+        etag = self.assertNotModified(reverse('all-interaction-list'), {'channel': 'r'})
+
+        Interaction.objects.create(project=self.project, channel='r', manager=self.user, mark='2')
+        response = self.client.get(reverse('all-interaction-list'), {'channel': 'r'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEquals(response.status_code, 200)
+
+    def test_static_files(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with open(os.path.join(directory, 'style.css'), 'w') as file:
+                file.write('body {}')
+            request = RequestFactory().get('/static/style.css')
+            response = serve(request, 'style.css', document_root=directory)
+            self.assertEquals(response.status_code, 200)
+
+            request = RequestFactory().get('/static/style.css', HTTP_IF_NONE_MATCH=response['ETag'])
+            self.assertEquals(serve(request, 'style.css', document_root=directory).status_code, 304)
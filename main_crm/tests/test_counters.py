@@ -0,0 +1,146 @@
+import datetime
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase, Client
+from django.urls import reverse
+
+from main_crm.models import Company, Project, Interaction
+
+
+class ActivityCountersTest(TestCase):
+
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_superuser(username='GGGGGG', password='qweqweqweqwe')
+        self.client.login(username='GGGGGG', password='qweqweqweqwe')
+        self.company = Company.objects.create(company_name='Company1', slug='company1', fio='Nikhil Estes')
+
+    def create_project(self, cost='100'):
+        self.client.post(reverse('project-create', args=['company1']), {
+            'title': 'Project1',
+            'started_at_month': '12',
+            'started_at_day': '21',
+            'started_at_year': '1991',
+            'cost': cost,
+        })
+        return Project.objects.last()
+
+    def create_interaction(self, project, mark):
+        self.client.post(reverse('interaction-create', args=[project.pk]), {
+            'channel': 'w',
+            'description': 'Description1',
+            'mark': mark,
+        })
+        return Interaction.objects.first()
+
+    def test_counters_follow_view_writes(self):
+        project = self.create_project(cost='100')
+        self.create_project(cost='50')
+        self.create_interaction(project, '5')
+        interaction = self.create_interaction(project, '2')
+
+        self.company.refresh_from_db()
+        project.refresh_from_db()
+        self.assertEquals(self.company.project_count, 2)
+        self.assertEquals(self.company.total_cost, 150)
+        self.assertEquals(self.company.interaction_count, 2)
+        self.assertEquals(project.interaction_count, 2)
+        self.assertEquals(project.mark_distribution, {'1': 0, '2': 1, '3': 0, '4': 0, '5': 1})
+        self.assertEquals(self.company.mark_mean, 3.5)
+        self.assertEquals(self.company.last_interaction_at, interaction.updated_at)
+
+        self.client.post(reverse('interaction-update', args=[interaction.pk]), {
+            'channel': 'w', 'description': 'Description2', 'mark': '4',
+        })
+        self.client.delete(reverse('interaction-delete', args=[interaction.pk]))
+
+        self.company.refresh_from_db()
+        self.assertEquals(self.company.interaction_count, 1)
+        self.assertEquals(self.company.mark_distribution['4'], 0)
+        self.assertEquals(self.company.mark_mean, 5)
+        self.assertEquals(self.company.last_interaction_at, Interaction.objects.get().updated_at)
+
+        self.client.delete(reverse('project-delete', args=[project.pk]))
+        self.company.refresh_from_db()
+        self.assertEquals(self.company.project_count, 1)
+        self.assertEquals(self.company.total_cost, 50)
+        self.assertEquals(self.company.interaction_count, 0)
+        self.assertIsNone(self.company.last_interaction_at)
+        self.assertIsNone(self.company.mark_mean)
+
+    def test_counters_follow_moves(self):
+        other = Company.objects.create(company_name='Company2', slug='company2', fio='Nikhil Estes')
+        project = Project.objects.create(user=self.company, title='Project1', cost=10,
+                                         started_at=datetime.date(1991, 12, 21))
+        other_project = Project.objects.create(user=other, title='Project2', cost=20,
+                                               started_at=datetime.date(1991, 12, 21))
+        moved = Interaction.objects.create(project=project, channel='w', manager=self.user, mark='5')
+        Interaction.objects.create(project=project, channel='w', manager=self.user, mark='2')
+
+        moved.project = other_project
+        moved.mark = '4'
+        moved.save()
+
+        project.refresh_from_db()
+        other_project.refresh_from_db()
+        self.assertEquals((project.interaction_count, project.mark_5_count), (1, 0))
+        self.assertEquals(project.last_interaction_at, Interaction.objects.get(project=project).updated_at)
+        self.assertEquals((other_project.interaction_count, other_project.mark_4_count), (1, 1))
+        self.assertEquals(other_project.last_interaction_at, moved.updated_at)
+
+        project.user = other
+        project.save()
+
+        self.company.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEquals((self.company.project_count, self.company.total_cost), (0, 0))
+        self.assertEquals(self.company.interaction_count, 0)
+        self.assertIsNone(self.company.last_interaction_at)
+        self.assertEquals((other.project_count, other.total_cost, other.interaction_count), (2, 30, 2))
+        self.assertEquals(other.mark_distribution, {'1': 0, '2': 1, '3': 0, '4': 1, '5': 0})
+        self.assertEquals(other.last_interaction_at, moved.updated_at)
+
+        fields = ['project_count', 'total_cost', 'interaction_count', 'last_interaction_at', 'mark_2_count',
+                  'mark_4_count']
+        expected = list(Company.objects.order_by('pk').values(*fields))
+        call_command('recompute_rollups', stdout=open('/dev/null', 'w'))
+        self.assertEquals(list(Company.objects.order_by('pk').values(*fields)), expected)
+
+    def test_recompute_rollups_command(self):
+        project = Project.objects.create(user=self.company, title='Project1', cost=10,
+                                         started_at=datetime.date(1991, 12, 21))
+        Interaction.objects.bulk_create([
+            Interaction(project=project, channel='w', manager=self.user, mark=str(i % 5 + 1)) for i in range(10)
+        ])
+        Company.objects.update(project_count=0, total_cost=0)
+
+        call_command('recompute_rollups', stdout=open('/dev/null', 'w'))
+
+        self.company.refresh_from_db()
+        project.refresh_from_db()
+        self.assertEquals(self.company.project_count, 1)
+        self.assertEquals(self.company.total_cost, 10)
+        self.assertEquals(self.company.interaction_count, 10)
+        self.assertEquals(project.mark_distribution, {'1': 2, '2': 2, '3': 2, '4': 2, '5': 2})
+        self.assertEquals(self.company.mark_mean, 3)
+        self.assertEquals(self.company.last_interaction_at, Interaction.objects.first().updated_at)
+
+    def test_company_list_sort_by_last_interaction(self):
+        Company.objects.bulk_create([
+            Company(company_name=f'Company{i}', slug=f'company{i}', fio='Nikhil Estes') for i in range(2, 8)
+        ])
+        project = self.create_project()
+        self.create_interaction(project, '3')
+
+        seen = []
+        response = self.client.get(reverse('index'), {'sort_by': '-last_interaction_at'})
+        seen += list(response.context['company_list'])
+        while response.context['page_obj'].has_next():
+            response = self.client.get(reverse('index'), {'sort_by': '-last_interaction_at',
+                                                           'cursor': response.context['page_obj'].next_cursor})
+            seen += list(response.context['company_list'])
+
+        self.assertEquals(len(seen), 7)
+        self.assertEquals(len(set(seen)), 7)
+        self.assertEquals(seen[0], self.company)
@@ -0,0 +1,70 @@
+import io
+from unittest import mock
+
+from django.core.management import call_command
+from django.db.models import Count
+from django.test import TestCase
+from django.utils import timezone
+
+from main_crm import datagen
+from main_crm.models import Company, Phone, Project, Interaction, InteractionRollup, User
+from main_crm.utils import slugify
+
+
+class DataGenerationTest(TestCase):
+
+    def test_command(self):
+        out = io.StringIO()
+        call_command('generate_crm_data', '--interactions', '300', '--workers', '1', '--batch-size', '40', stdout=out)
+        self.assertIn('interactions 300', out.getvalue())
+        self.assertEquals(Interaction.objects.count(), 300)
+        self.assertEquals(Company.objects.count(), 3)
+        self.assertEquals(Project.objects.count(), 15)
+        self.assertEquals(User.objects.filter(is_superuser=True, profile__isnull=False).count(), 5)
+        self.assertEquals(sum(InteractionRollup.objects.values_list('count', flat=True)), 300)
+
+    def test_valid_data(self):
+        sizes = datagen.generate(500, seed=1, batch_size=50, max_contacts=2)
+        self.assertEquals(Phone.objects.count(), sizes['phones'])
+        self.assertTrue(all(Phone.objects.filter(user=company).count() <= 2 for company in Company.objects.all()))
+
+        for company in Company.objects.all():
+            self.assertTrue(company.slug.startswith(slugify(company.company_name)))
+            self.assertLessEqual(company.published, company.edited)
+            self.assertEquals(company.interaction_count, Interaction.objects.filter(project__user=company).count())
+        for project in Project.objects.select_related('user'):
+            project.clean()
+            self.assertGreaterEqual(project.started_at, project.user.published)
+
+        now = timezone.now()
+        for interaction in Interaction.objects.select_related('project'):
+            self.assertLessEqual(interaction.created_at, interaction.updated_at)
+            self.assertLessEqual(interaction.updated_at, now)
+            self.assertGreaterEqual(interaction.created_at.date(), interaction.project.started_at)
+        self.assertLess(Interaction.objects.earliest('created_at').created_at.year, now.year)
+
+    def test_skewed_distribution(self):
+        datagen.generate(2000, seed=2)
+        counts = sorted(Project.objects.values_list('interaction_count', flat=True), reverse=True)
+        # Десятая часть проектов получает заметно больше своей доли взаимодействий
+        self.assertGreater(sum(counts[:len(counts) // 10]), 2000 * 0.2)
+        channels = dict(Interaction.objects.order_by().values_list('channel').annotate(count=Count('pk')))
+        self.assertGreater(channels['r'], channels['i'])
+
+    @mock.patch.object(datagen, 'CHUNK_SIZE', 70)
+    def test_deterministic(self):
+        def snapshot():
+            return list(Interaction.objects.order_by('pk').values_list('channel', 'mark', 'created_at', 'updated_at'))
+
+        datagen.generate(200, seed=5, batch_size=30)
+        first = snapshot()
+        for model in (Interaction, Project, Company, User):
+            model.objects.all().delete()
+        datagen.generate(200, seed=5, batch_size=30)
+        self.assertEquals(snapshot(), first)
+
+    def test_backdated_restores_auto_now(self):
+        field = Interaction._meta.get_field('created_at')
+        with datagen.backdated(Interaction):
+            self.assertFalse(field.auto_now_add)
+        self.assertTrue(field.auto_now_add)
@@ -0,0 +1,109 @@
+import asyncio
+import csv
+import datetime
+import gzip
+import io
+import json
+import os
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.asgi import get_asgi_application
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, Client
+from django.urls import reverse
+
+from main_crm import export, loadtest
+from main_crm.models import Company, Project, Interaction
+
+
+class ExportTest(TestCase):
+
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_superuser(username='GGGGGG', password='qweqweqweqwe')
+        self.company = Company.objects.create(company_name='Company1', slug='company1', fio='Nikhil Estes')
+        self.project = Project.objects.create(user=self.company, title='Project1',
+                                              started_at=datetime.date(1991, 12, 21))
+        Interaction.objects.bulk_create([
+            Interaction(project=self.project, channel='w' if i % 2 else 'r', manager=self.user, mark='3',
+                        description=f'<p>Описание {i}</p>')
+            for i in range(5)
+        ])
+
+    def test_iter_rows_in_chunks(self):
+        current_export = export.EXPORTS['interactions']
+        rows = list(current_export.iter_rows(Interaction.objects.all(), chunk_size=2))
+        self.assertEquals(len(rows), 5)
+        self.assertEquals(rows[0][1:3], ['Company1', 'Project1'])
+        self.assertEquals(rows[0][6], 'Описание 0')
+
+    def test_export_view_csv_with_filter(self):
+        self.client.login(username='GGGGGG', password='qweqweqweqwe')
+        response = self.client.get(reverse('export', args=['interactions']), {'channel': 'w'})
+        self.assertEquals(response.status_code, 200)
+        self.assertEquals(response['Content-Type'], 'text/csv')
+
+        rows = list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEquals(rows[0], export.EXPORTS['interactions'].headers)
+        self.assertEquals(len(rows), 3)
+        self.assertTrue(all(row[3] == 'w' for row in rows[1:]))
+
+    def test_export_view_invalid_filter(self):
+        self.client.login(username='GGGGGG', password='qweqweqweqwe')
+        response = self.client.get(reverse('export', args=['interactions']), {'manager': 9999})
+        self.assertEquals(response.status_code, 200)
+        rows = list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEquals(rows, [export.EXPORTS['interactions'].headers])
+
+    def test_export_view_jsonl_gzip(self):
+        self.client.login(username='GGGGGG', password='qweqweqweqwe')
+        response = self.client.get(reverse('export', args=['companies']), {'format': 'jsonl', 'gzip': '1'})
+        self.assertEquals(response['Content-Type'], 'application/gzip')
+
+        lines = gzip.decompress(b''.join(response.streaming_content)).decode().splitlines()
+        self.assertEquals(json.loads(lines[0])['company_name'], 'Company1')
+
+    def test_export_view_unknown(self):
+        self.client.login(username='GGGGGG', password='qweqweqweqwe')
+        self.assertEquals(self.client.get(reverse('export', args=['users'])).status_code, 404)
+        self.assertEquals(self.client.get(reverse('export', args=['projects']), {'format': 'xml'}).status_code, 404)
+
+    def test_export_command(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'interactions.csv')
+            call_command('export_data', 'interactions', '--filter', 'channel=r', '--output', path)
+            with open(path, encoding='utf-8') as f:
+                rows = list(csv.reader(f))
+        self.assertEquals(len(rows), 4)
+
+        stdout = io.StringIO()
+        call_command('export_data', 'projects', '--format', 'jsonl', stdout=stdout)
+        self.assertEquals(json.loads(stdout.getvalue())['title'], 'Project1')
+
+
+class AsgiExportTest(TransactionTestCase):
+
+    def test_export_view_asgi(self):
+        user = User.objects.create_superuser(username='GGGGGG', password='qweqweqweqwe')
+        company = Company.objects.create(company_name='Company1', slug='company1', fio='Nikhil Estes')
+        Project.objects.create(user=company, title='Project1', started_at=datetime.date(1991, 12, 21))
+        client = Client()
+        client.force_login(user)
+        cookies = {settings.SESSION_COOKIE_NAME: client.cookies[settings.SESSION_COOKIE_NAME].value}
+        scope = loadtest.get_asgi_scope('GET', f"{reverse('export', args=['projects'])}?format=jsonl", cookies)
+        messages = []
+
+        async def receive():
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+        async def send(message):
+            messages.append(message)
+
+        asyncio.run(get_asgi_application()(scope, receive, send))
+        self.assertEquals(messages[0]['status'], 200)
+        headers = dict(messages[0]['headers'])
+        self.assertEquals(headers[b'Content-Disposition'], b'attachment; filename="projects.jsonl"')
+        lines = b''.join(message.get('body', b'') for message in messages[1:]).decode().splitlines()
+        self.assertEquals([json.loads(line)['title'] for line in lines], ['Project1'])
@@ -0,0 +1,78 @@
+import datetime
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.http import Http404
+from django.test import TestCase, Client, RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from main_crm.identity import get_identity_map, get_object_or_404, get_plan
+from main_crm.models import Company, Project, Interaction
+
+
+class IdentityMapTest(TestCase):
+
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_superuser(username='GGGGGG', password='qweqweqweqwe')
+        self.client.login(username='GGGGGG', password='qweqweqweqwe')
+        self.company = Company.objects.create(company_name='Company1', slug='company1', fio='Nikhil Estes')
+        self.project = Project.objects.create(user=self.company, title='Project1',
+                                              started_at=datetime.date(1991, 12, 21))
+        self.interaction = Interaction.objects.create(project=self.project, channel='r', manager=self.user,
+                                                      description='Desc1', mark='1')
+
+    def capture(self, method, url, data=None):
+        self.client.get(reverse('index'))
+        with CaptureQueriesContext(connection) as context:
+            response = getattr(self.client, method)(url, data)
+        return response, [query['sql'] for query in context.captured_queries]
+
+    def assertLoadedOnce(self, queries, table):
+        self.assertEquals(len([sql for sql in queries if sql.startswith('SELECT') and f'FROM "{table}"' in sql]), 1)
+
+    def test_object_loaded_once(self):
+        request = RequestFactory().get('/')
+        load = lambda: Company.objects.get(slug='company1')  # noqa: E731
+        with self.assertNumQueries(1):
+            company = get_object_or_404(request, Company.objects.all(), slug='company1')
+            self.assertIs(get_identity_map(request).get(Company, 'pk', self.company.pk, load,
+                                                        get_plan(Company.objects.all())), company)
+            self.assertIs(get_object_or_404(request, Company.objects.all(), slug='company1'), company)
+
+        with self.assertRaises(Http404):
+            get_object_or_404(request, Company.objects.all(), slug='missing')
+
+    def test_objects_are_keyed_by_plan(self):
+        request = RequestFactory().get('/')
+        partial = get_object_or_404(request, Company.objects.only('pk', 'slug'), slug='company1')
+        with self.assertNumQueries(1):
+            company = get_object_or_404(request, Company.objects.all(), slug='company1')
+            self.assertIsNot(company, partial)
+            self.assertEquals(company.get_deferred_fields(), set())
+            self.assertIs(get_object_or_404(request, Company.objects.only('slug', 'pk'), slug='company1'), partial)
+
+        with self.assertNumQueries(1):
+            project = get_object_or_404(request, Project.objects.select_related('user'), pk=self.project.pk)
+            self.assertEquals(project.user, self.company)
+        with self.assertNumQueries(1):
+            self.assertIsNot(get_object_or_404(request, Project.objects.all(), pk=self.project.pk), project)
+
+    def test_update_view(self):
+        response, queries = self.capture('get', reverse('company-update', args=['company1']))
+        self.assertEquals(response.status_code, 200)
+        self.assertLoadedOnce(queries, 'main_crm_company')
+
+    def test_owner_required_view(self):
+        response, queries = self.capture('post', reverse('interaction-delete', args=[self.interaction.pk]))
+        self.assertEquals(response.status_code, 302)
+        self.assertLoadedOnce(queries, 'main_crm_interaction')
+        # Пользователь загружается только для сессии, владелец проверяется по manager_id
+        self.assertEquals(sum('FROM "auth_user"' in sql for sql in queries), 1)
+
+    def test_create_view_with_missing_parent(self):
+        response = self.client.post(reverse('project-create', args=['missing']), {
+            'title': 'Project2', 'cost': 1, 'started_at': '1991-12-21', 'finished_at': '1991-12-22',
+        })
+        self.assertEquals(response.status_code, 404)
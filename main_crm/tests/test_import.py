@@ -0,0 +1,101 @@
+import io
+import os
+import tempfile
+import unittest
+
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, Client
+from django.urls import reverse
+
+from main_crm import importer
+from main_crm.models import Company, Phone, Email
+
+try:
+    import openpyxl
+except ImportError:
+    openpyxl = None
+
+CSV_CONTENT = (
+    'company_name,fio,description,phones,emails\n'
+    'Company1,Nikhil Estes,<p>Описание</p>,+7 900 000-00-01; +7 900 000-00-02,a@example.com\n'
+    'Компания,Иван Иванов,<p>Описание</p>,,b@example.com;c@example.com\n'
+    'Existing,Ivan,<p>Описание</p>,,\n'
+    ',Ivan,<p>Описание</p>,,not-an-email\n'
+    'Company1,Duplicate,<p>Описание</p>,,\n'
+)
+
+
+class CompanyImportTest(TestCase):
+
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_superuser(username='GGGGGG', password='qweqweqweqwe')
+        Company.objects.create(company_name='Existing', slug='existing', fio='Ivan')
+        Company.objects.create(company_name='Other company1', slug='company1', fio='Ivan')
+
+    def run_import(self, batch_size=2):
+        rows = importer.read_rows(io.BytesIO(CSV_CONTENT.encode('utf-8-sig')), 'companies.csv')
+        return importer.CompanyImporter(batch_size).run(rows)
+
+    def test_import_csv(self):
+        result = self.run_import()
+        self.assertEquals(result.processed, 5)
+        self.assertEquals(result.created, 2)
+        self.assertEquals([number for number, _ in result.errors], [4, 5, 6])
+        self.assertIn('emails', result.errors[1][1])
+        self.assertIn('company_name', result.errors[2][1])
+
+        company = Company.objects.get(company_name='Company1')
+        self.assertEquals(company.slug, 'company1-2')
+        self.assertEquals(Phone.objects.filter(user=company).count(), 2)
+        self.assertEquals(Email.objects.filter(user__company_name='Компания').count(), 2)
+
+    def test_slug_collisions_resolved_in_bulk(self):
+        Company.objects.create(company_name='Company1 old', slug='company1-2', fio='Ivan')
+        with self.assertNumQueries(8):
+            self.run_import(batch_size=10)
+        self.assertEquals(Company.objects.get(company_name='Company1').slug, 'company1-3')
+
+    def test_many_slug_collisions(self):
+        Company.objects.bulk_create(
+            Company(company_name=f'Comp {number}', slug=f'comp-{number}', fio='Ivan') for number in range(1100)
+        )
+        content = 'company_name,fio\n' + ''.join(f'Comp! {number},Ivan\n' for number in range(1100))
+        rows = importer.read_rows(io.BytesIO(content.encode()), 'companies.csv')
+        result = importer.CompanyImporter(2000).run(rows)
+        self.assertEquals((result.created, result.errors), (1100, []))
+        self.assertEquals(Company.objects.get(company_name='Comp! 1099').slug, 'comp-1099-2')
+
+    def test_import_view(self):
+        self.client.login(username='GGGGGG', password='qweqweqweqwe')
+        upload = SimpleUploadedFile('companies.csv', CSV_CONTENT.encode(), content_type='text/csv')
+        response = self.client.post(reverse('company-import'), {'file': upload, 'batch_size': 100})
+        self.assertEquals(response.status_code, 200)
+        self.assertEquals(response.context['result'].created, 2)
+        self.assertContains(response, 'Строка')
+
+    def test_import_command(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'companies.csv')
+            with open(path, 'w', encoding='utf-8') as file:
+                file.write(CSV_CONTENT)
+            out, err = io.StringIO(), io.StringIO()
+            call_command('import_companies', path, '--batch-size', '2', stdout=out, stderr=err)
+        self.assertIn('создано 2 из 5', out.getvalue())
+        self.assertIn('Строка 4', err.getvalue())
+
+    @unittest.skipIf(openpyxl is None, 'openpyxl не установлен')
+    def test_import_xlsx(self):
+        workbook = openpyxl.Workbook()
+        sheet = workbook.active
+        sheet.append(['company_name', 'fio', 'description', 'phones', 'emails'])
+        sheet.append(['Xlsx company', 'Ivan', '<p>Описание</p>', 89000000001, 'x@example.com'])
+        content = io.BytesIO()
+        workbook.save(content)
+        content.seek(0)
+
+        result = importer.CompanyImporter().run(importer.read_rows(content, 'companies.xlsx'))
+        self.assertEquals(result.created, 1)
+        self.assertEquals(Phone.objects.get(user__company_name='Xlsx company').phone, '89000000001')
@@ -0,0 +1,84 @@
+import datetime
+import re
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase, Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from main_crm.models import Company, Project, Interaction
+
+# Строка EXPLAIN QUERY PLAN вида "SCAN main_crm_interaction" без USING INDEX - полный проход по таблице
+FULL_SCAN_RE = re.compile(r'^SCAN (main_crm_\w+)(?: AS \w+)?$')
+
+
+class QueryPlanIndexTest(TestCase):
+    """
+    Проверка, что горячие запросы контроллеров обслуживаются индексами, а не полным проходом по таблице
+    """
+
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_superuser(username='GGGGGG', password='qweqweqweqwe')
+        self.client.login(username='GGGGGG', password='qweqweqweqwe')
+        self.company = Company.objects.create(company_name='Company1', slug='company1', fio='Nikhil Estes')
+        self.project = Project.objects.create(user=self.company, title='Project1',
+                                              started_at=datetime.date(1991, 12, 21))
+        self.interaction = Interaction.objects.create(project=self.project, channel='r', manager=self.user,
+                                                      description='Desc1', mark='1')
+
+    def get_full_scans(self, url, data=None):
+        """
+        Выполняет запрос к контроллеру и возвращает запросы к таблицам main_crm с полным проходом
+        :param url:
+        :param data:
+        :return:
+        """
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, data)
+        self.assertEquals(response.status_code, 200)
+
+        full_scans = []
+        with connection.cursor() as cursor:
+            for query in context.captured_queries:
+                sql = query['sql']
+                if not sql.startswith('SELECT') or 'main_crm_' not in sql:
+                    continue
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+                for row in cursor.fetchall():
+                    if FULL_SCAN_RE.match(row[-1]):
+                        full_scans.append((row[-1], sql))
+        return full_scans
+
+    def assertNoFullScan(self, url, data=None):
+        full_scans = self.get_full_scans(url, data)
+        self.assertFalse(full_scans, full_scans)
+
+    def test_company_list(self):
+        self.assertNoFullScan(reverse('index'))
+        self.assertNoFullScan(reverse('index'), {'sort_by': 'company_name'})
+        self.assertNoFullScan(reverse('index'), {'sort_by': '-published'})
+
+    def test_company_detail(self):
+        self.assertNoFullScan(reverse('company-detail', args=['company1']))
+
+    def test_project_lists(self):
+        self.assertNoFullScan(reverse('company-projects-list', args=['company1']))
+        self.assertNoFullScan(reverse('all-projects'))
+
+    def test_interaction_lists(self):
+        self.assertNoFullScan(reverse('project-interaction-list', args=[self.project.pk]))
+        self.assertNoFullScan(reverse('company-interactions-list', args=['company1']))
+        self.assertNoFullScan(reverse('manager-profile'))
+
+    def test_all_interaction_list_filters(self):
+        url = reverse('all-interaction-list')
+        self.assertNoFullScan(url)
+        self.assertNoFullScan(url, {'channel': 'r'})
+        self.assertNoFullScan(url, {'mark': '1'})
+        self.assertNoFullScan(url, {'manager': self.user.pk})
+
+    def test_detail_views(self):
+        self.assertNoFullScan(reverse('project-detail', args=[self.project.pk]))
+        self.assertNoFullScan(reverse('interaction-detail', args=[self.interaction.pk]))
@@ -0,0 +1,53 @@
+import json
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase, Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from main_crm import instrumentation
+from main_crm.models import Company
+
+
+class RequestTimingTest(TestCase):
+
+    def setUp(self):
+        instrumentation.reset_stats()
+        self.user = User.objects.create_superuser(username='GGGGGG', password='qweqweqweqwe')
+        self.client = Client()
+        self.client.login(username='GGGGGG', password='qweqweqweqwe')
+        Company.objects.create(company_name='Company1', slug='company1', fio='Nikhil Estes')
+
+    def test_server_timing_header(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse('company-detail', args=['company1']))
+        header = response['Server-Timing']
+        self.assertIn(f'desc="{len(context.captured_queries)} queries"', header)
+        self.assertRegex(header, r'^sql;dur=[\d.]+;desc="\d+ queries", tpl;dur=[\d.]+, total;dur=[\d.]+$')
+
+    @override_settings(REQUEST_TIMING_SLOW_MS=0, REQUEST_TIMING_SLOWEST_QUERIES=2)
+    def test_slow_request_log(self):
+        client = Client()
+        client.login(username='GGGGGG', password='qweqweqweqwe')
+        with self.assertLogs('main_crm.performance', 'WARNING') as logs:
+            client.get(reverse('company-detail', args=['company1']))
+        record = json.loads(logs.records[-1].getMessage())
+        self.assertEquals(record['url_name'], 'company-detail')
+        self.assertEquals(len(record['slowest_queries']), 2)
+        self.assertGreater(record['template_ms'], 0)
+        self.assertTrue(all(query['site'] for query in record['slowest_queries']))
+
+    def test_call_site(self):
+        metrics = instrumentation.RequestMetrics(1)
+        metrics(lambda *args: None, 'SELECT 1', None, False, {})
+        self.assertRegex(metrics.get_slow_queries()[0]['site'], r'^tests/test_instrumentation\.py:\d+ test_call_site$')
+
+    def test_stats_by_url_name(self):
+        self.client.get(reverse('index'))
+        self.client.get(reverse('index'))
+        self.client.get(reverse('company-detail', args=['company1']))
+        stats = self.client.get(reverse('timing-stats')).json()
+        self.assertEquals(stats['index']['count'], 2)
+        self.assertEquals(stats['company-detail']['count'], 1)
+        self.assertGreater(stats['index']['avg_queries'], 0)
@@ -0,0 +1,92 @@
+import io
+import re
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.contrib.auth.tokens import default_token_generator
+from django.core import mail
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, Client
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+
+from main_crm import jobs, tasks
+from main_crm.models import Job
+
+
+class JobQueueTest(TestCase):
+
+    def setUp(self):
+        jobs.register('test_fail')(self.fail_task)
+        self.addCleanup(jobs.TASKS.pop, 'test_fail')
+
+    @staticmethod
+    def fail_task(message):
+        raise ValueError(message)
+
+    def run_worker(self):
+        call_command('run_worker', '--once', '--workers', '2', stdout=io.StringIO())
+
+    def test_emails_share_connection(self):
+        for number in range(3):
+            tasks.enqueue_email(f'Subject {number}', 'Body', None, [f'user{number}@gmail.com'])
+        with mock.patch('main_crm.tasks.get_connection', wraps=tasks.get_connection) as get_connection:
+            self.run_worker()
+        self.assertEquals(get_connection.call_count, 1)
+        self.assertEquals(len(mail.outbox), 3)
+        self.assertEquals(Job.objects.filter(status='d').count(), 3)
+
+    def test_failed_job_retried_with_backoff(self):
+        job = jobs.enqueue('test_fail', {'message': 'boom'}, max_attempts=2)
+        self.run_worker()
+        job.refresh_from_db()
+        self.assertEquals((job.status, job.attempts), ('q', 1))
+        self.assertIn('ValueError: boom', job.last_error)
+        self.assertGreater(job.run_after, timezone.now() + jobs.get_backoff(1) - timedelta(seconds=5))
+
+        Job.objects.filter(pk=job.pk).update(run_after=timezone.now())
+        self.run_worker()
+        job.refresh_from_db()
+        self.assertEquals((job.status, job.attempts), ('f', 2))
+
+    def test_visibility_timeout(self):
+        job = jobs.enqueue(tasks.SEND_EMAIL, {'subject': 'Subject', 'body': 'Body', 'to': ['mail@gmail.com']})
+        token, claimed = jobs.claim(10)
+        self.assertEquals(claimed, [job])
+        self.assertEquals(jobs.claim(10), (None, []))
+
+        Job.objects.filter(pk=job.pk).update(locked_until=timezone.now() - timedelta(seconds=1))
+        new_token, claimed = jobs.claim(10)
+        self.assertEquals(claimed[0].attempts, 2)
+
+        jobs.finish(token, claimed, [None])
+        self.assertEquals(Job.objects.get().status, 'r')
+        jobs.finish(new_token, claimed, [None])
+        self.assertEquals(Job.objects.get().status, 'd')
+
+
+class PasswordResetJobTest(TransactionTestCase):
+    """
+    Обработчик письма читает пользователя в потоке воркера, поэтому данные теста должны быть зафиксированы
+    """
+
+    def test_password_reset_is_queued(self):
+        user = User.objects.create_user(username='GGGGGG', email='mail@gmail.com', password='qweqweqweqwe')
+        response = Client().post(reverse('password-reset'), {'username': 'GGGGGG'})
+        self.assertEquals(response.status_code, 302)
+        self.assertEquals(len(mail.outbox), 0)
+        job = Job.objects.get()
+        self.assertEquals(job.task, tasks.SEND_PASSWORD_RESET)
+        self.assertEquals(job.payload['user_pk'], user.pk)
+        self.assertNotIn('token', job.payload)
+
+        call_command('run_worker', '--once', '--workers', '2', stdout=io.StringIO())
+        self.assertEquals(len(mail.outbox), 1)
+        self.assertEquals(mail.outbox[0].to, ['mail@gmail.com'])
+        uid, token = re.search(r'/confirm/([-\w]+)/([-\w]+)/', mail.outbox[0].body).groups()
+        self.assertEquals(uid, urlsafe_base64_encode(force_bytes(user.pk)))
+        self.assertTrue(default_token_generator.check_token(user, token))
+        self.assertEquals(Job.objects.get().status, 'd')
@@ -0,0 +1,67 @@
+from django.db import OperationalError, connections
+from django.test import TransactionTestCase, override_settings
+
+from main_crm import datagen, loadtest
+from main_crm.models import Interaction
+
+
+@override_settings(REQUEST_TIMING_SLOW_MS=60000)
+class LoadTestTest(TransactionTestCase):
+
+    def setUp(self):
+        datagen.generate(100, batch_size=50)
+
+    def check_report(self, report: dict, interface: str, concurrency: int):
+        self.assertEquals((report['interface'], report['concurrency']), (interface, concurrency))
+        self.assertGreater(report['requests'], 0)
+        self.assertEquals(report['requests'], sum(route['requests'] for route in report['routes'].values()))
+        self.assertEquals(report['requests'], sum(bucket['requests'] for bucket in report['timeline']))
+        self.assertLessEqual(set(report['statuses']), {'200', '302'}, report['exceptions'])
+        self.assertEquals(report['errors'], 0)
+
+    def test_wsgi(self):
+        report = loadtest.run('wsgi', 2, 0.5, {'list': 1, 'detail': 1, 'filter': 1}, interval=0.25)
+        self.check_report(report, 'wsgi', 2)
+        self.assertEquals(set(report['routes']), {'list', 'detail', 'filter'})
+
+    def test_asgi(self):
+        report = loadtest.run('asgi', 2, 0.5, {'list': 1, 'detail': 1})
+        self.check_report(report, 'asgi', 2)
+        self.assertEquals(set(report['routes']), {'list', 'detail'})
+
+    def test_create(self):
+        # Один поток: тестовая база в памяти с общим кешем блокирует таблицы при параллельной записи
+        report = loadtest.run('wsgi', 1, 0.5, {'create': 1}, keep=True)
+        self.check_report(report, 'wsgi', 1)
+        self.assertEquals(report['statuses'], {'302': report['requests']})
+        self.assertEquals(report['deleted'], 0)
+        count = Interaction.objects.count()
+        self.assertEquals(count, 100 + report['requests'])
+
+        # Без keep удаляются только взаимодействия, созданные этим прогоном
+        report = loadtest.run('wsgi', 1, 0.3, {'create': 1, 'list': 1})
+        self.check_report(report, 'wsgi', 1)
+        self.assertEquals(report['deleted'], report['routes']['create']['requests'])
+        self.assertEquals(Interaction.objects.count(), count)
+
+    def test_compare_databases(self):
+        comparisons = loadtest.compare_databases([1], 0.3, {'detail': 1, 'create': 1})
+        self.assertEquals(len(comparisons), 1)
+        for label in ('before', 'after'):
+            self.check_report(comparisons[0][label], 'wsgi', 1)
+        self.assertEquals(connections['default'].settings_dict['ENGINE'], 'main_crm.backends.sqlite3')
+
+    def test_locked_rate(self):
+        results = loadtest.Results()
+        results.add('create', 0.0, 0.05, 500, OperationalError('database is locked'))
+        results.add('create', 0.3, 0.05, 500, ValueError())
+        results.add('list', 0.5, 0.05, 200)
+        report = results.get_report(0.0, 1.0, 0.2)
+        self.assertEquals((report['errors'], report['locked'], report['locked_rate']), (2, 1, 0.3333))
+        self.assertEquals(report['exceptions'], {'OperationalError: database is locked': 1, 'ValueError: ': 1})
+        self.assertEquals([bucket['requests'] for bucket in report['timeline']], [1, 1, 1])
+
+    def test_parse_mix(self):
+        self.assertEquals(loadtest.parse_mix('list=3, create'), {'list': 3, 'create': 1})
+        with self.assertRaises(ValueError):
+            loadtest.parse_mix('delete=1')
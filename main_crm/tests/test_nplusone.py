@@ -0,0 +1,44 @@
+import datetime
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.test import TestCase, Client, override_settings
+from django.urls import reverse
+
+from main_crm import views
+from main_crm.models import Company, Project
+from main_crm.nplusone import NPlusOneError
+
+
+@override_settings(NPLUSONE_ENABLED=True, NPLUSONE_RAISE=True, NPLUSONE_THRESHOLD=3)
+class NPlusOneDetectorTest(TestCase):
+
+    def setUp(self):
+        self.client = Client()
+        User.objects.create_superuser(username='GGGGGG', password='qweqweqweqwe')
+        self.client.login(username='GGGGGG', password='qweqweqweqwe')
+        for i in range(4):
+            company = Company.objects.create(company_name=f'Company{i}', slug=f'company{i}', fio='Nikhil Estes')
+            Project.objects.create(user=company, title=f'Project{i}', started_at=datetime.date(1991, 12, 21))
+
+    def test_lazy_foreign_key_in_template(self):
+        with mock.patch.object(views.AllProjectsListView, 'select_related', ()):
+            with self.assertRaises(NPlusOneError) as context:
+                self.client.get(reverse('all-projects'))
+        message = str(context.exception)
+        self.assertIn('cms_mainpage/all-projects.html:13 {{ project.user }}', message)
+        self.assertIn('select_related() the foreign key to main_crm_company', message)
+
+    def test_preloaded_relation(self):
+        self.assertEquals(self.client.get(reverse('all-projects')).status_code, 200)
+
+    @override_settings(NPLUSONE_RAISE=False)
+    def test_log(self):
+        with mock.patch.object(views.AllProjectsListView, 'select_related', ()):
+            with self.assertLogs('main_crm.nplusone', 'WARNING'):
+                self.client.get(reverse('all-projects'))
+
+    def test_view_tests_use_detector(self):
+        self.assertEquals(settings.TEST_RUNNER, 'main_crm.nplusone.NPlusOneTestRunner')
+        self.assertIn('main_crm.tests.test_views', settings.NPLUSONE_TEST_MODULES)
@@ -0,0 +1,67 @@
+import os
+import pstats
+import shutil
+import tempfile
+
+from django.contrib.auth.models import User
+from django.test import TestCase, Client, override_settings
+from django.urls import reverse
+
+from main_crm import profiling
+from main_crm.models import Company
+
+PROFILE_DIR = tempfile.mkdtemp()
+
+
+@override_settings(PROFILE_DIR=PROFILE_DIR, PROFILE_KEEP=2)
+class ProfilerTest(TestCase):
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(PROFILE_DIR, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        shutil.rmtree(PROFILE_DIR, ignore_errors=True)
+        self.user = User.objects.create_superuser(username='GGGGGG', password='qweqweqweqwe')
+        User.objects.create_user(username='manager', password='qweqweqweqwe')
+        self.client = Client()
+        self.client.login(username='GGGGGG', password='qweqweqweqwe')
+        Company.objects.create(company_name='Company1', slug='company1', fio='Nikhil Estes')
+
+    def test_cprofile(self):
+        response = self.client.get(reverse('index'), {'profile': '1'})
+        self.assertEquals(response.status_code, 200)
+        name = response['X-Profile-Name']
+
+        stats = pstats.Stats(os.path.join(PROFILE_DIR, f'{name}.prof'))
+        self.assertTrue(any(function == 'get_context_data' for _, _, function in stats.stats))
+        info, = profiling.list_profiles()
+        self.assertEquals((info['mode'], info['url_name'], info['user']), ('cprofile', 'index', 'GGGGGG'))
+
+        response = self.client.get(reverse('profiles'))
+        self.assertContains(response, reverse('profile-file', args=[f'{name}.prof']))
+        response = self.client.get(reverse('profile-file', args=[f'{name}.prof']))
+        self.assertEquals(response.status_code, 200)
+
+    def test_sampling_by_header(self):
+        response = self.client.get(reverse('company-detail', args=['company1']), HTTP_X_PROFILE='sample')
+        info, = profiling.list_profiles()
+        self.assertEquals(info['name'], response['X-Profile-Name'])
+        self.assertEquals(info['mode'], 'sample')
+        self.assertFalse(os.path.exists(os.path.join(PROFILE_DIR, f"{info['name']}.prof")))
+
+    def test_only_superusers(self):
+        client = Client()
+        client.login(username='manager', password='qweqweqweqwe')
+        response = client.get(reverse('index'), {'profile': '1'})
+        self.assertNotIn('X-Profile-Name', response)
+        self.assertEquals(profiling.list_profiles(), [])
+        self.assertEquals(client.get(reverse('profiles')).status_code, 403)
+
+    def test_rotation(self):
+        names = [self.client.get(reverse('index'), {'profile': '1'})['X-Profile-Name'] for _ in range(3)]
+        self.assertEquals({info['name'] for info in profiling.list_profiles()}, set(sorted(names)[1:]))
+        with open(os.path.join(PROFILE_DIR, 'other.prof'), 'w'):
+            pass
+        self.assertEquals(self.client.get(reverse('profile-file', args=['other.prof'])).status_code, 404)
@@ -0,0 +1,101 @@
+import datetime
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from main_crm.models import Company, Phone, Email, Project, Interaction
+
+
+class ViewQueryCountTest(TestCase):
+    """
+    Количество запросов каждого контроллера не должно зависеть от количества выводимых записей
+    """
+
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_superuser(username='GGGGGG', password='qweqweqweqwe')
+        self.client.login(username='GGGGGG', password='qweqweqweqwe')
+        self.company = self.create_rows(1)
+
+    def create_rows(self, count):
+        company = None
+        for i in range(count):
+            number = Company.objects.count()
+            company = Company.objects.create(
+                company_name=f'Company{number}',
+                slug=f'company{number}',
+                fio='Nikhil Estes',
+                description='<p>Desc</p>' * 100,
+            )
+            Phone.objects.create(user=company, phone=f'+3213482439{number}')
+            Email.objects.create(user=company, email=f'mail{number}@gmail.com')
+            project = Project.objects.create(
+                user=company,
+                title=f'Project{number}',
+                description='<p>Description</p>' * 100,
+                started_at=datetime.date(1991, 12, 21),
+            )
+            manager = User.objects.create_superuser(username=f'manager{number}', password='qweqweqweqwe')
+            Interaction.objects.create(
+                project=project,
+                channel='r',
+                manager=manager,
+                description='<p>Interaction</p>' * 100,
+                mark='1',
+            )
+        return company
+
+    def count_queries(self, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEquals(response.status_code, 200)
+        return len(context.captured_queries)
+
+    def assertConstantQueries(self, num, get_url, extra_rows=3):
+        self.assertEquals(self.count_queries(get_url()), num)
+        self.create_rows(extra_rows)
+        self.assertEquals(self.count_queries(get_url()), num)
+
+    def test_company_list(self):
+        self.assertConstantQueries(4, lambda: reverse('index'))
+
+    def test_company_detail(self):
+        self.assertConstantQueries(7, lambda: reverse('company-detail', args=[self.company.slug]))
+
+    def test_project_list(self):
+        self.assertConstantQueries(4, lambda: reverse('company-projects-list', args=[self.company.slug]))
+
+    def test_all_projects(self):
+        self.assertConstantQueries(4, lambda: reverse('all-projects'))
+
+    def test_project_detail(self):
+        self.assertConstantQueries(4, lambda: reverse('project-detail', args=[Project.objects.first().pk]))
+
+    def test_project_interaction_list(self):
+        self.assertConstantQueries(
+            5, lambda: reverse('project-interaction-list', args=[Project.objects.first().pk])
+        )
+
+    def test_company_interaction_list(self):
+        self.assertConstantQueries(4, lambda: reverse('company-interactions-list', args=[self.company.slug]))
+
+    def test_interaction_detail(self):
+        self.assertConstantQueries(4, lambda: reverse('interaction-detail', args=[Interaction.objects.first().pk]))
+
+    def test_all_interaction_list(self):
+        self.assertConstantQueries(5, lambda: reverse('all-interaction-list'))
+
+    def test_list_views_defer_descriptions(self):
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(reverse('all-interaction-list'))
+        select = next(query['sql'] for query in context.captured_queries
+                      if 'FROM "main_crm_interaction"' in query['sql'] and 'COUNT(' not in query['sql'])
+        self.assertIn('"main_crm_interaction"."description_excerpt"', select)
+        self.assertNotIn('"main_crm_interaction"."description"', select)
+        self.assertNotIn('"main_crm_interaction"."description_html"', select)
+        self.assertNotIn('"main_crm_project"."description"', select)
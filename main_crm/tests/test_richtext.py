@@ -0,0 +1,58 @@
+import datetime
+import io
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase
+
+from main_crm.models import Company, Project, Interaction
+from main_crm.richtext import sanitize_html, make_excerpt
+
+
+class SanitizeHtmlTest(TestCase):
+
+    def test_keeps_allowed_markup(self):
+        value = '<p>Текст <strong>жирный</strong> <a href="https://example.com" title="x">ссылка</a></p>'
+        self.assertEquals(sanitize_html(value), value)
+
+    def test_removes_unsafe_markup(self):
+        value = (
+            '<p onclick="alert(1)">Текст<script>alert(1)</script></p>'
+            '<a href="javascript:alert(1)">ссылка</a><img src="/media/uploads/a.png" onerror="x">'
+            '<iframe src="https://example.com"><p>внутри</p></iframe><font color="red">цвет</font>'
+        )
+        self.assertEquals(
+            sanitize_html(value),
+            '<p>Текст</p><a>ссылка</a><img src="/media/uploads/a.png">цвет',
+        )
+
+    def test_escapes_text_and_closes_tags(self):
+        self.assertEquals(sanitize_html('<p>a &lt;b&gt; <em>c'), '<p>a &lt;b&gt; <em>c</em></p>')
+
+    def test_excerpt(self):
+        self.assertEquals(make_excerpt('<p>Первый&nbsp;абзац</p><p>Второй</p>'), 'Первый абзац Второй')
+
+
+class RenderedDescriptionTest(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_superuser(username='GGGGGG', password='qweqweqweqwe')
+        self.company = Company.objects.create(company_name='Company1', slug='company1', fio='Nikhil Estes',
+                                              description='<p>Описание <script>x</script>компании</p>')
+        self.project = Project.objects.create(user=self.company, title='Project1',
+                                              started_at=datetime.date(1991, 12, 21))
+
+    def test_rendered_on_save(self):
+        self.assertEquals(self.company.description_html, '<p>Описание компании</p>')
+        self.assertEquals(self.company.description_excerpt, 'Описание компании')
+
+        interaction = Interaction.objects.create(project=self.project, channel='r', manager=self.user, mark='3',
+                                                 description='<p>' + 'Слово ' * 100 + '</p>')
+        self.assertEquals(len(interaction.description_excerpt), 255)
+
+    def test_render_descriptions_command(self):
+        Interaction.objects.bulk_create([
+            Interaction(project=self.project, channel='r', manager=self.user, mark='3', description='<p>Текст</p>')
+        ])
+        call_command('render_descriptions', stdout=io.StringIO())
+        self.assertEquals(Interaction.objects.get().description_excerpt, 'Текст')
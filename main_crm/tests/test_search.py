@@ -0,0 +1,136 @@
+import datetime
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, Client
+from django.urls import reverse
+
+from main_crm import search
+from main_crm.models import Company, Project, Interaction
+
+
+class InteractionSearchTest(TestCase):
+
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_superuser(username='GGGGGG', password='qweqweqweqwe')
+        self.company = Company.objects.create(company_name='Рога и копыта', slug='roga-i-kopyta', fio='Nikhil Estes')
+        self.project = Project.objects.create(user=self.company, title='Поставка бумаги',
+                                              started_at=datetime.date(1991, 12, 21))
+        self.other_project = Project.objects.create(user=self.company, title='Ремонт офиса',
+                                                    started_at=datetime.date(1991, 12, 21))
+        self.interaction = Interaction.objects.create(
+            project=self.project, channel='r', manager=self.user, mark='1',
+            description='<p>Клиент просит <b>счет</b> на&nbsp;оплату</p>',
+        )
+        self.other_interaction = Interaction.objects.create(
+            project=self.other_project, channel='w', manager=self.user, mark='5',
+            description='<p>Согласовали смету, упомянули бумаги</p>',
+        )
+        self.all_interactions_url = reverse('all-interaction-list')
+
+    def search(self, value, **kwargs):
+        return list(search.search(Interaction.objects.all(), value, **kwargs))
+
+    def test_build_match_query(self):
+        self.assertEquals(search.build_match_query('счет оплат*'), '"счет" "оплат"*')
+        self.assertEquals(search.build_match_query('"; DROP', column='project', prefix=True),
+                          'project : ("DROP"*)')
+        self.assertEquals(search.build_match_query('  '), '')
+
+    def test_search_plain_text_description(self):
+        self.assertEquals(self.search('счет на оплату'), [self.interaction])
+        self.assertEquals(self.search('b'), [])
+        self.assertEquals(self.search('nbsp'), [])
+
+    def test_search_prefix(self):
+        self.assertEquals(self.search('опла'), [])
+        self.assertEquals(self.search('опла*'), [self.interaction])
+
+    def test_search_ranked_by_column_weight(self):
+        self.assertEquals(self.search('бумаги'), [self.interaction, self.other_interaction])
+
+    def test_search_follows_company_and_project_updates(self):
+        self.company.company_name = 'Копыта и рога'
+        self.company.save()
+        self.other_project.title = 'Покраска забора'
+        self.other_project.save()
+
+        self.assertEquals(len(self.search('копыта', column='company')), 2)
+        self.assertEquals(self.search('забора', column='project'), [self.other_interaction])
+
+    def test_search_follows_delete(self):
+        self.interaction.delete()
+        self.assertEquals(self.search('счет'), [])
+
+    def test_rebuild_command(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {search.FTS_TABLE}')
+        self.assertEquals(self.search('счет'), [])
+
+        call_command('rebuild_search_index', batch_size=1, stdout=open('/dev/null', 'w'))
+        self.assertEquals(self.search('счет'), [self.interaction])
+
+    def test_failed_rebuild_keeps_index(self):
+        Interaction.objects.bulk_create([
+            Interaction(project=self.project, channel='r', manager=self.user, mark='3', description='Счет')
+            for _ in range(3)
+        ])
+        search.rebuild_index()
+        progress = mock.Mock(side_effect=[None, RuntimeError('boom')])
+        with self.assertRaises(RuntimeError):
+            search.rebuild_index(batch_size=2, progress=progress)
+        self.assertEquals(len(self.search('счет')), 4)
+
+    def test_rebuild_keeps_changes_made_during_rebuild(self):
+        Interaction.objects.bulk_create([
+            Interaction(project=self.project, channel='r', manager=self.user, mark='3', description='Счет')
+            for _ in range(3)
+        ])
+
+        def change(total):
+            if total == 2:
+                Interaction.objects.create(project=self.other_project, channel='r', manager=self.user, mark='3',
+                                           description='Новая встреча')
+                self.interaction.delete()
+                self.company.company_name = 'Копыта и рога'
+                self.company.save()
+
+        search.rebuild_index(batch_size=2, progress=change)
+        self.assertEquals(len(self.search('встреча')), 1)
+        self.assertEquals(len(self.search('счет')), 3)
+        self.assertEquals(len(self.search('копыта', column='company')), 5)
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT COUNT(*) FROM sqlite_master "
+                           f"WHERE name IN ('{search.REBUILD_TABLE}', '{search.REPLACED_TABLE}')")
+            self.assertEquals(cursor.fetchone()[0], 0)
+
+    def test_all_interaction_list_q_filter(self):
+        self.client.login(username='GGGGGG', password='qweqweqweqwe')
+        response = self.client.get(self.all_interactions_url, {'q': 'смет*'})
+        self.assertEquals(list(response.context['object_list']), [self.other_interaction])
+
+        response = self.client.get(self.all_interactions_url, {'project__icontains': 'ремо'})
+        self.assertEquals(list(response.context['object_list']), [self.other_interaction])
+
+        response = self.client.get(self.all_interactions_url, {'company__icontains': 'рога', 'channel': 'r'})
+        self.assertEquals(list(response.context['object_list']), [self.interaction])
+
+    def test_all_interaction_list_q_filter_cursor(self):
+        Interaction.objects.bulk_create([
+            Interaction(project=self.project, channel='r', manager=self.user, mark='3', description=f'Счет {i}')
+            for i in range(6)
+        ])
+        search.rebuild_index()
+        self.client.login(username='GGGGGG', password='qweqweqweqwe')
+
+        response = self.client.get(self.all_interactions_url, {'q': 'счет'})
+        seen = list(response.context['object_list'])
+        response = self.client.get(self.all_interactions_url,
+                                   {'q': 'счет', 'cursor': response.context['page_obj'].next_cursor})
+        seen += list(response.context['object_list'])
+
+        self.assertEquals(len(seen), 7)
+        self.assertEquals(len(set(seen)), 7)
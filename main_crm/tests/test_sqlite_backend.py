@@ -0,0 +1,142 @@
+import os
+import tempfile
+import threading
+import time
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db import OperationalError, connection, transaction
+from django.test import TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from main_crm.backends.sqlite3.base import DatabaseWrapper, get_stats
+from main_crm.models import User
+
+
+class SQLiteBackendTest(TransactionTestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'db.sqlite3')
+        wrapper = self.make_wrapper('IMMEDIATE')
+        with wrapper.cursor() as cursor:
+            cursor.execute('CREATE TABLE counter (value INTEGER)')
+        wrapper.close()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def make_wrapper(self, transaction_mode: str) -> DatabaseWrapper:
+        options = {'transaction_mode': transaction_mode, 'pragmas': {'busy_timeout': 2000}}
+        return DatabaseWrapper({**connection.settings_dict, 'NAME': self.path, 'OPTIONS': options}, 'file')
+
+    def count_rows(self) -> int:
+        wrapper = self.make_wrapper('DEFERRED')
+        with wrapper.cursor() as cursor:
+            cursor.execute('SELECT COUNT(*) FROM counter')
+            count = cursor.fetchone()[0]
+        wrapper.close()
+        return count
+
+    def run_writers(self, transaction_mode: str, sequential_begin: bool = False) -> tuple:
+        """
+        Выполняет в двух потоках транзакции, которые сначала читают, а потом пишут
+        :param transaction_mode:
+        :param sequential_begin: Второй поток начинает транзакцию после записи первого, иначе потоки
+                                 читают одновременно и только потом пишут
+        :return: Ошибки и статистика соединений потоков
+        """
+        errors, stats = [], {}
+        barrier = threading.Barrier(2)
+        written = threading.Event()
+
+        def writer(index):
+            if sequential_begin and index:
+                written.wait()
+            wrapper = self.make_wrapper(transaction_mode)
+            try:
+                wrapper._start_transaction_under_autocommit()
+                with wrapper.cursor() as cursor:
+                    cursor.execute('SELECT COUNT(*) FROM counter')
+                    if not sequential_begin:
+                        barrier.wait()
+                    try:
+                        cursor.execute('INSERT INTO counter VALUES (%s)', [index])
+                        written.set()
+                        time.sleep(0.1)
+                        cursor.execute('COMMIT')
+                    except OperationalError as exc:
+                        errors.append(exc)
+                        cursor.execute('ROLLBACK')
+            finally:
+                stats[index] = wrapper.get_stats()
+                wrapper.close()
+
+        threads = [threading.Thread(target=writer, args=(index,)) for index in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return errors, stats
+
+    def test_pragmas(self):
+        with connection.cursor() as cursor:
+            values = {}
+            for name in ('synchronous', 'busy_timeout', 'cache_size', 'temp_store'):
+                cursor.execute(f'PRAGMA {name}')
+                values[name] = cursor.fetchone()[0]
+        self.assertEquals(values, {'synchronous': 1, 'busy_timeout': 5000, 'cache_size': -64000, 'temp_store': 2})
+
+        wrapper = self.make_wrapper('IMMEDIATE')
+        with wrapper.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            self.assertEquals(cursor.fetchone()[0], 'wal')
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEquals(cursor.fetchone()[0], 2000)
+            # mmap_size не применяется к базе в памяти
+            cursor.execute('PRAGMA mmap_size')
+            self.assertEquals(cursor.fetchone()[0], 256 * 1024 * 1024)
+        wrapper.close()
+
+    def test_invalid_options(self):
+        for options in ({'pragmas': {'cache_size': '1; DROP TABLE counter'}}, {'transaction_mode': 'LAZY'}):
+            with self.assertRaises(ImproperlyConfigured):
+                DatabaseWrapper({**connection.settings_dict, 'OPTIONS': options}, 'invalid')
+        wrapper = self.make_wrapper('IMMEDIATE')
+        self.assertNotIn('pragmas', wrapper.get_connection_params())
+        self.assertNotIn('transaction_mode', wrapper.get_connection_params())
+
+    def test_immediate_transaction(self):
+        transactions = connection.stats['transactions']
+        with CaptureQueriesContext(connection) as context:
+            with transaction.atomic():
+                User.objects.count()
+        self.assertEquals(context.captured_queries[0]['sql'], 'BEGIN IMMEDIATE')
+        self.assertEquals(connection.stats['transactions'], transactions + 1)
+
+    def test_deferred_writers_deadlock(self):
+        errors, stats = self.run_writers('DEFERRED')
+        self.assertEquals(len(errors), 1)
+        self.assertIn('database is locked', str(errors[0]))
+        self.assertEquals(sum(connection_stats['lock_errors'] for connection_stats in stats.values()), 1)
+        self.assertEquals(self.count_rows(), 1)
+
+    def test_immediate_writers_wait(self):
+        errors, stats = self.run_writers('IMMEDIATE', sequential_begin=True)
+        self.assertEquals(errors, [])
+        self.assertEquals(self.count_rows(), 2)
+        self.assertEquals(stats[1]['lock_waits'], 1)
+        self.assertGreater(stats[1]['max_lock_wait_ms'], 50)
+        self.assertEquals(stats[0]['lock_errors'] + stats[1]['lock_errors'], 0)
+
+    def test_stats_view(self):
+        user = User.objects.create_superuser(username='GGGGGG', password='qweqweqweqwe')
+        self.client.force_login(user)
+        response = self.client.get(reverse('db-stats'))
+        self.assertEquals(response.status_code, 200)
+        connections = response.json()['connections']
+        current = [stats for stats in connections if stats['thread'] == threading.current_thread().name]
+        self.assertTrue(current)
+        self.assertGreater(current[0]['queries'], 0)
+        self.assertEquals(current[0]['transaction_mode'], 'IMMEDIATE')
+        self.assertEquals(len(connections), len(get_stats()))
@@ -0,0 +1,90 @@
+import io
+import os
+import shutil
+import tempfile
+
+from django.contrib.auth.models import User
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.template import Context, Template
+from django.test import TestCase, Client, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from main_crm import thumbnails
+from main_crm.models import Profile
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def make_image(size=(1200, 900), image_format='JPEG'):
+    content = io.BytesIO()
+    image = Image.new('RGB', size, (200, 30, 30))
+    exif = Image.Exif()
+    exif[0x010f] = 'Camera'
+    image.save(content, image_format, exif=exif)
+    return content.getvalue()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class AvatarThumbnailTest(TestCase):
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(username='GGGGGG', password='qweqweqweqwe')
+        self.profile = Profile.objects.create(user=self.user)
+
+    def upload(self, content):
+        self.client.login(username='GGGGGG', password='qweqweqweqwe')
+        return self.client.post(reverse('profile-update'), {
+            'first_name': 'Nikhil', 'last_name': 'Estes', 'email': 'mail@gmail.com',
+            'profile_image': SimpleUploadedFile('photo.jpg', content, content_type='image/jpeg'),
+        })
+
+    def test_variants_generated_on_upload(self):
+        self.assertEquals(self.upload(make_image()).status_code, 302)
+        profile = Profile.objects.get(pk=self.profile.pk)
+        self.assertEquals(len(profile.avatar_digest), 64)
+        self.assertEquals(profile.avatar_formats, ','.join(thumbnails.get_formats()))
+
+        for size in thumbnails.SIZES:
+            with default_storage.open(thumbnails.variant_name(profile.avatar_digest, size, 'jpeg')) as file:
+                image = Image.open(file)
+                self.assertEquals(max(image.size), size)
+                self.assertNotIn(0x010f, image.getexif())
+
+    def test_same_content_reuses_variants(self):
+        content = make_image()
+        self.upload(content)
+        digest = Profile.objects.get(pk=self.profile.pk).avatar_digest
+        name = thumbnails.variant_name(digest, 64, 'jpeg')
+        modified = os.path.getmtime(default_storage.path(name))
+
+        self.upload(content)
+        self.assertEquals(Profile.objects.get(pk=self.profile.pk).avatar_digest, digest)
+        self.assertEquals(os.path.getmtime(default_storage.path(name)), modified)
+
+    def test_avatar_tag(self):
+        self.upload(make_image())
+        profile = Profile.objects.get(pk=self.profile.pk)
+        html = Template('{% load avatars %}{% avatar profile 64 %}').render(Context({'profile': profile}))
+        self.assertIn(thumbnails.variant_name(profile.avatar_digest, 64, 'jpeg'), html)
+        self.assertIn(thumbnails.variant_name(profile.avatar_digest, 200, 'jpeg') + ' 2x', html)
+
+        html = Template('{% load avatars %}{% avatar profile %}').render(Context({'profile': self.profile}))
+        self.assertIn('default.png', html)
+
+    def test_generate_avatars_command(self):
+        name = default_storage.save('photo.png', io.BytesIO(make_image(image_format='PNG')))
+        Profile.objects.filter(pk=self.profile.pk).update(profile_image=name)
+
+        call_command('generate_avatars', '--workers', '1', stdout=io.StringIO())
+        profile = Profile.objects.get(pk=self.profile.pk)
+        self.assertTrue(profile.avatar_digest)
+        self.assertTrue(default_storage.exists(thumbnails.variant_name(profile.avatar_digest, 400, 'jpeg')))
@@ -0,0 +1,111 @@
+import datetime
+import io
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, Client, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from main_crm.models import Company, Project, Interaction, UploadBlob
+from main_crm.uploads import ContentAddressedStorage
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def make_image(size=(300, 200), image_format='PNG'):
+    content = io.BytesIO()
+    Image.new('RGB', size, (30, 30, 200)).save(content, image_format)
+    return content.getvalue()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class ContentAddressedStorageTest(TestCase):
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_superuser(username='GGGGGG', password='qweqweqweqwe')
+        self.client.login(username='GGGGGG', password='qweqweqweqwe')
+        company = Company.objects.create(company_name='Company1', slug='company1', fio='Nikhil Estes')
+        self.project = Project.objects.create(user=company, title='Project1', started_at=datetime.date(1991, 12, 21))
+
+    def upload(self, content, name='logo.png'):
+        response = self.client.post(reverse('ckeditor_upload'), {
+            'upload': SimpleUploadedFile(name, content, content_type='image/png'),
+        })
+        self.assertEquals(response.status_code, 200)
+        return response.json()['url']
+
+    def test_identical_uploads_stored_once(self):
+        content = make_image()
+        first = self.upload(content, 'logo.png')
+        second = self.upload(content, 'other name.png')
+        self.assertEquals(first, second)
+        self.assertRegex(first, r'^/media/uploads/[0-9a-f]{2}/[0-9a-f]{64}\.png$')
+
+        blob = UploadBlob.objects.get()
+        self.assertEquals(blob.size, len(content))
+        self.assertEquals(os.listdir(os.path.join(MEDIA_ROOT, os.path.dirname(blob.name))),
+                          [os.path.basename(blob.name)])
+
+    def test_oversized_image_downscaled(self):
+        url = self.upload(make_image((3000, 1000)))
+        with Image.open(os.path.join(MEDIA_ROOT, url[len('/media/'):])) as image:
+            self.assertEquals(image.size, (ContentAddressedStorage.max_image_size, 667))
+
+    def test_reference_counts(self):
+        url = self.upload(make_image())
+        description = f'<p><img src="{url}"></p>'
+        first = Interaction.objects.create(project=self.project, channel='r', manager=self.user, mark='3',
+                                           description=description)
+        second = Interaction.objects.create(project=self.project, channel='r', manager=self.user, mark='3',
+                                            description=description + description)
+        self.assertEquals(UploadBlob.objects.get().ref_count, 2)
+
+        first.description = '<p>Без изображения</p>'
+        first.save()
+        self.assertEquals(UploadBlob.objects.get().ref_count, 1)
+
+        second.delete()
+        self.assertEquals(UploadBlob.objects.get().ref_count, 0)
+
+        UploadBlob.objects.update(ref_count=5)
+        call_command('collect_uploads', '--recount', '--dry-run', stdout=io.StringIO())
+        self.assertEquals(UploadBlob.objects.get().ref_count, 0)
+
+    def test_reupload_extends_grace_period(self):
+        content = make_image((10, 10))
+        url = self.upload(content)
+        UploadBlob.objects.update(created_at=timezone.now() - timedelta(days=2),
+                                  last_uploaded_at=timezone.now() - timedelta(days=2))
+        self.assertEquals(self.upload(content), url)
+
+        call_command('collect_uploads', stdout=io.StringIO())
+        self.assertEquals(UploadBlob.objects.get().name, url[len('/media/'):])
+        self.assertTrue(os.path.exists(os.path.join(MEDIA_ROOT, url[len('/media/'):])))
+
+    def test_collect_removes_orphans(self):
+        orphan_url = self.upload(make_image((10, 10)))
+        used_url = self.upload(make_image((20, 20)))
+        Interaction.objects.create(project=self.project, channel='r', manager=self.user, mark='3',
+                                   description=f'<img src="{used_url}">')
+        recent_url = self.upload(make_image((30, 30)))
+        UploadBlob.objects.exclude(name=recent_url[len('/media/'):]).update(
+            created_at=timezone.now() - timedelta(days=2), last_uploaded_at=timezone.now() - timedelta(days=2))
+
+        call_command('collect_uploads', stdout=io.StringIO())
+        self.assertQuerysetEqual(UploadBlob.objects.order_by('name').values_list('name', flat=True),
+                                 sorted(url[len('/media/'):] for url in (used_url, recent_url)))
+        self.assertFalse(os.path.exists(os.path.join(MEDIA_ROOT, orphan_url[len('/media/'):])))
+        self.assertTrue(os.path.exists(os.path.join(MEDIA_ROOT, used_url[len('/media/'):])))
@@ -1,5 +1,7 @@
 from django.contrib.auth.models import User
+from django.db import connection
 from django.test import TestCase, Client
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 import datetime
 
@@ -19,6 +21,32 @@ class CompanyListViewTest(TestCase):
         self.assertEquals(response.status_code, 200)
         self.assertTemplateUsed(response, 'cms_mainpage/list_page.html')
 
+    def test_company_list_cursor_pagination(self):
+        Company.objects.bulk_create([
+            Company(company_name=f'Company{i}', slug=f'company{i}', fio='Nikhil Estes') for i in range(10)
+        ])
+        self.client.login(username='GGGGGG', password='qweqweqweqwe')
+
+        seen = []
+        response = self.client.get(self.index_url, {'sort_by': 'company_name'})
+        seen += [company.company_name for company in response.context['company_list']]
+        self.assertFalse(response.context['page_obj'].has_previous())
+        while response.context['page_obj'].has_next():
+            cursor = response.context['page_obj'].next_cursor
+            response = self.client.get(self.index_url, {'sort_by': 'company_name', 'cursor': cursor})
+            seen += [company.company_name for company in response.context['company_list']]
+
+        self.assertEquals(seen, sorted(f'Company{i}' for i in range(10)))
+
+        previous_cursor = response.context['page_obj'].previous_cursor
+        response = self.client.get(self.index_url, {'sort_by': 'company_name', 'cursor': previous_cursor})
+        self.assertEquals([company.company_name for company in response.context['company_list']], seen[4:8])
+
+    def test_company_list_invalid_cursor(self):
+        self.client.login(username='GGGGGG', password='qweqweqweqwe')
+        response = self.client.get(self.index_url, {'cursor': 'broken'})
+        self.assertEquals(response.status_code, 404)
+
 
 class CompanyDetailViewTest(TestCase):
 
@@ -215,6 +243,21 @@ class AllProjectsListViewTest(TestCase):
         self.assertEquals(response.status_code, 200)
         self.assertTemplateUsed(response, 'cms_mainpage/all-projects.html')
 
+    def test_all_project_list_is_paginated(self):
+        company = Company.objects.create(company_name='Company1', slug='company1', fio='Nikhil Estes')
+        Project.objects.bulk_create([
+            Project(user=company, title=f'Project{i}', started_at=datetime.date(2000, 1, i + 1)) for i in range(6)
+        ])
+        self.client.login(username='GGGGGG', password='qweqweqweqwe')
+
+        response = self.client.get(self.all_projects_list_url)
+        self.assertEquals(len(response.context['project_list']), 4)
+        self.assertEquals(response.context['project_list'][0].title, 'Project5')
+
+        response = self.client.get(self.all_projects_list_url, {'cursor': response.context['page_obj'].next_cursor})
+        self.assertEquals([project.title for project in response.context['project_list']], ['Project1', 'Project0'])
+        self.assertFalse(response.context['page_obj'].has_next())
+
 
 class ProjectDetailViewTest(TestCase):
 
@@ -336,6 +379,14 @@ class ProjectUpdateViewTest(TestCase):
         self.redirect_url = reverse('project-detail', args=['1'])
         self.user = User.objects.create_superuser(username='GGGGGG', password='qweqweqweqwe')
 
+    def test_project_update_form_outside_transaction(self):
+        # Транзакция (BEGIN IMMEDIATE) берет блокировку записи, поэтому форма открывается без нее
+        self.client.login(username='GGGGGG', password='qweqweqweqwe')
+        for url in (self.projects_update_url, reverse('project-delete', args=['1'])):
+            with CaptureQueriesContext(connection) as context:
+                self.assertEquals(self.client.get(url).status_code, 200)
+            self.assertFalse([query for query in context.captured_queries if 'SAVEPOINT' in query['sql']])
+
     def test_project_update_data(self):
         self.client.login(username='GGGGGG', password='qweqweqweqwe')
         response = self.client.post(self.projects_update_url, {
@@ -466,6 +517,21 @@ class CompanyInteractionListViewTest(TestCase):
         self.assertEquals(response.status_code, 200)
         self.assertTemplateUsed(response, 'cms_mainpage/company_interaction_list_page.html')
 
+    def test_company_interaction_list_is_paginated(self):
+        Interaction.objects.bulk_create([
+            Interaction(project=self.project, channel='w', manager=self.user, description=f'Desc{i}', mark='3')
+            for i in range(5)
+        ])
+        self.client.login(username='GGGGGG', password='qweqweqweqwe')
+
+        response = self.client.get(self.company_interactions_list_url)
+        self.assertEquals(len(response.context['object_list']), 4)
+
+        response = self.client.get(self.company_interactions_list_url,
+                                   {'cursor': response.context['page_obj'].next_cursor})
+        self.assertEquals(len(response.context['object_list']), 2)
+        self.assertTrue(response.context['page_obj'].has_previous())
+
 
 class InteractionCreateViewTest(TestCase):
 
@@ -631,6 +697,26 @@ class AllInteractionListViewTest(TestCase):
         self.assertEquals(response.status_code, 200)
         self.assertTemplateUsed(response, 'cms_mainpage/all_interaction_list.html')
 
+    def test_all_interaction_list_cursor_with_filter(self):
+        Interaction.objects.bulk_create([
+            Interaction(project=self.project, channel='w' if i % 2 else 'l', manager=self.user,
+                        description=f'Desc{i}', mark='3') for i in range(10)
+        ])
+        self.client.login(username='GGGGGG', password='qweqweqweqwe')
+
+        response = self.client.get(self.all_interactions_url, {'channel': 'w'})
+        first_page = list(response.context['object_list'])
+        self.assertIn('&channel=w', response.context['params_string'])
+
+        cursor = response.context['page_obj'].next_cursor
+        response = self.client.get(self.all_interactions_url, {'channel': 'w', 'cursor': cursor})
+        second_page = list(response.context['object_list'])
+
+        self.assertEquals(len(first_page) + len(second_page), 5)
+        self.assertFalse(response.context['page_obj'].has_next())
+        self.assertTrue(all(interaction.channel == 'w' for interaction in first_page + second_page))
+        self.assertFalse(set(first_page) & set(second_page))
+
 
 # class UpdateUserViewTest(TestCase):
 #
@@ -643,6 +729,45 @@ class AllInteractionListViewTest(TestCase):
 #         self.client.login(username='GGGGGG', password='qweqweqweqwe')
 
 
+class UserInteractionListViewTest(TestCase):
+
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_superuser(username='GGGGGG', password='qweqweqweqwe')
+        self.url = reverse('manager-profile')
+        for i in range(5):
+            company = Company.objects.create(company_name=f'Company{i}', slug=f'company{i}', fio='Nikhil Estes')
+            for j in range(2):
+                project = Project.objects.create(user=company, title=f'Project{i}-{j}',
+                                                 started_at=datetime.date(1991, 12, 21))
+                Interaction.objects.bulk_create([
+                    Interaction(project=project, channel='w', manager=self.user, description=f'<p>Desc{k}</p>',
+                                mark='3')
+                    for k in range(3)
+                ])
+
+    def test_company_tree(self):
+        self.client.login(username='GGGGGG', password='qweqweqweqwe')
+        response = self.client.get(self.url)
+        self.assertEquals(response.status_code, 200)
+
+        tree = response.context['company_tree']
+        self.assertEquals([node['company'].company_name for node in tree],
+                          ['Company0', 'Company1', 'Company2', 'Company3'])
+        self.assertEquals(len(tree[0]['projects']), 2)
+        self.assertEquals(len(tree[0]['projects'][0]['interactions']), 3)
+        self.assertTrue(response.context['is_paginated'])
+
+        response = self.client.get(self.url, {'cursor': response.context['page_obj'].next_cursor})
+        self.assertEquals([node['company'].company_name for node in response.context['company_tree']],
+                          ['Company4'])
+
+    def test_query_count_does_not_depend_on_interactions(self):
+        self.client.login(username='GGGGGG', password='qweqweqweqwe')
+        with self.assertNumQueries(5):
+            self.client.get(self.url)
+
+
 class UserPasswordChangeViewTest(TestCase):
 
     def setUp(self):
@@ -0,0 +1,139 @@
+"""
+Уменьшенные копии аватаров (Profile.profile_image).
+При загрузке аватара строятся варианты размеров SIZES в форматах WebP (если Pillow собран с WebP)
+и JPEG без метаданных. Варианты хранятся под именем хеша содержимого исходного файла,
+поэтому повторная загрузка того же изображения не создает новых файлов.
+Шаблоны выбирают вариант тегом {% avatar %} (main_crm.templatetags.avatars).
+"""
+import hashlib
+import io
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps, UnidentifiedImageError, features
+
+THUMBNAIL_DIR = 'avatars'
+
+SIZES = (64, 200, 400)
+
+JPEG_QUALITY = 85
+WEBP_QUALITY = 80
+
+HASH_CHUNK_SIZE = 64 * 1024
+
+
+def get_formats() -> tuple:
+    """
+    Возвращает форматы вариантов в порядке предпочтения
+    :return:
+    """
+    return ('webp', 'jpeg') if features.check('webp') else ('jpeg',)
+
+
+def variant_name(digest: str, size: int, image_format: str) -> str:
+    return f'{THUMBNAIL_DIR}/{digest[:2]}/{digest}/{size}.{image_format}'
+
+
+def hash_file(file) -> str:
+    """
+    Хеш содержимого файла, читаемого блоками
+    :param file:
+    :return:
+    """
+    digest = hashlib.sha256()
+    file.seek(0)
+    for chunk in iter(lambda: file.read(HASH_CHUNK_SIZE), b''):
+        digest.update(chunk)
+    file.seek(0)
+    return digest.hexdigest()
+
+
+def render_variant(image: Image.Image, size: int, image_format: str) -> bytes:
+    """
+    Уменьшает изображение до size пикселей по большей стороне и кодирует его без метаданных
+    :param image:
+    :param size:
+    :param image_format:
+    :return:
+    """
+    variant = image.copy()
+    variant.thumbnail((size, size), Image.LANCZOS)
+    output = io.BytesIO()
+    if image_format == 'webp':
+        variant.save(output, 'WEBP', quality=WEBP_QUALITY, method=4)
+    else:
+        if variant.mode != 'RGB':
+            background = Image.new('RGB', variant.size, (255, 255, 255))
+            background.paste(variant, mask=variant.getchannel('A') if 'A' in variant.getbands() else None)
+            variant = background
+        variant.save(output, 'JPEG', quality=JPEG_QUALITY, optimize=True, progressive=True)
+    return output.getvalue()
+
+
+def generate_variants(file, storage=default_storage) -> tuple:
+    """
+    Строит варианты изображения, если их еще нет в хранилище
+    :param file: Открытый файл изображения
+    :param storage:
+    :return: (хеш содержимого, форматы через запятую)
+    """
+    digest = hash_file(file)
+    formats = get_formats()
+    names = {(size, image_format): variant_name(digest, size, image_format)
+             for size in SIZES for image_format in formats}
+    missing = {key: name for key, name in names.items() if not storage.exists(name)}
+
+    if missing:
+        image = Image.open(file)
+        # Для JPEG декодер сразу уменьшает изображение в 2-8 раз, если это не меньше нужного размера
+        image.draft('RGB', (max(SIZES), max(SIZES)))
+        image = ImageOps.exif_transpose(image)
+        image = image.convert('RGBA' if 'A' in image.getbands() or 'transparency' in image.info else 'RGB')
+        for (size, image_format), name in missing.items():
+            storage.save(name, ContentFile(render_variant(image, size, image_format)))
+        file.seek(0)
+    return digest, ','.join(formats)
+
+
+def process_avatar(name: str) -> tuple:
+    """
+    Строит варианты аватара по имени файла в хранилище (для пула процессов)
+    :param name:
+    :return: (имя файла, хеш, форматы) или (имя файла, None, текст ошибки)
+    """
+    try:
+        with default_storage.open(name, 'rb') as file:
+            return (name, *generate_variants(file))
+    except (OSError, ValueError, UnidentifiedImageError, Image.DecompressionBombError) as e:
+        return name, None, str(e)
+
+
+def update_avatar(profile):
+    """
+    Строит варианты нового аватара профиля перед сохранением
+    :param profile:
+    :return:
+    """
+    image = profile.profile_image
+    if not image:
+        profile.avatar_digest, profile.avatar_formats = '', ''
+        return
+    if image._committed:
+        return
+    try:
+        profile.avatar_digest, profile.avatar_formats = generate_variants(image.file)
+    except (OSError, ValueError, UnidentifiedImageError, Image.DecompressionBombError):
+        profile.avatar_digest, profile.avatar_formats = '', ''
+
+
+def get_variant_url(digest: str, size: int, image_format: str, storage=default_storage) -> str:
+    return storage.url(variant_name(digest, size, image_format))
+
+
+def pick_size(size: int) -> int:
+    """
+    Возвращает наименьший размер варианта, не меньший запрошенного
+    :param size:
+    :return:
+    """
+    return next((variant for variant in SIZES if variant >= size), SIZES[-1])
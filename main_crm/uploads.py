@@ -0,0 +1,208 @@
+"""
+Хранилище файлов CKEditor с адресацией по содержимому.
+Файл записывается во временный файл блоками с одновременным подсчетом SHA-256 (целиком в память
+не загружается), при необходимости уменьшается и сохраняется один раз под именем
+uploads/<2 символа хеша>/<хеш>.<расширение>. Повторная загрузка того же содержимого возвращает
+уже существующий файл.
+Каждый файл учитывается в UploadBlob; ref_count - количество описаний Company/Project/Interaction,
+которые на него ссылаются. Счетчики поддерживаются сигналами (main_crm.signals), а команда
+collect_uploads удаляет файлы без ссылок.
+"""
+import hashlib
+import os
+import re
+import tempfile
+from collections import Counter
+
+from django.apps import apps as global_apps
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.db.models import F
+from django.utils import timezone
+from PIL import Image, UnidentifiedImageError
+
+UPLOAD_PATH = getattr(settings, 'CKEDITOR_UPLOAD_PATH', 'uploads/')
+
+# Изображения, у которых большая сторона больше этого размера, уменьшаются при загрузке; None - не уменьшать
+MAX_IMAGE_SIZE = 2000
+
+DOWNSCALE_FORMATS = {'.jpg': 'JPEG', '.jpeg': 'JPEG', '.png': 'PNG', '.webp': 'WEBP'}
+
+REFERENCED_MODELS = ('Company', 'Project', 'Interaction')
+
+BLOB_NAME_RE = re.compile(rf'{re.escape(UPLOAD_PATH)}[0-9a-f]{{2}}/[0-9a-f]{{64}}\.\w+')
+
+# Миниатюры, которые строит CKEDITOR_IMAGE_BACKEND для окна выбора файлов, сохраняются под именем файла
+THUMBNAIL_NAME_RE = re.compile(rf'{re.escape(UPLOAD_PATH)}[0-9a-f]{{2}}/[0-9a-f]{{64}}_thumb\.\w+')
+
+
+def blob_name(digest: str, extension: str) -> str:
+    return f'{UPLOAD_PATH}{digest[:2]}/{digest}{extension}'
+
+
+def hash_path(path: str) -> tuple:
+    """
+    Хеш и размер файла на диске, читаемого блоками
+    :param path:
+    :return:
+    """
+    digest = hashlib.sha256()
+    size = 0
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(64 * 1024), b''):
+            digest.update(chunk)
+            size += len(chunk)
+    return digest.hexdigest(), size
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Файловое хранилище MEDIA_ROOT, которое сохраняет каждое содержимое один раз под его хешем
+    """
+    max_image_size = MAX_IMAGE_SIZE
+
+    def get_available_name(self, name, max_length=None):
+        """
+        Имя определяется содержимым в _save, поэтому существующий файл с тем же именем не конфликт
+        :param name:
+        :param max_length:
+        :return:
+        """
+        return name
+
+    def write_temporary(self, content, directory: str) -> tuple:
+        """
+        Записывает содержимое во временный файл рядом с местом хранения, считая хеш по блокам
+        :param content:
+        :param directory:
+        :return: (путь, хеш, размер)
+        """
+        digest = hashlib.sha256()
+        size = 0
+        with tempfile.NamedTemporaryFile(dir=directory, prefix='.upload-', delete=False) as temporary:
+            if hasattr(content, 'seek'):
+                content.seek(0)
+            for chunk in content.chunks():
+                digest.update(chunk)
+                size += len(chunk)
+                temporary.write(chunk)
+        return temporary.name, digest.hexdigest(), size
+
+    def downscale(self, path: str, extension: str):
+        """
+        Уменьшает изображение больше max_image_size (без метаданных)
+        :param path:
+        :param extension:
+        :return: Путь к уменьшенному временному файлу или None, если уменьшать не нужно
+        """
+        image_format = DOWNSCALE_FORMATS.get(extension)
+        if not self.max_image_size or not image_format:
+            return None
+        try:
+            with Image.open(path) as image:
+                if max(image.size) <= self.max_image_size or getattr(image, 'is_animated', False):
+                    return None
+                image.draft(image.mode, (self.max_image_size, self.max_image_size))
+                image.thumbnail((self.max_image_size, self.max_image_size), Image.LANCZOS)
+                if image_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+                    image = image.convert('RGB')
+                with tempfile.NamedTemporaryFile(dir=os.path.dirname(path), prefix='.upload-',
+                                                 delete=False) as temporary:
+                    image.save(temporary, image_format, quality=85, optimize=True)
+                return temporary.name
+        except (OSError, UnidentifiedImageError, Image.DecompressionBombError):
+            return None
+
+    def _save(self, name, content):
+        """
+        Сохраняет содержимое под его хешем и регистрирует файл в UploadBlob
+        :param name: Имя, предложенное CKEditor (используется только расширение)
+        :param content:
+        :return: Имя сохраненного файла
+        """
+        if THUMBNAIL_NAME_RE.fullmatch(name):
+            return name if self.exists(name) else super()._save(name, content)
+
+        directory = self.path(UPLOAD_PATH)
+        os.makedirs(directory, exist_ok=True)
+        extension = os.path.splitext(name)[1].lower()
+
+        path, digest, size = self.write_temporary(content, directory)
+        try:
+            downscaled = self.downscale(path, extension)
+            if downscaled:
+                os.remove(path)
+                path = downscaled
+                digest, size = hash_path(path)
+
+            name = blob_name(digest, extension)
+            full_path = self.path(name)
+            if os.path.exists(full_path):
+                os.remove(path)
+            else:
+                os.makedirs(os.path.dirname(full_path), exist_ok=True)
+                os.replace(path, full_path)
+                os.chmod(full_path, self.file_permissions_mode or 0o644)
+        except BaseException:
+            if os.path.exists(path):
+                os.remove(path)
+            raise
+
+        UploadBlob = global_apps.get_model('main_crm', 'UploadBlob')
+        # Повторная загрузка файла без ссылок продлевает срок, после которого collect_uploads его удаляет
+        UploadBlob.objects.update_or_create(
+            name=name, defaults={'digest': digest, 'size': size, 'last_uploaded_at': timezone.now()},
+        )
+        return name
+
+
+def get_references(value: str) -> set:
+    """
+    Возвращает имена файлов хранилища, на которые ссылается rich-text описание
+    :param value:
+    :return:
+    """
+    return set(BLOB_NAME_RE.findall(value or ''))
+
+
+def change_ref_counts(names, delta: int):
+    if names:
+        global_apps.get_model('main_crm', 'UploadBlob').objects.filter(name__in=names).update(
+            ref_count=F('ref_count') + delta
+        )
+
+
+def update_references(old_value: str, new_value: str):
+    """
+    Изменяет счетчики ссылок по разнице ссылок старого и нового описания
+    :param old_value:
+    :param new_value:
+    :return:
+    """
+    old, new = get_references(old_value), get_references(new_value)
+    change_ref_counts(new - old, 1)
+    change_ref_counts(old - new, -1)
+
+
+def recount_references(apps=global_apps, batch_size: int = 1000) -> int:
+    """
+    Полный пересчет счетчиков ссылок по всем описаниям
+    :param apps:
+    :param batch_size:
+    :return: Количество файлов, у которых изменился счетчик
+    """
+    counts = Counter()
+    for model_name in REFERENCED_MODELS:
+        model = apps.get_model('main_crm', model_name)
+        descriptions = model.objects.filter(description__contains=UPLOAD_PATH).values_list('description', flat=True)
+        for description in descriptions.iterator(chunk_size=batch_size):
+            counts.update(get_references(description))
+
+    UploadBlob = apps.get_model('main_crm', 'UploadBlob')
+    changed = []
+    for blob in UploadBlob.objects.only('pk', 'name', 'ref_count').iterator(chunk_size=batch_size):
+        if blob.ref_count != counts[blob.name]:
+            blob.ref_count = counts[blob.name]
+            changed.append(blob)
+    UploadBlob.objects.bulk_update(changed, ['ref_count'], batch_size=batch_size)
+    return len(changed)
@@ -28,7 +28,16 @@ urlpatterns = [
     path('', views.CompanyListView.as_view(), name='index'),
     path('all-projects/', views.AllProjectsListView.as_view(), name='all-projects'),
     path('create/', views.CompanyCreateView.as_view(), name='company-create'),
+    path('import/', views.CompanyImportView.as_view(), name='company-import'),
     path('all-interactions/', views.AllInteractionListView.as_view(), name='all-interaction-list'),
+    path('analytics/', views.AnalyticsView.as_view(), name='analytics'),
+    path('analytics/data/', views.AnalyticsDataView.as_view(), name='analytics-data'),
+    path('cache/stats/', views.CacheStatsView.as_view(), name='cache-stats'),
+    path('timing/stats/', views.TimingStatsView.as_view(), name='timing-stats'),
+    path('db/stats/', views.DatabaseStatsView.as_view(), name='db-stats'),
+    path('profiles/', views.ProfileListView.as_view(), name='profiles'),
+    path('profiles/<str:name>/', views.ProfileFileView.as_view(), name='profile-file'),
+    path('export/<str:name>/', views.ExportView.as_view(), name='export'),
     path('profile/update/', views.UpdateUserView.as_view(), name='profile-update'),
     path('projects/<int:pk>/update/', views.ProjectUpdateView.as_view(), name='project-update'),
     path('project/<int:pk>/', views.ProjectDetailView.as_view(), name='project-detail'),
@@ -1,6 +1,18 @@
+import html
+
 from unidecode import unidecode
+from django.utils.html import strip_tags
 from django.utils.text import slugify as dj_slugify
 
 
 def slugify(value):
     return dj_slugify(unidecode(value))
+
+
+def html_to_text(value):
+    """
+    Преобразует rich-text (HTML из CKEditor) в простой текст с одиночными пробелами
+    :param value:
+    :return:
+    """
+    return ' '.join(html.unescape(strip_tags((value or '').replace('<', ' <'))).split())
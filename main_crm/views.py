@@ -1,21 +1,36 @@
 import copy
+import datetime
+import os
 from django.contrib.auth import logout
 from django.contrib.auth.forms import AuthenticationForm
 from django.contrib.auth.views import PasswordChangeView, LoginView
-from django.http import HttpResponseRedirect
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponseRedirect, JsonResponse, StreamingHttpResponse, Http404, FileResponse
 from django.contrib import messages
+from django.db import transaction
 from django.shortcuts import redirect
 from django.urls import reverse_lazy
-from django.views.generic.base import TemplateView
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from django.utils.decorators import method_decorator
+from django.views.generic.base import TemplateView, View
 from django_filters.views import FilterView
-from django.views.generic import DetailView, ListView, CreateView, UpdateView, DeleteView
+from django.views.generic import DetailView, ListView, CreateView, UpdateView, DeleteView, FormView
 from .forms import CompanyForm, ProjectForm, InteractionForm, ProfileForm, UserForm, \
-    CreateEmailFormSet, CreatePhoneFormSet, UpdateEmailFormSet, UpdatePhoneFormSet, CreateUserForm, ResetPasswordForm
+    CreateEmailFormSet, CreatePhoneFormSet, UpdateEmailFormSet, UpdatePhoneFormSet, CreateUserForm, ResetPasswordForm, \
+    CompanyImportForm
 from .models import Company, Project, Interaction, User, Phone, Email, Profile
 from .const import INDEX_PAGINATE_BY
 from .filters import CompanyFilter, InteractionFilter
 from .utils import slugify
+from . import analytics, caching, export, importer, instrumentation, profiling
 from .permissions import SuperUserRequired, OwnerRequired
+from .pagination import CursorPaginationMixin
+from .caching import CachedPageMixin
+from .conditional import ConditionalGetMixin
+from .identity import IdentityMapMixin, get_object_or_404
+from .mixins import QueryPlanMixin, rich_text_fields
+from .backends.sqlite3 import base as sqlite_backend
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.auth.views import PasswordResetView
 
@@ -33,18 +48,21 @@ r"""
                                      
 """
 from django.core.handlers.wsgi import WSGIRequest
-from django.db.models import QuerySet
+from django.db.models import Count, Max, QuerySet
 from django.http import HttpResponse
 
 
-class CompanyListView(LoginRequiredMixin, FilterView):
+class CompanyListView(LoginRequiredMixin, ConditionalGetMixin, CachedPageMixin, CursorPaginationMixin, QueryPlanMixin,
+                      FilterView):
     """
-    Контроллер для вывода списка компаний на главной странице
+    Контроллер для вывода списка компаний на главной странице, страницы списка кешируются
     """
     queryset = Company.objects.all()
+    defer_fields = rich_text_fields('')
     template_name = 'cms_mainpage/list_page.html'
     paginate_by = INDEX_PAGINATE_BY
     filterset_class = CompanyFilter
+    signature_fields = ('updated_at',)
 
     def get_context_data(self, *args, **kwargs) -> dict:
         """
@@ -58,13 +76,39 @@ class CompanyListView(LoginRequiredMixin, FilterView):
         return super().get_context_data(*args, sort_by_param=sort_by_param, **kwargs)
 
 
-class CompanyDetailView(LoginRequiredMixin, DetailView):
+class CompanyDetailView(LoginRequiredMixin, ConditionalGetMixin, IdentityMapMixin, QueryPlanMixin, DetailView):
     """
-    Контроллер для вывода детальной информации о компании
+    Контроллер для вывода детальной информации о компании.
+    Карточка, контакты и проекты выводятся кешированными фрагментами, поэтому связанные записи
+    запрашиваются из шаблона только при промахе кеша
     """
     queryset = Company.objects.all()
+    defer_fields = ('description',)
     template_name = 'cms_mainpage/detail_page.html'
 
+    def get_etag_parts(self):
+        """
+        Метод для получения времени изменения компании и ее проектов и версии ее фрагментов (контакты)
+        :return:
+        """
+        row = Company.objects.filter(slug=self.kwargs['slug']).annotate(
+            projects=Count('project'), projects_updated_at=Max('project__updated_at'),
+        ).values_list('pk', 'updated_at', 'projects', 'projects_updated_at').first()
+        if row is None:
+            return None
+        pk, *updated = row
+        return [*updated, caching.get_version(caching.object_namespace('company', pk))]
+
+    def get_context_data(self, **kwargs) -> dict:
+        """
+        Метод для передачи в контекст ленивого списка проектов компании
+        :param kwargs:
+        :return:
+        """
+        context = super().get_context_data(**kwargs)
+        context['projects'] = self.object.project_set.only('pk', 'title', 'user_id').order_by('-started_at', 'pk')
+        return context
+
 
 class CompanyCreateView(LoginRequiredMixin, SuperUserRequired, CreateView):
     """
@@ -139,7 +183,7 @@ class CompanyCreateView(LoginRequiredMixin, SuperUserRequired, CreateView):
         return super().get_context_data(**kwargs)
 
 
-class CompanyDeleteForm(LoginRequiredMixin, SuperUserRequired, DeleteView):
+class CompanyDeleteForm(LoginRequiredMixin, SuperUserRequired, IdentityMapMixin, DeleteView):
     """
     Контроллер для удаления модели Company и связанных с ней Email и Phone
     """
@@ -150,7 +194,7 @@ class CompanyDeleteForm(LoginRequiredMixin, SuperUserRequired, DeleteView):
     raise_exception = True
 
 
-class CompanyUpdateView(LoginRequiredMixin, SuperUserRequired, UpdateView):
+class CompanyUpdateView(LoginRequiredMixin, SuperUserRequired, IdentityMapMixin, UpdateView):
     """
     Контроллер для обновления данных модели Company и связанных с ней Email и Phone
     """
@@ -217,18 +261,20 @@ class CompanyUpdateView(LoginRequiredMixin, SuperUserRequired, UpdateView):
         :return:
         """
         if self.request.method == 'GET':
-            company = self.get_object()
-            kwargs['email_form'] = UpdateEmailFormSet(instance=company)
-            kwargs['phone_form'] = UpdatePhoneFormSet(instance=company)
+            kwargs['email_form'] = UpdateEmailFormSet(instance=self.object)
+            kwargs['phone_form'] = UpdatePhoneFormSet(instance=self.object)
 
         return super().get_context_data(**kwargs)
 
 
-class ProjectListView(LoginRequiredMixin, ListView):
+class ProjectListView(LoginRequiredMixin, ConditionalGetMixin, QueryPlanMixin, ListView):
     """
     Контроллер для вывода списка проектов конкретной компании
     """
+    queryset = Project.objects.all()
     context_object_name = 'projects'
+    defer_fields = rich_text_fields('')
+    signature_fields = ('updated_at',)
     template_name = 'cms_mainpage/project_list_page.html'
 
     def get_queryset(self) -> QuerySet[Project]:
@@ -236,7 +282,7 @@ class ProjectListView(LoginRequiredMixin, ListView):
         Метод для возврата списка проектов конкретной компании
         :return:
         """
-        return Project.objects.filter(user__slug=self.kwargs['slug'])
+        return super().get_queryset().filter(user__slug=self.kwargs['slug'])
 
     def get_context_data(self, *args, **kwargs) -> dict:
         """
@@ -250,28 +296,39 @@ class ProjectListView(LoginRequiredMixin, ListView):
         return context
 
 
-class AllProjectsListView(LoginRequiredMixin, ListView):
+class AllProjectsListView(LoginRequiredMixin, ConditionalGetMixin, CursorPaginationMixin, QueryPlanMixin, ListView):
     """
     Контроллер для вывода всех существующих проектов
     """
+    queryset = Project.objects.all()
     template_name = 'cms_mainpage/all-projects.html'
-
-    def get_queryset(self) -> QuerySet[Project]:
-        """
-        Метод для возврата списка всех проектов
-        :return:
-        """
-        return Project.objects.all()
+    paginate_by = INDEX_PAGINATE_BY
+    select_related = ('user',)
+    defer_fields = rich_text_fields('', 'user')
+    signature_fields = ('updated_at', 'user__updated_at')
 
 
-class ProjectDetailView(LoginRequiredMixin, SuperUserRequired, DetailView):
+class ProjectDetailView(LoginRequiredMixin, SuperUserRequired, ConditionalGetMixin, IdentityMapMixin,
+                        QueryPlanMixin, DetailView):
     """
     Контроллер для вывода детальной информации о проекте
     """
     queryset = Project.objects.all()
+    defer_fields = ('description',)
     template_name = 'cms_mainpage/project_detail.html'
 
+    def get_etag_parts(self):
+        """
+        Метод для получения даты изменения проекта и версии его фрагментов
+        :return:
+        """
+        updated_at = Project.objects.filter(pk=self.kwargs['pk']).values_list('updated_at', flat=True).first()
+        if updated_at is None:
+            return None
+        return [updated_at, caching.get_version(caching.object_namespace('project', self.kwargs['pk']))]
+
 
+@method_decorator(transaction.atomic, name='post')
 class ProjectCreateView(LoginRequiredMixin, SuperUserRequired, CreateView):
     """
     Контроллер для создания проекта
@@ -288,19 +345,22 @@ class ProjectCreateView(LoginRequiredMixin, SuperUserRequired, CreateView):
         :return:
         """
         self.object = project = form.save(commit=False)
-        project.user = Company.objects.get(slug=self.kwargs['slug'])
+        project.user = get_object_or_404(self.request, Company.objects.only('pk', 'slug'), slug=self.kwargs['slug'])
         project.save()
         messages.success(self.request, 'Проект создан')
         return HttpResponseRedirect(self.get_success_url())
 
 
-class ProjectDeleteForm(LoginRequiredMixin, SuperUserRequired, DeleteView):
+@method_decorator(transaction.atomic, name='post')
+class ProjectDeleteForm(LoginRequiredMixin, SuperUserRequired, IdentityMapMixin, QueryPlanMixin, DeleteView):
     """
     Контроллер для удаления модели Project
     """
     queryset = Project.objects.all()
     template_name = 'cms_mainpage/project_delete.html'
     raise_exception = True
+    select_related = ('user',)
+    defer_fields = rich_text_fields('user')
 
     def get_success_url(self):
         """
@@ -312,7 +372,8 @@ class ProjectDeleteForm(LoginRequiredMixin, SuperUserRequired, DeleteView):
         return success_url
 
 
-class ProjectUpdateView(LoginRequiredMixin, SuperUserRequired, UpdateView):
+@method_decorator(transaction.atomic, name='post')
+class ProjectUpdateView(LoginRequiredMixin, SuperUserRequired, IdentityMapMixin, UpdateView):
     """
     Контроллер для обновления информации модели Project
     """
@@ -322,13 +383,16 @@ class ProjectUpdateView(LoginRequiredMixin, SuperUserRequired, UpdateView):
     raise_exception = True
 
 
-class InteractionListView(LoginRequiredMixin, SuperUserRequired, ListView):
+class InteractionListView(LoginRequiredMixin, SuperUserRequired, ConditionalGetMixin, QueryPlanMixin, ListView):
     """
     Контроллер для вывода списка всех взаимодействий
     """
     template_name = 'cms_mainpage/interaction_list_page.html'
     paginate_by = INDEX_PAGINATE_BY
     queryset = Interaction.objects.all()
+    select_related = ('project', 'manager')
+    defer_fields = rich_text_fields('', 'project')
+    signature_fields = ('updated_at',)
 
     def get_queryset(self) -> QuerySet[Interaction]:
         """
@@ -348,28 +412,52 @@ class InteractionListView(LoginRequiredMixin, SuperUserRequired, ListView):
         return context
 
 
-class InteractionDetailView(LoginRequiredMixin, SuperUserRequired, DetailView):
+class InteractionDetailView(LoginRequiredMixin, SuperUserRequired, ConditionalGetMixin, IdentityMapMixin,
+                            QueryPlanMixin, DetailView):
     """
     Контроллер для вывода детальной информации о конкретном взаимодействии
     """
     queryset = Interaction.objects.all()
+    select_related = ('project', 'manager')
+    defer_fields = ('description',) + rich_text_fields('project')
     template_name = 'cms_mainpage/interaction_detail.html'
 
+    def get_etag_parts(self):
+        """
+        Метод для получения времени изменения взаимодействия и версии его проекта (название проекта)
+        :return:
+        """
+        row = Interaction.objects.filter(pk=self.kwargs['pk']).values_list('updated_at', 'project_id').first()
+        if row is None:
+            return None
+        self.updated_at, project_id = row
+        return [self.updated_at, caching.get_version(caching.object_namespace('project', project_id))]
+
+    def get_last_modified(self):
+        return self.updated_at
+
 
-class CompanyInteractionListView(LoginRequiredMixin, SuperUserRequired, ListView):
+class CompanyInteractionListView(LoginRequiredMixin, SuperUserRequired, ConditionalGetMixin, CursorPaginationMixin,
+                                 QueryPlanMixin, ListView):
     """
     Контроллер для просмотра всех взаимодействий конкретной компании
     """
+    queryset = Interaction.objects.all()
     template_name = 'cms_mainpage/company_interaction_list_page.html'
+    paginate_by = INDEX_PAGINATE_BY
+    select_related = ('project', 'manager')
+    defer_fields = rich_text_fields('', 'project')
+    signature_fields = ('updated_at',)
 
     def get_queryset(self) -> QuerySet:
         """
         Метод,который возвращает отфильтрованный  список взаимодействий по слагу компании в ссылке
         :return:
         """
-        return Interaction.objects.filter(project__user__slug=self.kwargs['slug'])
+        return super().get_queryset().filter(project__user__slug=self.kwargs['slug'])
 
 
+@method_decorator(transaction.atomic, name='post')
 class InteractionCreateView(LoginRequiredMixin, SuperUserRequired, CreateView):
     """
     Контроллер для создания модели Interaction
@@ -387,7 +475,7 @@ class InteractionCreateView(LoginRequiredMixin, SuperUserRequired, CreateView):
         """
         self.object = interaction = form.save(commit=False)
         interaction.manager = self.request.user
-        interaction.project = Project.objects.get(pk=self.kwargs['pk'])
+        interaction.project = get_object_or_404(self.request, Project.objects.only('pk', 'user'), pk=self.kwargs['pk'])
         interaction.save()
         messages.success(self.request, 'Взаимодействие создано')
         return HttpResponseRedirect(self.get_success_url())
@@ -402,6 +490,7 @@ class InteractionCreateView(LoginRequiredMixin, SuperUserRequired, CreateView):
         return success_url
 
 
+@method_decorator(transaction.atomic, name='post')
 class InteractionDeleteForm(LoginRequiredMixin, SuperUserRequired, OwnerRequired, DeleteView):
     """
     Контроллер для удаления модели Interaction
@@ -416,10 +505,11 @@ class InteractionDeleteForm(LoginRequiredMixin, SuperUserRequired, OwnerRequired
         Метод для перенаправления пользователя на страницу всех взаимодействи проекта
         :return:
         """
-        success_url = reverse_lazy('project-interaction-list', kwargs={'pk': self.object.project.id})
+        success_url = reverse_lazy('project-interaction-list', kwargs={'pk': self.object.project_id})
         return success_url
 
 
+@method_decorator(transaction.atomic, name='post')
 class InteractionUpdateView(LoginRequiredMixin, SuperUserRequired, OwnerRequired, UpdateView):
     """
     Контроллер для обновления информации в модели Interaction
@@ -431,14 +521,18 @@ class InteractionUpdateView(LoginRequiredMixin, SuperUserRequired, OwnerRequired
     user_field = 'manager'
 
 
-class AllInteractionListView(LoginRequiredMixin, SuperUserRequired, FilterView):
+class AllInteractionListView(LoginRequiredMixin, SuperUserRequired, ConditionalGetMixin, CursorPaginationMixin,
+                             QueryPlanMixin, FilterView):
     """
     Контроллер для вывода всех взаимодействий
     """
     queryset = Interaction.objects.all()
+    select_related = ('project__user', 'manager')
+    defer_fields = rich_text_fields('', 'project', 'project__user')
     template_name = 'cms_mainpage/all_interaction_list.html'
     filterset_class = InteractionFilter
     paginate_by = INDEX_PAGINATE_BY
+    signature_fields = ('updated_at',)
 
     def get_context_data(self, *args, **kwargs) -> dict:
         """
@@ -450,6 +544,7 @@ class AllInteractionListView(LoginRequiredMixin, SuperUserRequired, FilterView):
         params_string = ''
         get_params = copy.copy(self.request.GET)
         get_params.pop('page', False)
+        get_params.pop(self.cursor_kwarg, False)
 
         if get_params:
 
@@ -467,6 +562,168 @@ class AllInteractionListView(LoginRequiredMixin, SuperUserRequired, FilterView):
         return super().get_context_data(*args, params_string=params_string, **kwargs)
 
 
+class AnalyticsView(LoginRequiredMixin, SuperUserRequired, TemplateView):
+    """
+    Контроллер для вывода аналитики по взаимодействиям (читает только дневные агрегаты)
+    """
+    template_name = 'cms_mainpage/analytics.html'
+    default_period = datetime.timedelta(days=30)
+
+    def get_period(self) -> tuple:
+        """
+        Метод для получения периода отчета из GET-параметров date_from и date_to
+        :return:
+        """
+        date_from = parse_date(self.request.GET.get('date_from') or '')
+        date_to = parse_date(self.request.GET.get('date_to') or '')
+        if not date_from and not date_to:
+            date_from = timezone.localdate() - self.default_period
+        return date_from, date_to
+
+    def get_context_data(self, **kwargs) -> dict:
+        """
+        Метод для передачи данных аналитики в контекст шаблона
+        :param kwargs:
+        :return:
+        """
+        date_from, date_to = self.get_period()
+        kwargs.update(analytics.get_dashboard(date_from, date_to), date_from=date_from, date_to=date_to)
+        return super().get_context_data(**kwargs)
+
+
+class AnalyticsDataView(AnalyticsView):
+    """
+    Контроллер для выдачи данных аналитики в формате JSON
+    """
+
+    def get(self, request, *args, **kwargs) -> JsonResponse:
+        date_from, date_to = self.get_period()
+        data = analytics.get_dashboard(date_from, date_to)
+        return JsonResponse({
+            'per_day': {day.isoformat(): channels for day, channels in data['per_day'].items()},
+            'per_manager': data['per_manager'],
+            'per_company_month': [
+                dict(row, month=row['month'].strftime('%Y-%m')) for row in data['per_company_month']
+            ],
+            'refreshed_at': data['refreshed_at'],
+        })
+
+
+class ExportView(LoginRequiredMixin, SuperUserRequired, View):
+    """
+    Контроллер для потоковой выгрузки записей в CSV/JSON Lines с фильтрами списков.
+    GET-параметры: format (csv или jsonl), gzip (1 - сжать), остальные - параметры фильтра.
+    Под ASGI выгрузка отдается из временного файла (см. main_crm.export)
+    """
+
+    def get(self, request, *args, **kwargs) -> StreamingHttpResponse:
+        """
+        Метод для выгрузки записей без загрузки всего результата в память
+        :param request:
+        :param args:
+        :param kwargs:
+        :return:
+        """
+        current_export = export.EXPORTS.get(kwargs['name'])
+        export_format = request.GET.get('format', 'csv')
+        if current_export is None or export_format not in export.FORMATS:
+            raise Http404
+
+        compress = request.GET.get('gzip') == '1'
+        filename = f'{kwargs["name"]}.{export_format}'
+        content_type = export.FORMATS[export_format]
+        if compress:
+            filename, content_type = f'{filename}.gz', 'application/gzip'
+
+        queryset = current_export.get_queryset(request.GET)
+        if isinstance(request, ASGIRequest):
+            response = FileResponse(export.spool_export(current_export, queryset, export_format, compress),
+                                    content_type=content_type)
+        else:
+            response = StreamingHttpResponse(
+                export.stream_export(current_export, queryset, export_format, compress),
+                content_type=content_type,
+            )
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+
+class CompanyImportView(LoginRequiredMixin, SuperUserRequired, FormView):
+    """
+    Контроллер для пакетного импорта компаний из CSV/XLSX
+    """
+    template_name = 'cms_mainpage/import_companies.html'
+    form_class = CompanyImportForm
+
+    def form_valid(self, form):
+        """
+        Переопределенный метод, который импортирует файл и показывает результат с ошибками строк
+        :param form:
+        :return:
+        """
+        upload = form.cleaned_data['file']
+        try:
+            result = importer.CompanyImporter(form.cleaned_data['batch_size']).run(
+                importer.read_rows(upload, upload.name)
+            )
+        except (ValueError, UnicodeDecodeError) as e:
+            form.add_error('file', str(e))
+            return self.form_invalid(form)
+        return self.render_to_response(self.get_context_data(form=form, result=result))
+
+
+class CacheStatsView(LoginRequiredMixin, SuperUserRequired, View):
+    """
+    Контроллер для выдачи статистики попаданий в кеш фрагментов в формате JSON
+    """
+
+    def get(self, request, *args, **kwargs) -> JsonResponse:
+        return JsonResponse(caching.get_stats())
+
+
+class TimingStatsView(LoginRequiredMixin, SuperUserRequired, View):
+    """
+    Контроллер для выдачи статистики времени запросов по именам URL в формате JSON (данные текущего процесса)
+    """
+
+    def get(self, request, *args, **kwargs) -> JsonResponse:
+        return JsonResponse(instrumentation.get_stats())
+
+
+class DatabaseStatsView(LoginRequiredMixin, SuperUserRequired, View):
+    """
+    Контроллер для выдачи статистики соединений с базой данных в формате JSON (main_crm.backends.sqlite3)
+    """
+
+    def get(self, request, *args, **kwargs) -> JsonResponse:
+        return JsonResponse({'connections': sqlite_backend.get_stats()})
+
+
+class ProfileListView(LoginRequiredMixin, SuperUserRequired, TemplateView):
+    """
+    Контроллер для вывода списка последних профилей запросов (main_crm.profiling)
+    """
+    template_name = 'cms_mainpage/profiles.html'
+
+    def get_context_data(self, **kwargs) -> dict:
+        context = super().get_context_data(**kwargs)
+        context['profiles'] = profiling.list_profiles()
+        return context
+
+
+class ProfileFileView(LoginRequiredMixin, SuperUserRequired, View):
+    """
+    Контроллер для скачивания файла профиля (.prof или .collapsed)
+    """
+
+    def get(self, request, *args, **kwargs) -> FileResponse:
+        name = kwargs['name']
+        path = os.path.join(profiling.get_profile_dir(), name)
+        if not profiling.PROFILE_NAME_RE.match(name) or not os.path.isfile(path):
+            raise Http404
+        return FileResponse(open(path, 'rb'), as_attachment=True, filename=name)
+
+
 class UpdateUserView(LoginRequiredMixin, UpdateView):
     """
     Контроллер для обновления информации в модели User
@@ -538,13 +795,15 @@ class UpdateUserView(LoginRequiredMixin, UpdateView):
             return self.form_invalid(form, profile_form)
 
 
-class UserInteractionListView(LoginRequiredMixin, DetailView):
+class UserInteractionListView(LoginRequiredMixin, CursorPaginationMixin, DetailView):
     """
     Контроллер для вывода информации о пользователе(профиль пользователя) и всех записей,которые
-    он создал(компании,проекты и взаимодействия)
+    он создал(компании,проекты и взаимодействия) в виде дерева компания -> проект -> взаимодействие
+    с постраничным выводом по компаниям
     """
     queryset = User.objects.all()
     template_name = 'cms_mainpage/manager_profile.html'
+    paginate_by = INDEX_PAGINATE_BY
 
     def get_object(self) -> User:
         """
@@ -553,14 +812,50 @@ class UserInteractionListView(LoginRequiredMixin, DetailView):
         """
         return self.request.user
 
+    def get_company_tree(self, companies: list) -> list:
+        """
+        Метод для построения дерева компания -> проект -> взаимодействие за один проход
+        по одному запросу взаимодействий пользователя с компаниями страницы
+        :param companies:
+        :return: Список словарей {'company', 'projects': [{'project', 'interactions'}]}
+        """
+        tree = {company.pk: {'company': company, 'projects': {}} for company in companies}
+        interactions = (
+            Interaction.objects.filter(manager=self.object, project__user__in=list(tree))
+            .select_related('project')
+            .only('pk', 'updated_at', 'description_excerpt', 'project__id', 'project__title', 'project__user_id')
+            .order_by('-updated_at', 'pk')
+        )
+        for interaction in interactions:
+            projects = tree[interaction.project.user_id]['projects']
+            node = projects.setdefault(interaction.project_id, {'project': interaction.project, 'interactions': []})
+            node['interactions'].append(interaction)
+
+        return [
+            {'company': node['company'], 'projects': list(node['projects'].values())}
+            for node in tree.values()
+        ]
+
     def get_context_data(self, **kwargs) -> dict:
         """
-        Метод для передачи списка взаимодействий,которые создал пользователь
+        Метод для передачи страницы компаний, с которыми работал пользователь, и дерева его взаимодействий
         :param kwargs:
         :return:
         """
         context = super().get_context_data(**kwargs)
-        context['interactions'] = Interaction.objects.filter(manager=self.object)
+        if not self.object.is_superuser:
+            return context
+
+        companies = Company.objects.filter(
+            pk__in=Interaction.objects.filter(manager=self.object).values('project__user_id')
+        ).only('pk', 'company_name', 'slug').order_by('company_name', 'pk')
+        paginator, page, companies, is_paginated = self.paginate_queryset(companies, self.paginate_by)
+        context.update({
+            'paginator': paginator,
+            'page_obj': page,
+            'is_paginated': is_paginated,
+            'company_tree': self.get_company_tree(companies),
+        })
         return context
 
 